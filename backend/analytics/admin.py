@@ -0,0 +1,57 @@
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+
+from users.models import User
+from . import dashboard
+from .models import DailyActivity, RefreshLog
+from .refresh import last_refreshed
+
+
+@admin.register(DailyActivity)
+class AnalyticsDashboardAdmin(admin.ModelAdmin):
+    """Вместо списка строк — страница с общими и пользовательскими трендами."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        days = dashboard.parse_range(request.GET.get('days'))
+        trend = dashboard.global_trend(days)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Дашборд активности',
+            'opts': self.model._meta,
+            'days': days,
+            'ranges': dashboard.RANGES,
+            'monthly': days >= dashboard.MONTHLY_FROM,
+            'summary': dashboard.summarize(trend, days),
+            'trend': list(reversed(trend)),
+            'max_dau': max((row['active_users'] for row in trend), default=0) or 1,
+            'top_users': dashboard.top_users(days),
+            'refreshed_at': last_refreshed(),
+        }
+        user_id = request.GET.get('user')
+        if user_id and user_id.isdigit():
+            context['selected_user'] = User.objects.filter(pk=user_id).first()
+            context['user_trend'] = dashboard.user_trend(int(user_id))
+        context.update(extra_context or {})
+        return TemplateResponse(request, 'admin/analytics/dashboard.html', context)
+
+
+@admin.register(RefreshLog)
+class RefreshLogAdmin(admin.ModelAdmin):
+    list_display = ('view', 'refreshed_at', 'duration_ms')
+    # Журнал пишет refresh_analytics
+    readonly_fields = ('view', 'refreshed_at', 'duration_ms')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,98 @@
+"""
+Данные страницы аналитики в админке. Всё читается из материализованных
+представлений (analytics.refresh), поэтому страница не зависит от объёма
+исходных таблиц и показывает состояние на момент последнего пересчёта.
+"""
+from datetime import timedelta
+
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import DailyActivity, UserMonthlyActivity
+from .refresh import COUNTERS
+
+# Доступные окна в днях; длинные окна показываются по месяцам
+RANGES = (30, 90, 365)
+DEFAULT_RANGE = 30
+MONTHLY_FROM = 365
+TOP_USERS = 20
+EMOTIONS = ('joy', 'sadness', 'neutral')
+
+
+def parse_range(value):
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RANGE
+    return days if days in RANGES else DEFAULT_RANGE
+
+
+def share(part, whole):
+    """Доля в процентах с одним знаком или None, если делить не на что."""
+    return round(100 * part / whole, 1) if whole else None
+
+
+def _with_shares(row):
+    emotions = sum(row[name] for name in EMOTIONS)
+    row['public_share'] = share(row['public_entries'], row['entries'])
+    row['emotion_mix'] = {name: share(row[name], emotions) for name in EMOTIONS}
+    return row
+
+
+def global_trend(days):
+    """Строки по дням (или по месяцам для длинных окон), от старых к новым, без пропусков дней."""
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    rows = DailyActivity.objects.filter(day__gte=since, day__lte=today)
+    if days >= MONTHLY_FROM:
+        months = (
+            rows.annotate(month=TruncMonth('day')).values('month')
+            .annotate(active_users=Max('active_users'), new_users=Sum('new_users'),
+                      **{name: Sum(name) for name in COUNTERS})
+            .order_by('month')
+        )
+        # В помесячном виде active_users — максимум DAU за месяц
+        return [_with_shares({**row, 'label': row['month'].strftime('%b %Y')}) for row in months]
+
+    by_day = {row['day']: row for row in rows.values()}
+    empty = dict.fromkeys(('active_users', 'new_users', *COUNTERS), 0)
+    trend = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        trend.append(_with_shares({**empty, **by_day.get(day, {}), 'day': day, 'label': day.isoformat()}))
+    return trend
+
+
+def summarize(trend, days):
+    totals = {name: sum(row[name] for row in trend) for name in ('new_users', *COUNTERS)}
+    emotions = sum(totals[name] for name in EMOTIONS)
+    peak = max(trend, key=lambda row: row['active_users'], default=None)
+    return {
+        **totals,
+        'avg_dau': round(sum(row['active_users'] for row in trend) / len(trend), 1) if days < MONTHLY_FROM and trend else None,
+        'peak_dau': peak['active_users'] if peak else 0,
+        'peak_label': peak['label'] if peak and peak['active_users'] else None,
+        'public_share': share(totals['public_entries'], totals['entries']),
+        'emotion_mix': {name: share(totals[name], emotions) for name in EMOTIONS},
+    }
+
+
+def top_users(days, limit=TOP_USERS):
+    """Самые активные пользователи за месяцы, пересекающиеся с окном."""
+    since = (timezone.localdate() - timedelta(days=days - 1)).replace(day=1)
+    rows = (
+        UserMonthlyActivity.objects.filter(month__gte=since)
+        .values('user_id', 'user__username')
+        .annotate(active_days=Sum('active_days'), **{name: Sum(name) for name in COUNTERS})
+        .order_by('-active_days', '-entries', 'user_id')[:limit]
+    )
+    return [_with_shares(row) for row in rows]
+
+
+def user_trend(user_id):
+    """Помесячная активность пользователя, от новых месяцев к старым."""
+    return [
+        _with_shares({**row, 'label': row['month'].strftime('%B %Y')})
+        for row in UserMonthlyActivity.objects.filter(user_id=user_id).order_by('-month').values()
+    ]
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from analytics.refresh import recreate_views, refresh_views
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сводки аналитики для админки (REFRESH MATERIALIZED VIEW CONCURRENTLY, '
+            'без блокировки чтения); запускается периодически, например из cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recreate', action='store_true',
+                            help='Пересоздать представления (после смены TIME_ZONE); на это время чтение блокируется')
+
+    def handle(self, *args, **options):
+        if options['recreate']:
+            recreate_views()
+            self.stdout.write(self.style.SUCCESS('Analytics views recreated'))
+            return
+        durations = refresh_views()
+        summary = ', '.join(f'{name} {ms} ms' for name, ms in durations.items())
+        self.stdout.write(self.style.SUCCESS(f'Analytics views refreshed: {summary}'))
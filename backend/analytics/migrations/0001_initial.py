@@ -0,0 +1,143 @@
+# Generated by Django 5.2 on 2026-10-18 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Запросы зафиксированы на момент миграции и не импортируются из
+# analytics.refresh: изменение представлений — новая миграция.
+# Дни считаются в поясе TIME_ZONE, он подставляется параметром %s.
+USER_DAYS_SQL = """
+    parts AS (
+        SELECT user_id, (created_at AT TIME ZONE %s)::date AS day,
+               COUNT(*) AS entries, COUNT(*) FILTER (WHERE is_public) AS public_entries,
+               0 AS comments, 0 AS likes, 0 AS joy, 0 AS sadness, 0 AS neutral
+        FROM entries_entry GROUP BY 1, 2
+        UNION ALL
+        SELECT user_id, (created_at AT TIME ZONE %s)::date, 0, 0, COUNT(*), 0, 0, 0, 0
+        FROM comments_comment GROUP BY 1, 2
+        UNION ALL
+        SELECT user_id, (created_at AT TIME ZONE %s)::date, 0, 0, 0, COUNT(*), 0, 0, 0
+        FROM like_like GROUP BY 1, 2
+        UNION ALL
+        SELECT user_id, day, 0, 0, 0, 0, joy, sadness, neutral
+        FROM emotions_dailyemotionstat WHERE joy + sadness + neutral > 0
+    ),
+    user_days AS (
+        SELECT user_id, day,
+               SUM(entries) AS entries, SUM(public_entries) AS public_entries, SUM(comments) AS comments,
+               SUM(likes) AS likes, SUM(joy) AS joy, SUM(sadness) AS sadness, SUM(neutral) AS neutral
+        FROM parts GROUP BY user_id, day
+    )
+"""
+
+CREATE_DAILY_ACTIVITY = f"""
+CREATE MATERIALIZED VIEW analytics_daily_activity AS
+    WITH {USER_DAYS_SQL},
+    activity AS (
+        SELECT day, COUNT(*) AS active_users,
+               SUM(entries) AS entries, SUM(public_entries) AS public_entries, SUM(comments) AS comments,
+               SUM(likes) AS likes, SUM(joy) AS joy, SUM(sadness) AS sadness, SUM(neutral) AS neutral
+        FROM user_days GROUP BY day
+    ),
+    joined AS (
+        SELECT (date_joined AT TIME ZONE %s)::date AS day, COUNT(*) AS new_users
+        FROM users_user GROUP BY 1
+    )
+    SELECT COALESCE(a.day, j.day) AS day,
+           COALESCE(a.active_users, 0)::int AS active_users,
+           COALESCE(j.new_users, 0)::int AS new_users,
+           COALESCE(a.entries, 0)::int AS entries, COALESCE(a.public_entries, 0)::int AS public_entries,
+           COALESCE(a.comments, 0)::int AS comments, COALESCE(a.likes, 0)::int AS likes,
+           COALESCE(a.joy, 0)::int AS joy, COALESCE(a.sadness, 0)::int AS sadness,
+           COALESCE(a.neutral, 0)::int AS neutral
+    FROM activity a FULL JOIN joined j ON j.day = a.day
+"""
+
+CREATE_USER_MONTHLY_ACTIVITY = f"""
+CREATE MATERIALIZED VIEW analytics_user_monthly_activity AS
+    WITH {USER_DAYS_SQL}
+    SELECT user_id, date_trunc('month', day)::date AS month,
+           COUNT(*)::int AS active_days,
+           COALESCE(SUM(entries), 0)::int AS entries, COALESCE(SUM(public_entries), 0)::int AS public_entries,
+           COALESCE(SUM(comments), 0)::int AS comments, COALESCE(SUM(likes), 0)::int AS likes,
+           COALESCE(SUM(joy), 0)::int AS joy, COALESCE(SUM(sadness), 0)::int AS sadness,
+           COALESCE(SUM(neutral), 0)::int AS neutral
+    FROM user_days GROUP BY 1, 2
+"""
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('comments', '0002_comment_updated_at'),
+        ('emotions', '0007_emotion_idempotency_key'),
+        ('entries', '0010_entry_user_updated_index'),
+        ('like', '0002_like_updated_at'),
+        ('users', '0004_user_profile_photo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('active_users', models.IntegerField()),
+                ('new_users', models.IntegerField()),
+                ('entries', models.IntegerField()),
+                ('public_entries', models.IntegerField()),
+                ('comments', models.IntegerField()),
+                ('likes', models.IntegerField()),
+                ('joy', models.IntegerField()),
+                ('sadness', models.IntegerField()),
+                ('neutral', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Активность по дням',
+                'verbose_name_plural': 'Дашборд активности',
+                'db_table': 'analytics_daily_activity',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserMonthlyActivity',
+            fields=[
+                ('pk', models.CompositePrimaryKey('user_id', 'month', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('active_days', models.IntegerField()),
+                ('entries', models.IntegerField()),
+                ('public_entries', models.IntegerField()),
+                ('comments', models.IntegerField()),
+                ('likes', models.IntegerField()),
+                ('joy', models.IntegerField()),
+                ('sadness', models.IntegerField()),
+                ('neutral', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'analytics_user_monthly_activity',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RefreshLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=64, unique=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('duration_ms', models.IntegerField()),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                (CREATE_DAILY_ACTIVITY, [settings.TIME_ZONE] * 4),
+                'CREATE UNIQUE INDEX analytics_daily_activity_key ON analytics_daily_activity (day)',
+                (CREATE_USER_MONTHLY_ACTIVITY, [settings.TIME_ZONE] * 3),
+                'CREATE UNIQUE INDEX analytics_user_monthly_activity_key ON analytics_user_monthly_activity (user_id, month)',
+            ],
+            reverse_sql=[
+                'DROP MATERIALIZED VIEW IF EXISTS analytics_user_monthly_activity',
+                'DROP MATERIALIZED VIEW IF EXISTS analytics_daily_activity',
+            ],
+        ),
+    ]
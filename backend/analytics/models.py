@@ -0,0 +1,62 @@
+from django.db import models
+
+from users.models import User
+
+
+class DailyActivity(models.Model):
+    """
+    Сводка по всем пользователям за локальный день (TIME_ZONE): активные
+    пользователи, регистрации, записи, комментарии, лайки и эмоции.
+    Это материализованное представление, его пересчитывает refresh_analytics.
+    """
+    day = models.DateField(primary_key=True)
+    active_users = models.IntegerField()
+    new_users = models.IntegerField()
+    entries = models.IntegerField()
+    public_entries = models.IntegerField()
+    comments = models.IntegerField()
+    likes = models.IntegerField()
+    joy = models.IntegerField()
+    sadness = models.IntegerField()
+    neutral = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'analytics_daily_activity'
+        verbose_name = 'Активность по дням'
+        verbose_name_plural = 'Дашборд активности'
+
+    def __str__(self):
+        return f"{self.day}: {self.active_users} active"
+
+
+class UserMonthlyActivity(models.Model):
+    """Та же сводка по пользователю и месяцу; материализованное представление."""
+    pk = models.CompositePrimaryKey('user_id', 'month')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    month = models.DateField()
+    active_days = models.IntegerField()
+    entries = models.IntegerField()
+    public_entries = models.IntegerField()
+    comments = models.IntegerField()
+    likes = models.IntegerField()
+    joy = models.IntegerField()
+    sadness = models.IntegerField()
+    neutral = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'analytics_user_monthly_activity'
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}"
+
+
+class RefreshLog(models.Model):
+    """Когда и за сколько последний раз пересчитано каждое представление."""
+    view = models.CharField(max_length=64, unique=True)
+    refreshed_at = models.DateTimeField()
+    duration_ms = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.view} @ {self.refreshed_at}"
@@ -0,0 +1,148 @@
+"""
+Материализованные представления аналитики и их пересчёт.
+
+Обе сводки строятся одним запросом из записей, комментариев, лайков,
+дневной сводки эмоций и регистраций пользователей, сгруппированных по
+локальному дню (TIME_ZONE подставляется при создании представления).
+REFRESH MATERIALIZED VIEW CONCURRENTLY держит на исходных таблицах только
+ACCESS SHARE, а на самом представлении — EXCLUSIVE, при котором чтение
+не блокируется: админка видит прежние данные, пока идёт пересчёт. Для
+CONCURRENTLY у каждого представления есть уникальный индекс.
+
+Миграция 0001 создаёт представления по своей зафиксированной копии этих
+запросов. Поменяли запрос — добавьте миграцию с DROP/CREATE нового вида
+(refresh_analytics --recreate пересоздаёт их уже по этому модулю).
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from comments.models import Comment
+from emotions.models import DailyEmotionStat
+from entries.models import Entry
+from like.models import Like
+from users.models import User
+from .models import DailyActivity, RefreshLog, UserMonthlyActivity
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('entries', 'public_entries', 'comments', 'likes', 'joy', 'sadness', 'neutral')
+
+
+def _user_days_sql():
+    """CTE user_days: счётчики пользователя за локальный день, по строке на (user_id, day)."""
+    entries = Entry._meta.db_table
+    comments = Comment._meta.db_table
+    likes = Like._meta.db_table
+    emotions = DailyEmotionStat._meta.db_table
+    sums = ', '.join(f'SUM({name}) AS {name}' for name in COUNTERS)
+    return f"""
+        parts AS (
+            SELECT user_id, (created_at AT TIME ZONE %(tz)s)::date AS day,
+                   COUNT(*) AS entries, COUNT(*) FILTER (WHERE is_public) AS public_entries,
+                   0 AS comments, 0 AS likes, 0 AS joy, 0 AS sadness, 0 AS neutral
+            FROM {entries} GROUP BY 1, 2
+            UNION ALL
+            SELECT user_id, (created_at AT TIME ZONE %(tz)s)::date, 0, 0, COUNT(*), 0, 0, 0, 0
+            FROM {comments} GROUP BY 1, 2
+            UNION ALL
+            SELECT user_id, (created_at AT TIME ZONE %(tz)s)::date, 0, 0, 0, COUNT(*), 0, 0, 0
+            FROM {likes} GROUP BY 1, 2
+            UNION ALL
+            -- Нулевые строки остаются в сводке после удаления эмоций, активностью они не считаются
+            SELECT user_id, day, 0, 0, 0, 0, joy, sadness, neutral
+            FROM {emotions} WHERE joy + sadness + neutral > 0
+        ),
+        user_days AS (
+            SELECT user_id, day, {sums} FROM parts GROUP BY user_id, day
+        )
+    """
+
+
+def _counter_columns(prefix=''):
+    return ', '.join(f'COALESCE(SUM({prefix}{name}), 0)::int AS {name}' for name in COUNTERS)
+
+
+def daily_activity_sql():
+    users = User._meta.db_table
+    return f"""
+        WITH {_user_days_sql()},
+        activity AS (
+            SELECT day, COUNT(*) AS active_users, {', '.join(f'SUM({name}) AS {name}' for name in COUNTERS)}
+            FROM user_days GROUP BY day
+        ),
+        joined AS (
+            SELECT (date_joined AT TIME ZONE %(tz)s)::date AS day, COUNT(*) AS new_users
+            FROM {users} GROUP BY 1
+        )
+        SELECT COALESCE(a.day, j.day) AS day,
+               COALESCE(a.active_users, 0)::int AS active_users,
+               COALESCE(j.new_users, 0)::int AS new_users,
+               {', '.join(f'COALESCE(a.{name}, 0)::int AS {name}' for name in COUNTERS)}
+        FROM activity a FULL JOIN joined j ON j.day = a.day
+    """
+
+
+def user_monthly_activity_sql():
+    return f"""
+        WITH {_user_days_sql()}
+        SELECT user_id, date_trunc('month', day)::date AS month,
+               COUNT(*)::int AS active_days, {_counter_columns()}
+        FROM user_days GROUP BY 1, 2
+    """
+
+
+# Представление -> (запрос, столбцы уникального индекса)
+VIEWS = {
+    DailyActivity._meta.db_table: (daily_activity_sql, ('day',)),
+    UserMonthlyActivity._meta.db_table: (user_monthly_activity_sql, ('user_id', 'month')),
+}
+
+
+def create_views(cursor, tz=None):
+    """Создаёт представления с данными; пояс дней — TIME_ZONE, если не указан."""
+    for name, (build_sql, unique) in VIEWS.items():
+        cursor.execute(f'CREATE MATERIALIZED VIEW {name} AS {build_sql()}', {'tz': tz or settings.TIME_ZONE})
+        cursor.execute(f'CREATE UNIQUE INDEX {name}_key ON {name} ({", ".join(unique)})')
+
+
+def drop_views(cursor):
+    for name in VIEWS:
+        cursor.execute(f'DROP MATERIALIZED VIEW IF EXISTS {name}')
+
+
+def recreate_views():
+    """Пересоздаёт представления (например, после смены TIME_ZONE); блокирует их чтение."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        drop_views(cursor)
+        create_views(cursor)
+    log_refresh({name: 0 for name in VIEWS})
+
+
+def refresh_views(concurrently=True):
+    """Пересчитывает все представления, возвращает {представление: миллисекунды}."""
+    durations = {}
+    mode = ' CONCURRENTLY' if concurrently else ''
+    for name in VIEWS:
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW{mode} {name}')
+        durations[name] = round((time.perf_counter() - started) * 1000)
+        logger.info(f"Refreshed {name} in {durations[name]} ms")
+    log_refresh(durations)
+    return durations
+
+
+def log_refresh(durations):
+    now = timezone.now()
+    for name, duration_ms in durations.items():
+        RefreshLog.objects.update_or_create(view=name, defaults={'refreshed_at': now, 'duration_ms': duration_ms})
+
+
+def last_refreshed():
+    """Время самого старого из последних пересчётов или None, если их не было."""
+    logs = list(RefreshLog.objects.filter(view__in=VIEWS).values_list('refreshed_at', flat=True))
+    return min(logs) if len(logs) == len(VIEWS) else None
@@ -0,0 +1,82 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from comments.models import Comment
+from emotions.models import Emotion
+from entries.models import Entry
+from like.models import Like
+from users.models import User
+from .dashboard import global_trend, summarize, top_users, user_trend
+from .models import DailyActivity, RefreshLog, UserMonthlyActivity
+from .refresh import VIEWS, last_refreshed, refresh_views
+
+
+class AnalyticsRefreshTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass12345')
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pass12345')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pass12345')
+        entry = Entry.objects.create(user=cls.alice, title='Public', is_public=True)
+        Entry.objects.create(user=cls.alice, title='Private', is_public=False)
+        Comment.objects.create(user=cls.bob, entry=entry, text='hi')
+        Like.objects.create(user=cls.bob, entry=entry)
+        Emotion.objects.create(user=cls.alice, emotion_type='joy')
+        Emotion.objects.create(user=cls.alice, emotion_type='joy')
+        Emotion.objects.create(user=cls.bob, emotion_type='sadness')
+
+    def test_views_change_only_on_refresh(self):
+        self.assertFalse(DailyActivity.objects.exists())
+        self.assertIsNone(last_refreshed())
+
+        durations = refresh_views()
+        self.assertEqual(set(durations), set(VIEWS))
+        self.assertEqual(RefreshLog.objects.count(), len(VIEWS))
+        self.assertIsNotNone(last_refreshed())
+
+        today = DailyActivity.objects.get(day=timezone.localdate())
+        self.assertEqual(
+            (today.active_users, today.new_users, today.entries, today.public_entries, today.comments, today.likes),
+            (2, 3, 2, 1, 1, 1),
+        )
+        self.assertEqual((today.joy, today.sadness, today.neutral), (2, 1, 0))
+
+        month = UserMonthlyActivity.objects.get(user=self.alice)
+        self.assertEqual(month.month, timezone.localdate().replace(day=1))
+        self.assertEqual((month.active_days, month.entries, month.public_entries, month.joy), (1, 2, 1, 2))
+
+        Entry.objects.create(user=self.bob, title='Later', is_public=True)
+        self.assertEqual(DailyActivity.objects.get(day=timezone.localdate()).entries, 2)
+        call_command('refresh_analytics', stdout=StringIO())
+        self.assertEqual(DailyActivity.objects.get(day=timezone.localdate()).entries, 3)
+
+    def test_dashboard_data(self):
+        refresh_views()
+        trend = global_trend(30)
+        self.assertEqual(len(trend), 30)
+        self.assertEqual(trend[-1]['public_share'], 50.0)
+        summary = summarize(trend, 30)
+        self.assertEqual(summary['peak_dau'], 2)
+        self.assertEqual(summary['emotion_mix'], {'joy': 66.7, 'sadness': 33.3, 'neutral': 0.0})
+        self.assertEqual(len(global_trend(365)), 1)
+
+        users = top_users(30)
+        self.assertEqual([row['user__username'] for row in users], ['alice', 'bob'])
+        self.assertEqual(user_trend(self.bob.pk)[0]['comments'], 1)
+
+    def test_admin_pages_read_precomputed_data(self):
+        refresh_views()
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/analytics/dailyactivity/', {'days': 90, 'user': self.alice.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'alice')
+        self.assertEqual(response.context['user_trend'][0]['entries'], 2)
+
+        self.assertEqual(self.client.get('/admin/analytics/dailyactivity/', {'days': 365}).status_code, 200)
+
+        response = self.client.get(f'/admin/users/user/{self.alice.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Активных дней')
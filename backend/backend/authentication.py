@@ -0,0 +1,18 @@
+"""
+Аутентификация подзапросов /api/batch/ (backend.batch).
+
+Модуль не импортирует rest_framework.views: DRF загружает классы из
+DEFAULT_AUTHENTICATION_CLASSES при импорте APIView.
+"""
+from rest_framework.authentication import BaseAuthentication
+
+
+class SubRequestAuthentication(BaseAuthentication):
+    """
+    (user, auth) внешнего пакетного запроса, который уже прошёл обычные
+    аутентификаторы. Для остальных запросов возвращает None, и DRF переходит
+    к следующему классу из DEFAULT_AUTHENTICATION_CLASSES.
+    """
+
+    def authenticate(self, request):
+        return getattr(request._request, 'batch_auth', None)
@@ -0,0 +1,128 @@
+"""
+Пакетные запросы: /api/batch/ выполняет список подзапросов внутри одного
+HTTP-запроса, вызывая обычные view через URLconf.
+
+Подзапрос получает от внешнего запроса только заголовки авторизации и
+описания содержимого: условные (If-None-Match, If-Modified-Since) относятся
+к ответу на сам пакет. Пользователя подзапросу передаёт
+backend.authentication.SubRequestAuthentication — результат аутентификации
+внешнего запроса, поэтому JWT разбирается один раз; middleware для
+подзапросов не выполняются. В режиме atomic все подзапросы идут в одной
+транзакции: при первом ответе 4xx/5xx она откатывается, а оставшиеся
+подзапросы не выполняются (статус 424).
+"""
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+ALLOWED_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Заголовки ответа подзапроса, которые возвращаются клиенту
+FORWARDED_HEADERS = ('ETag', 'Last-Modified', 'Location', 'X-Cache')
+# Заголовки внешнего запроса, которые получает подзапрос (ключи META)
+REQUEST_HEADERS = ('HTTP_AUTHORIZATION', 'HTTP_COOKIE', 'HTTP_HOST', 'HTTP_ACCEPT', 'HTTP_ACCEPT_LANGUAGE')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=ALLOWED_METHODS, default='GET')
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_url(self, url):
+        path = urlsplit(url).path
+        if not path.startswith('/api/') or path.rstrip('/') == '/api/batch':
+            raise serializers.ValidationError('Only /api/ URLs other than /api/batch/ are allowed')
+        return url
+
+
+class BatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(default=False)
+    requests = SubRequestSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SIZE)
+
+
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data['requests']
+
+        if not serializer.validated_data['atomic']:
+            return Response({'responses': [self.dispatch_sub_request(request, sub) for sub in sub_requests]})
+
+        responses = []
+        with transaction.atomic():
+            for sub in sub_requests:
+                result = self.dispatch_sub_request(request, sub)
+                responses.append(result)
+                if result['status'] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        failed = len(responses) < len(sub_requests) or responses[-1]['status'] >= 400
+        responses += [
+            {'status': status.HTTP_424_FAILED_DEPENDENCY, 'headers': {}, 'body': None}
+            for _ in sub_requests[len(responses):]
+        ]
+        return Response({'responses': responses, 'committed': not failed})
+
+    def dispatch_sub_request(self, request, sub):
+        parts = urlsplit(sub['url'])
+        try:
+            match = resolve(parts.path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'headers': {}, 'body': {'detail': 'Not found.'}}
+
+        body = json.dumps(sub['body']).encode('utf-8') if 'body' in sub else b''
+        environ = {
+            key: value for key, value in request.META.items()
+            if key in REQUEST_HEADERS or key in ('SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'wsgi.url_scheme')
+        }
+        environ.update({
+            'REQUEST_METHOD': sub['method'],
+            'PATH_INFO': parts.path,
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': parts.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        })
+        sub_request = WSGIRequest(environ)
+        # Подхватывает backend.authentication.SubRequestAuthentication: JWT заново не проверяется
+        sub_request.batch_auth = (request.user, request.auth)
+
+        try:
+            response = match.func(sub_request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        except Exception as e:
+            logger.error(f"Error in batch sub-request {sub['method']} {sub['url']}: {str(e)}")
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'headers': {}, 'body': {'detail': str(e)}}
+
+        if response.streaming:
+            return {
+                'status': status.HTTP_400_BAD_REQUEST, 'headers': {},
+                'body': {'detail': 'Streaming responses are not supported in batch requests'},
+            }
+        headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+        return {'status': response.status_code, 'headers': headers, 'body': self.decode_body(response)}
+
+    @staticmethod
+    def decode_body(response):
+        if not response.content:
+            return None
+        if response.get('Content-Type', '').startswith('application/json'):
+            return json.loads(response.content)
+        return response.content.decode(response.charset or 'utf-8', errors='replace')
@@ -0,0 +1,240 @@
+"""
+Бенчмарк основных эндпоинтов API на данных из backend.dataset.
+
+Каждый сценарий — запрос к настоящему эндпоинту от имени случайного
+пользователя набора данных (JWT выдаётся напрямую, без /login/). Запросы
+идут либо по HTTP к запущенному серверу (base_url), либо внутри процесса
+через django.test.Client — тогда сервер не нужен, а база та же, что в
+настройках. Результат — JSON с пропускной способностью и перцентилями
+задержки по каждому эндпоинту, с отсортированными ключами, чтобы его
+удобно было сравнивать между коммитами обычным diff.
+
+Сценарии с записью запускаются только по явному выбору (include_writes или
+имя сценария): каждый замеренный запрос сразу отменяется парным запросом
+undo, который в замер не входит, поэтому набор данных между прогонами не
+меняется. Потоки пишут от разных пользователей, чтобы пары не перемешивались.
+"""
+import math
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from entries.models import Entry
+
+from .dataset import dataset_users
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    # (random.Random, BenchmarkContext) -> путь с query string
+    path: object
+    body: object = None
+    # Для сценариев с записью: путь -> (метод, путь, тело) запроса, отменяющего изменение
+    undo: object = None
+
+    @property
+    def writes(self):
+        return self.undo is not None
+
+
+class BenchmarkContext:
+    """Пользователи с токенами и id записей, из которых сценарии выбирают параметры."""
+
+    def __init__(self, prefix, sample_users=20):
+        users = list(dataset_users(prefix).order_by('pk')[:sample_users])
+        if not users:
+            raise ValueError(f"No users with prefix '{prefix}', run generate_dataset first")
+        self.tokens = {user.pk: str(RefreshToken.for_user(user).access_token) for user in users}
+        self.user_ids = list(self.tokens)
+        self.public_entry_ids = list(
+            Entry.objects.filter(user__in=users, is_public=True).order_by('pk').values_list('pk', flat=True)[:1000]
+        )
+        self.dates = list(
+            Entry.objects.filter(user__in=users).order_by('effective_date')
+            .values_list('effective_date', flat=True).distinct()[:1000]
+        )
+        if not self.public_entry_ids or not self.dates:
+            raise ValueError('The dataset has no entries to benchmark against')
+
+
+SCENARIOS = [
+    Scenario('feed', 'GET', lambda rnd, ctx: '/api/entries/public/'),
+    Scenario('my_entries', 'GET', lambda rnd, ctx: '/api/entries/'),
+    Scenario('by_date', 'GET', lambda rnd, ctx: f'/api/entries/by_date/?date={rnd.choice(ctx.dates).isoformat()}'),
+    Scenario('emotion_stats', 'GET', lambda rnd, ctx: f"/api/emotions/stats/{rnd.choice(['day', 'week', 'month'])}/"),
+    Scenario('comments', 'GET', lambda rnd, ctx: f'/api/comments/{rnd.choice(ctx.public_entry_ids)}/'),
+    # Повторный toggle возвращает лайк в исходное состояние
+    Scenario('like_toggle', 'POST', lambda rnd, ctx: f'/api/like/{rnd.choice(ctx.public_entry_ids)}/toggle/',
+             undo=lambda path: ('POST', path, None)),
+]
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
+
+
+def percentile(sorted_values, p):
+    """Перцентиль по ближайшему рангу; sorted_values отсортированы по возрастанию."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        # requests импортируется только для режима HTTP
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+        self.requests = requests
+
+    def __call__(self, method, path, token, body):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.request(
+            method, self.base_url + path, json=body, timeout=30,
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        return response.status_code
+
+
+class InProcessTransport:
+    def __init__(self):
+        self.local = threading.local()
+        # Client по умолчанию ходит на testserver, которого нет в ALLOWED_HOSTS вне тестов
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+        self.host = 'localhost' if host == '*' else host.lstrip('.')
+
+    def __call__(self, method, path, token, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(SERVER_NAME=self.host)
+        response = client.generic(
+            method, path, data=b'' if body is None else body, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        return response.status_code
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_scenario(scenario, context, transport, requests_count, concurrency, warmup, seed):
+    def send(method, path, token, body):
+        try:
+            return transport(method, path, token, body)
+        except Exception:
+            return None
+
+    def worker(worker_id, count):
+        rnd = random.Random(f'{seed}:{scenario.name}:{worker_id}')
+        user_ids = context.user_ids
+        if scenario.writes and isinstance(worker_id, int):
+            # Свой пользователь у каждого потока: запрос и его undo не пересекаются с чужими
+            user_ids = [context.user_ids[worker_id % len(context.user_ids)]]
+        latencies = []
+        errors = 0
+        try:
+            for _ in range(count):
+                path = scenario.path(rnd, context)
+                token = context.tokens[rnd.choice(user_ids)]
+                start = time.perf_counter()
+                status_code = send(scenario.method, path, token, scenario.body)
+                latencies.append(time.perf_counter() - start)
+                if status_code is None or status_code >= 400:
+                    errors += 1
+                elif scenario.writes:
+                    method, undo_path, body = scenario.undo(path)
+                    undo_status = send(method, undo_path, token, body)
+                    if undo_status is None or undo_status >= 400:
+                        errors += 1
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                # Соединение с БД у каждого потока своё (режим внутри процесса)
+                connection.close()
+        return latencies, errors
+
+    if warmup:
+        worker('warmup', warmup)
+
+    shares = [requests_count // concurrency + (1 if i < requests_count % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [worker(0, shares[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(worker, range(concurrency), shares))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    errors = sum(worker_errors for _, worker_errors in results)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else None,
+    }
+
+
+def run_benchmark(prefix='bench_', scenarios=None, requests_count=200, concurrency=4, warmup=10,
+                  base_url=None, seed=42, log=None, include_writes=False):
+    """Без scenarios замеряются только чтения; записи — с include_writes или по имени."""
+    log = log or (lambda message: None)
+    context = BenchmarkContext(prefix)
+    transport = HttpTransport(base_url) if base_url else InProcessTransport()
+    if scenarios:
+        selected = [SCENARIOS_BY_NAME[name] for name in scenarios]
+    else:
+        selected = [scenario for scenario in SCENARIOS if include_writes or not scenario.writes]
+
+    endpoints = {}
+    for scenario in selected:
+        endpoints[scenario.name] = run_scenario(
+            scenario, context, transport, requests_count, concurrency, warmup, seed,
+        )
+        result = endpoints[scenario.name]
+        log(f"{scenario.name}: {result['throughput_rps']} rps, p50 {result['p50_ms']} ms, "
+            f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, errors {result['errors']}")
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'started_at': timezone.now().isoformat(),
+            'target': base_url or 'in-process',
+            'concurrency': concurrency,
+            'requests_per_endpoint': requests_count,
+            'warmup': warmup,
+            'seed': seed,
+            'writes': any(scenario.writes for scenario in selected),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'endpoints': endpoints,
+    }
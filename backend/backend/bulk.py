@@ -0,0 +1,22 @@
+"""
+Вспомогательные UPDATE для массовых вставок в обход save().
+
+auto_now_add перезаписывает created_at/timestamp при bulk_create, поэтому
+даты из внешних данных (импорт дневника, синтетический набор) проставляются
+отдельным UPDATE по всей пачке сразу после вставки.
+"""
+from django.db import connection
+
+
+def backdate(model, pairs, fields):
+    """Проставляет [(pk, datetime)] в поля fields одним UPDATE ... FROM unnest()."""
+    if not pairs:
+        return
+    table = model._meta.db_table
+    assignments = ', '.join(f'{field} = v.ts' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {assignments} '
+            f'FROM unnest(%s::bigint[], %s::timestamptz[]) AS v(id, ts) WHERE {table}.id = v.id',
+            [[pk for pk, _ in pairs], [ts for _, ts in pairs]],
+        )
@@ -0,0 +1,83 @@
+"""
+Условные GET-запросы (ETag / Last-Modified / 304) по версиям ресурсов.
+
+Версия — метка времени в наносекундах, хранящаяся в кэше и обновляемая
+сигналами после коммита записи. Поэтому валидатор вычисляется без
+сериализации тела и почти без обращений к базе. Отдаётся только ETag:
+Last-Modified с точностью до секунды не различил бы две записи в одну
+секунду и давал бы устаревший 304 по If-Modified-Since.
+
+Версии должны быть общими для всех процессов сервера, поэтому нужен общий
+кэш (Redis, Memcached); с LocMemCache каждый воркер видит свои версии и
+сброс в одном не доходит до других — см. check_shared_cache.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error, Tags, register
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+# Кэши, которые не разделяются между процессами сервера
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_version(key):
+    # После вытеснения ключа из кэша новая версия не совпадёт со старой,
+    # в отличие от счётчика, начинающегося с нуля
+    return cache.get_or_set(key, time.time_ns, None)
+
+
+def bump_version(key):
+    cache.set(key, time.time_ns(), None)
+
+
+def bump_version_on_commit(key):
+    """Меняет версию после коммита текущей транзакции (сразу, если её нет).
+
+    Иначе параллельный запрос успел бы закэшировать под новой версией ещё
+    не зафиксированные данные.
+    """
+    transaction.on_commit(partial(bump_version, key))
+
+
+def request_fingerprint(request):
+    """Хэш хоста и параметров запроса: от них зависят абсолютные ссылки и страница."""
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.items()))
+    return hashlib.sha1(f'{request.get_host()}?{query}'.encode('utf-8')).hexdigest()
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def conditional_get(request, etag, build):
+    """Отвечает 304 без тела, если клиент прислал актуальный If-None-Match, иначе вызывает build()."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        # Клиент может хранить ответ, но обязан перепроверять его
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f'{backend} keeps a separate copy per process, so cache versions '
+            '(conditional GET, feed pages, emotion statistics) are not invalidated across workers.',
+            hint='Set CACHE_BACKEND/CACHE_LOCATION to a shared backend such as Redis or Memcached.',
+            id='backend.E001',
+        )]
+    return []
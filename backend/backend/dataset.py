@@ -0,0 +1,233 @@
+"""
+Генератор синтетических данных для нагрузочных тестов и бенчмарков.
+
+Пользователи, записи (с обложками, хэштегами и местоположением), эмоции
+за несколько лет, комментарии и лайки создаются пачками через bulk_create.
+Одинаковый seed даёт одинаковый набор данных, поэтому результаты
+бенчмарков сравнимы между коммитами.
+
+bulk_create не вызывает save() и сигналы, поэтому производные поля
+(Entry.set_derived_fields), связи с тегами и счётчики трендов заполняются
+здесь же. auto_now_add перезаписывает created_at/timestamp при вставке,
+поэтому даты «в прошлом» проставляются отдельным UPDATE по пачке.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from backend.bulk import backdate
+from comments.models import Comment
+from emotions.models import Emotion
+from emotions.rollup import record_emotions
+from entries.covers import COVERS_SUBDIR, get_manifest
+from entries.hashtags import apply_hashtag_count_deltas, get_or_create_hashtags, parse_hashtags
+from entries.models import Entry, EntryHashtag
+from entries.signals import invalidate_entry_pages
+from like.models import Like
+from users.models import User
+
+EMOTION_WEIGHTS = {'joy': 5, 'neutral': 4, 'sadness': 3}
+HASHTAGS = [
+    'утро', 'работа', 'семья', 'спорт', 'путешествия', 'книги', 'музыка', 'кино',
+    'природа', 'учеба', 'друзья', 'здоровье', 'еда', 'мысли', 'планы', 'отпуск',
+]
+# Города для записей с местоположением: (широта, долгота)
+CITIES = [
+    (55.7558, 37.6173), (59.9343, 30.3351), (56.8389, 60.6057), (55.0084, 82.9357),
+    (43.5855, 39.7231), (41.8781, -87.6298), (52.5200, 13.4050), (48.8566, 2.3522),
+]
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 50
+    entries_per_user: int = 40
+    emotions_per_user: int = 300
+    comments_per_entry: int = 3
+    likes_per_entry: int = 5
+    years: int = 3
+    public_ratio: float = 0.6
+    cover_ratio: float = 0.3
+    location_ratio: float = 0.2
+    prefix: str = 'bench_'
+    password: str = 'bench-password'
+    seed: int = 42
+    batch_size: int = 1000
+
+
+def dataset_users(prefix):
+    return User.objects.filter(username__startswith=prefix)
+
+
+class DatasetGenerator:
+    def __init__(self, config, log=None):
+        self.config = config
+        self.log = log or (lambda message: None)
+        self.random = random.Random(config.seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(config.seed)
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=365 * config.years)
+        self.counts = {'users': 0, 'entries': 0, 'emotions': 0, 'comments': 0, 'likes': 0, 'hashtag_links': 0}
+
+    def random_moment(self, after=None):
+        start = after or self.start
+        seconds = max(int((self.now - start).total_seconds()), 1)
+        return start + timedelta(seconds=self.random.randrange(seconds))
+
+    def chunks(self, items):
+        size = self.config.batch_size
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    @transaction.atomic
+    def generate(self):
+        users = self.create_users()
+        entries = self.create_entries(users)
+        self.create_emotions(users)
+        self.create_comments(users, entries)
+        self.create_likes(users, entries)
+        for user in users:
+            invalidate_entry_pages(user.pk, True)
+        return self.counts
+
+    def create_users(self):
+        config = self.config
+        if dataset_users(config.prefix).exists():
+            raise ValueError(f"Users with prefix '{config.prefix}' already exist, use --flush to recreate them")
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя — это секунды
+        password = make_password(config.password)
+        users = [
+            User(
+                username=f'{config.prefix}{i:05d}',
+                email=f'{config.prefix}{i:05d}@example.com',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                password=password,
+                remind_pin=False,
+                date_joined=self.random_moment(),
+            )
+            for i in range(config.users)
+        ]
+        for chunk in self.chunks(users):
+            User.objects.bulk_create(chunk)
+        self.counts['users'] = len(users)
+        self.log(f'users: {len(users)}')
+        return users
+
+    def entry_for(self, user, covers):
+        config = self.config
+        created_at = self.random_moment()
+        tags = self.random.sample(HASHTAGS, self.random.randint(0, 3))
+        location = None
+        if self.random.random() < config.location_ratio:
+            lat, lng = self.random.choice(CITIES)
+            location = {
+                'latitude': round(lat + self.random.uniform(-0.2, 0.2), 6),
+                'longitude': round(lng + self.random.uniform(-0.2, 0.2), 6),
+                'name': self.faker.city(),
+            }
+        entry = Entry(
+            user=user,
+            title=self.faker.sentence(nb_words=4).rstrip('.'),
+            content='\n\n'.join(self.faker.paragraphs(nb=self.random.randint(1, 4))),
+            hashtags=', '.join(tags) or None,
+            is_public=self.random.random() < config.public_ratio,
+            emotion=self.random.choices(list(EMOTION_WEIGHTS), weights=list(EMOTION_WEIGHTS.values()))[0],
+            location=location,
+            created_at=created_at,
+        )
+        if covers and self.random.random() < config.cover_ratio:
+            entry.cover_image = f"{COVERS_SUBDIR}/{self.random.choice(covers)['name']}"
+        # effective_date и координаты считаются от created_at, пока он не перезаписан вставкой
+        entry.set_derived_fields()
+        return entry
+
+    def create_entries(self, users):
+        covers, _ = get_manifest()
+        entries = []
+        for user in users:
+            entries += [self.entry_for(user, covers) for _ in range(self.config.entries_per_user)]
+        created = {id(entry): entry.created_at for entry in entries}
+
+        for chunk in self.chunks(entries):
+            Entry.objects.bulk_create(chunk)
+        pairs = [(entry.pk, created[id(entry)]) for entry in entries]
+        for chunk in self.chunks(pairs):
+            backdate(Entry, chunk, ['created_at', 'updated_at'])
+        for entry in entries:
+            entry.created_at = created[id(entry)]
+
+        self.link_hashtags(entries)
+        self.counts['entries'] = len(entries)
+        self.log(f'entries: {len(entries)}')
+        return entries
+
+    def link_hashtags(self, entries):
+        tags = get_or_create_hashtags(HASHTAGS)
+        links = []
+        deltas = {}
+        for entry in entries:
+            for name in parse_hashtags(entry.hashtags):
+                links.append(EntryHashtag(entry_id=entry.pk, hashtag=tags[name]))
+                if entry.is_public:
+                    key = (tags[name].id, timezone.localdate(entry.created_at))
+                    deltas[key] = deltas.get(key, 0) + 1
+        for chunk in self.chunks(links):
+            EntryHashtag.objects.bulk_create(chunk)
+        apply_hashtag_count_deltas([(tag_id, day, n) for (tag_id, day), n in deltas.items()])
+        self.counts['hashtag_links'] = len(links)
+
+    def create_emotions(self, users):
+        names = list(EMOTION_WEIGHTS)
+        weights = list(EMOTION_WEIGHTS.values())
+        emotions = []
+        moments = []
+        for user in users:
+            for _ in range(self.config.emotions_per_user):
+                emotions.append(Emotion(user=user, emotion_type=self.random.choices(names, weights=weights)[0]))
+                moments.append(self.random_moment())
+        for chunk in self.chunks(emotions):
+            Emotion.objects.bulk_create(chunk)
+        pairs = [(emotion.pk, moment) for emotion, moment in zip(emotions, moments)]
+        for chunk in self.chunks(pairs):
+            backdate(Emotion, chunk, ['timestamp', 'updated_at'])
+        for emotion, moment in zip(emotions, moments):
+            emotion.timestamp = moment
+        record_emotions(emotions)
+        self.counts['emotions'] = len(emotions)
+        self.log(f'emotions: {len(emotions)}')
+
+    def create_comments(self, users, entries):
+        comments = []
+        moments = []
+        for entry in entries:
+            if not entry.is_public:
+                continue
+            for _ in range(self.random.randint(0, 2 * self.config.comments_per_entry)):
+                comments.append(Comment(user=self.random.choice(users), entry=entry, text=self.faker.sentence()))
+                moments.append(self.random_moment(after=entry.created_at))
+        for chunk in self.chunks(comments):
+            Comment.objects.bulk_create(chunk)
+        pairs = [(comment.pk, moment) for comment, moment in zip(comments, moments)]
+        for chunk in self.chunks(pairs):
+            backdate(Comment, chunk, ['created_at', 'updated_at'])
+        self.counts['comments'] = len(comments)
+        self.log(f'comments: {len(comments)}')
+
+    def create_likes(self, users, entries):
+        likes = []
+        for entry in entries:
+            if not entry.is_public:
+                continue
+            count = min(self.random.randint(0, 2 * self.config.likes_per_entry), len(users))
+            likes += [Like(user=user, entry=entry) for user in self.random.sample(users, count)]
+        for chunk in self.chunks(likes):
+            Like.objects.bulk_create(chunk)
+        self.counts['likes'] = len(likes)
+        self.log(f'likes: {len(likes)}')
@@ -0,0 +1,216 @@
+"""
+Обработка загруженных изображений: обложек записей и фото профиля.
+
+После коммита транзакции загрузка уходит в ограниченный пул потоков, где
+Pillow поворачивает картинку по EXIF, отбрасывает метаданные и сохраняет
+набор уменьшенных копий в WebP и JPEG рядом с оригиналом (в подпапке
+variants/). Имена копий записываются в JSON-поле модели, откуда их
+отдают сериализаторы.
+
+Оригинал тоже отдаётся публично, поэтому сериализаторы пересохраняют его
+без метаданных (strip_metadata) ещё до записи в хранилище. Оригиналы,
+загруженные раньше, очищает process_instance (generate_image_variants --force).
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Набор копий: 'width' — ширина без увеличения, 'square' — квадратная обрезка
+VARIANT_SPECS = {
+    'cover': {'mode': 'width', 'sizes': [160, 480, 960, 1920]},
+    'avatar': {'mode': 'square', 'sizes': [64, 128, 256]},
+}
+
+FORMATS = [
+    ('webp', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+]
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+    thread_name_prefix='image-variants',
+)
+# Ограничиваем и очередь: при перегрузке задачу пропускаем, её догонит
+# команда generate_image_variants, а не рост памяти процесса
+_slots = threading.BoundedSemaphore(getattr(settings, 'IMAGE_VARIANT_MAX_PENDING', 32))
+
+
+# Параметры пересохранения оригинала по формату Pillow
+ORIGINAL_PARAMS = {
+    'JPEG': {'quality': 95},
+    'WEBP': {'quality': 95},
+}
+
+
+def strip_metadata(upload):
+    """
+    Возвращает загруженный файл, пересохранённый без EXIF/XMP (GPS, камера,
+    время съёмки), с уже применённым поворотом из EXIF. Имя файла сохраняется.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        data = _reencode(image)
+    return ContentFile(data, name=os.path.basename(upload.name))
+
+
+def has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in ('xmp', 'XML:com.adobe.xmp'))
+
+
+def _reencode(image):
+    fmt = image.format
+    params = dict(ORIGINAL_PARAMS.get(fmt, {}))
+    if icc_profile := image.info.get('icc_profile'):
+        params['icc_profile'] = icc_profile
+    buffer = io.BytesIO()
+    if getattr(image, 'is_animated', False):
+        # Кадры анимации не поворачиваем; exif без явного параметра не пишется
+        image.save(buffer, format=fmt, save_all=True, **params)
+    else:
+        image = ImageOps.exif_transpose(image)
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        image.save(buffer, format=fmt, **params)
+    return buffer.getvalue()
+
+
+def _strip_stored(image_file):
+    """Очищает уже сохранённый оригинал на месте; True, если файл переписан."""
+    with image_file.open('rb'):
+        image = Image.open(image_file)
+        if not has_metadata(image):
+            return False
+        data = _reencode(image)
+    # Пишем под тем же именем: модель и готовые ссылки остаются прежними
+    with default_storage.open(image_file.name, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def schedule_variants(instance, field_name, variants_field, kind):
+    """Ставит генерацию копий в очередь после коммита текущей транзакции."""
+    if not getattr(instance, field_name):
+        return
+    args = (type(instance), instance.pk, field_name, variants_field, kind)
+    transaction.on_commit(lambda: _submit(*args))
+
+
+def _submit(*args):
+    if getattr(settings, 'IMAGE_VARIANTS_SYNC', False):
+        process_instance(*args)
+        return
+    if not _slots.acquire(blocking=False):
+        logger.warning(f"Image variant queue is full, skipping {args[0].__name__} {args[1]}")
+        return
+    future = _executor.submit(_run_in_worker, *args)
+    future.add_done_callback(lambda _: _slots.release())
+
+
+def _run_in_worker(*args):
+    try:
+        process_instance(*args)
+    except Exception:
+        logger.exception(f"Error generating image variants for {args[0].__name__} {args[1]}")
+    finally:
+        # Поток пула держит собственное соединение с базой
+        close_old_connections()
+
+
+def process_instance(model, pk, field_name, variants_field, kind):
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    image_file = getattr(instance, field_name)
+    if not image_file:
+        return
+    name = image_file.name
+    _strip_stored(image_file)
+    variants = build_variants(image_file, kind)
+
+    # Файл могли заменить, пока шла обработка
+    instance.refresh_from_db(fields=[field_name])
+    if getattr(instance, field_name).name != name:
+        return
+    setattr(instance, variants_field, variants)
+    update_fields = [variants_field]
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # auto_now пишется только из update_fields: без него /api/sync/ не увидит копии
+        update_fields.append('updated_at')
+    # save(), а не update(): сигналы сбрасывают кэши ленты и профиля
+    instance.save(update_fields=update_fields)
+
+
+def build_variants(image_file, kind):
+    """
+    Генерирует копии и возвращает {'source': имя оригинала,
+    'webp': {ширина: имя файла}, 'jpeg': {...}}.
+    """
+    spec = VARIANT_SPECS[kind]
+    with image_file.open('rb'):
+        image = Image.open(image_file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    base, _ = os.path.splitext(image_file.name)
+    directory, stem = os.path.split(base)
+    result = {'source': image_file.name}
+    for fmt, _, _ in FORMATS:
+        result[fmt] = {}
+
+    for size in spec['sizes']:
+        if spec['mode'] == 'square':
+            resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            width = size
+        else:
+            width = min(size, image.width)
+            if str(width) in result['webp']:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+        for fmt, ext, params in FORMATS:
+            name = f"{directory}/variants/{stem}_{width}.{ext}"
+            result[fmt][str(width)] = _save(resized, name, fmt, params)
+
+    return result
+
+
+def _save(image, name, fmt, params):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG без прозрачности: подкладываем белый фон
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    buffer = io.BytesIO()
+    # exif не передаём, поэтому метаданные в копии не попадают
+    image.save(buffer, format=fmt.upper(), **params)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def variant_urls(image_file, variants, request=None):
+    """Карта URL копий для ответа API; None, если копии ещё не готовы."""
+    if not image_file or not variants or variants.get('source') != image_file.name:
+        return None
+    urls = {}
+    for fmt, _, _ in FORMATS:
+        urls[fmt] = {}
+        for width, name in variants.get(fmt, {}).items():
+            url = default_storage.url(name)
+            urls[fmt][width] = request.build_absolute_uri(url) if request else url
+    return urls
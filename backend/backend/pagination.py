@@ -0,0 +1,174 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework.versioning import QueryParameterVersioning
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по паре (created_at, id).
+
+    Страница выбирается условием WHERE по последней увиденной позиции,
+    поэтому не выполняются ни OFFSET, ни COUNT(*): стоимость страницы
+    не зависит от размера таблицы. Курсоры непрозрачные (base64 от JSON).
+    Поле сортировки можно переопределить во view через атрибут
+    `cursor_field` (например, 'timestamp' у эмоций или 'rank' в поиске).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 20
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field = getattr(view, 'cursor_field', self.cursor_field)
+
+        position, reverse = self.decode_cursor(request)
+
+        # Вперёд идём по убыванию, назад — по возрастанию, потом разворачиваем
+        if reverse:
+            queryset = queryset.order_by(self.field, 'pk')
+            lookup = 'gt'
+        else:
+            queryset = queryset.order_by(f'-{self.field}', '-pk')
+            lookup = 'lt'
+
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'pk__{lookup}': pk})
+            )
+
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                return self.page_size
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = payload['v']
+            if payload.get('d'):
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, (int, float)):
+                raise TypeError(value)
+            pk = int(payload['i'])
+            reverse = bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError, json.JSONDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), reverse
+
+    def encode_cursor(self, instance, reverse):
+        value = getattr(instance, self.field)
+        if isinstance(value, datetime):
+            payload = {'v': value.isoformat(), 'd': True, 'i': instance.pk}
+        else:
+            payload = {'v': value, 'i': instance.pk}
+        if reverse:
+            payload['r'] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ListVersioning(QueryParameterVersioning):
+    """
+    ?version= для списков с VersionedKeysetPagination. Задаётся только в их
+    view: остальные эндпоинты параметр version не проверяют.
+    """
+    default_version = '1'
+    allowed_versions = ('1', '2')
+
+
+class VersionedKeysetPagination(KeysetPagination):
+    """
+    Keyset-страницы для списков, которые раньше отдавались массивом целиком.
+
+    Прежние клиенты (без ?version= или с version=1) получают прежний ответ —
+    массив в том же порядке, но не длиннее API_LEGACY_LIST_LIMIT строк;
+    {next, previous, results} отдаётся с ?version=2 (view задаёт
+    versioning_class = ListVersioning). Ответ без версии устарел и будет
+    убран, когда клиенты перейдут на version=2.
+    """
+    paginated_versions = ('2',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = getattr(request, 'version', None) not in self.paginated_versions
+        if self.legacy:
+            field = getattr(view, 'cursor_field', self.cursor_field)
+            limit = getattr(settings, 'API_LEGACY_LIST_LIMIT', 1000)
+            return list(queryset.order_by(f'-{field}', '-pk')[:limit])
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return Response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,182 @@
+"""
+Профилировщик SQL-запросов по запросам к API (включается по требованию).
+
+Профилируется запрос с заголовком X-Profile-Queries (если разрешено
+QUERY_PROFILER_ALLOW_HEADER, по умолчанию выключено) и случайная доля
+QUERY_PROFILER_SAMPLE_RATE остальных. Для них через
+connection.execute_wrapper собираются все запросы: число, суммарное время,
+полные дубликаты и «похожие» запросы с одинаковым отпечатком (SQL без
+литералов) — признак N+1. Для самых медленных SELECT выполняется EXPLAIN.
+
+Итог уходит в заголовки X-Query-* и в скользящий отчёт в памяти процесса
+(QueryReportView). QUERY_PROFILER_BUDGETS задаёт лимит запросов для имён
+URL; при QUERY_PROFILER_STRICT профилируется каждый запрос, а превышение
+лимита поднимает QueryBudgetExceeded — так тесты падают на регрессиях.
+
+Потоковые ответы (экспорт, импорт, отчёты) читают базу уже при отдаче тела,
+после выхода из execute_wrapper. Их профиль был бы пустым, поэтому такие
+ответы помечаются X-Query-Profile: unavailable и в отчёт не попадают.
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+HEADER = 'HTTP_X_PROFILE_QUERIES'
+
+_report = deque(maxlen=getattr(settings, 'QUERY_PROFILER_REPORT_SIZE', 200))
+_report_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL без литералов и с IN (%s, %s, ...) → IN (...): одинаков у запросов N+1."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'time': time.perf_counter() - start,
+            })
+
+
+def explain(query):
+    if query['many'] or not query['sql'].lstrip().upper().startswith('SELECT'):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {query['sql']}", query['params'])
+            return '\n'.join(row[0] for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+
+
+def summarize(queries, explain_count):
+    duplicates = Counter((q['sql'], repr(q['params'])) for q in queries)
+    similar = Counter(fingerprint(q['sql']) for q in queries)
+    slowest = sorted(queries, key=lambda q: q['time'], reverse=True)[:explain_count]
+    return {
+        'count': len(queries),
+        'time_ms': round(sum(q['time'] for q in queries) * 1000, 2),
+        'duplicates': sum(n - 1 for n in duplicates.values() if n > 1),
+        'similar': [
+            {'fingerprint': sql, 'count': n}
+            for sql, n in similar.most_common() if n > 1
+        ],
+        'slowest': [
+            {'sql': q['sql'], 'time_ms': round(q['time'] * 1000, 2), 'explain': explain(q)}
+            for q in slowest
+        ],
+    }
+
+
+def get_report():
+    """Скользящий отчёт: последние профили и агрегаты по представлениям."""
+    with _report_lock:
+        profiles = list(_report)
+    views = {}
+    for profile in profiles:
+        stats = views.setdefault(profile['view'], {'requests': 0, 'queries': 0, 'max_queries': 0, 'time_ms': 0.0})
+        stats['requests'] += 1
+        stats['queries'] += profile['count']
+        stats['max_queries'] = max(stats['max_queries'], profile['count'])
+        stats['time_ms'] = round(stats['time_ms'] + profile['time_ms'], 2)
+    for stats in views.values():
+        stats['avg_queries'] = round(stats['queries'] / stats['requests'], 2)
+    return {'views': views, 'recent': profiles[-20:]}
+
+
+def clear_report():
+    with _report_lock:
+        _report.clear()
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if getattr(settings, 'QUERY_PROFILER_STRICT', False):
+            return True
+        if request.META.get(HEADER) and getattr(settings, 'QUERY_PROFILER_ALLOW_HEADER', False):
+            return True
+        rate = getattr(settings, 'QUERY_PROFILER_SAMPLE_RATE', 0.0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if response.streaming:
+            response['X-Query-Profile'] = 'unavailable'
+            return response
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else request.path
+        strict = getattr(settings, 'QUERY_PROFILER_STRICT', False)
+        # В строгом режиме (тесты) EXPLAIN не нужен и исказил бы подсчёт запросов
+        explain_count = 0 if strict else getattr(settings, 'QUERY_PROFILER_EXPLAIN_COUNT', 3)
+        summary = summarize(recorder.queries, explain_count)
+
+        response['X-Query-Count'] = str(summary['count'])
+        response['X-Query-Time-Ms'] = str(summary['time_ms'])
+        response['X-Query-Duplicates'] = str(summary['duplicates'])
+        response['X-Query-Similar'] = str(max((s['count'] for s in summary['similar']), default=0))
+
+        budget = getattr(settings, 'QUERY_PROFILER_BUDGETS', {}).get(view)
+        if budget is not None and summary['count'] > budget:
+            response['X-Query-Budget-Exceeded'] = f"{summary['count']}/{budget}"
+            if strict:
+                worst = summary['similar'][0]['fingerprint'] if summary['similar'] else ''
+                raise QueryBudgetExceeded(
+                    f"{request.method} {request.path} ({view}) made {summary['count']} queries, "
+                    f"budget is {budget}. Most repeated: {worst}"
+                )
+
+        with _report_lock:
+            _report.append({'view': view, 'method': request.method, 'path': request.path, **summary})
+        return response
+
+
+class QueryReportView(APIView):
+    """Скользящий отчёт профилировщика запросов (только для staff); DELETE очищает."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_report())
+
+    def delete(self, request):
+        clear_report()
+        return Response(status=204)
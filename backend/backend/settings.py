@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'corsheaders',
@@ -40,6 +41,8 @@ INSTALLED_APPS = [
     'like',
     'comments',
     'feedback',
+    'sync',
+    'analytics',
 ]
 
 # Middleware (corsheaders должен идти выше CommonMiddleware)
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.profiler.QueryProfilerMiddleware',    # профилирование SQL по запросу
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +91,61 @@ DATABASES = {
     }
 }
 
+# Кэш: по умолчанию в памяти процесса, в проде — общий бэкенд через переменные окружения
+# (например, CACHE_BACKEND=django.core.cache.backends.redis.RedisCache, CACHE_LOCATION=redis://...).
+# На версиях в кэше держатся ETag, страницы ленты и статистика эмоций: с LocMemCache при нескольких
+# воркерах сброс не доходит до других процессов, поэтому manage.py check --deploy требует общий кэш
+# (backend.E001)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'taimbook'),
+    }
+}
+
+# Время жизни закэшированных страниц публичной ленты, секунд
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', '300'))
+
+# Время жизни кэша рядов /api/emotions/series/, секунд (сбрасывается и при записи эмоций)
+EMOTION_SERIES_CACHE_TIMEOUT = int(os.getenv('EMOTION_SERIES_CACHE_TIMEOUT', '3600'))
+# Снимок помесячных эмоций профиля (?expand=monthly_emotions); сбрасывается по версии эмоций
+EMOTION_MONTHLY_SNAPSHOT_TIMEOUT = int(os.getenv('EMOTION_MONTHLY_SNAPSHOT_TIMEOUT', str(24 * 3600)))
+
+# Фоновый расчёт /api/emotions/insights/: число потоков, срок хранения результата;
+# SYNC=True считает прямо в запросе
+EMOTION_INSIGHTS_WORKERS = int(os.getenv('EMOTION_INSIGHTS_WORKERS', '1'))
+EMOTION_INSIGHTS_CACHE_TIMEOUT = int(os.getenv('EMOTION_INSIGHTS_CACHE_TIMEOUT', str(7 * 24 * 3600)))
+EMOTION_INSIGHTS_SYNC = os.getenv('EMOTION_INSIGHTS_SYNC', 'False') == 'True'
+
+# Фоновая генерация копий изображений (backend.images): число потоков
+# и максимум задач в очереди; SYNC=True обрабатывает прямо в запросе
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', '2'))
+IMAGE_VARIANT_MAX_PENDING = int(os.getenv('IMAGE_VARIANT_MAX_PENDING', '32'))
+IMAGE_VARIANTS_SYNC = os.getenv('IMAGE_VARIANTS_SYNC', 'False') == 'True'
+
+# Инкрементальная синхронизация (/api/sync/): размер страницы на ресурс,
+# перекрытие окна в секундах и срок хранения отметок об удалении
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', '5'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '90'))
+
+# Профилировщик SQL (backend.profiler): заголовок X-Profile-Queries,
+# доля случайно профилируемых запросов, лимиты запросов по имени URL и
+# строгий режим, в котором превышение лимита — исключение (для тестов)
+# Заголовок включается явно: EXPLAIN и отчёт не должны быть доступны любому клиенту
+QUERY_PROFILER_ALLOW_HEADER = os.getenv('QUERY_PROFILER_ALLOW_HEADER', 'False') == 'True'
+QUERY_PROFILER_SAMPLE_RATE = float(os.getenv('QUERY_PROFILER_SAMPLE_RATE', '0'))
+QUERY_PROFILER_EXPLAIN_COUNT = 3
+QUERY_PROFILER_REPORT_SIZE = 200
+QUERY_PROFILER_STRICT = os.getenv('QUERY_PROFILER_STRICT', 'False') == 'True'
+QUERY_PROFILER_BUDGETS = {
+    'entry-list': 6,
+    'entry-detail': 6,
+    'entry-public': 6,
+    'entry-public-by-user': 7,
+    'me': 6,
+}
+
 # Статические файлы
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -129,12 +188,23 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # Подзапросы /api/batch/ наследуют пользователя внешнего запроса
+        'backend.authentication.SubRequestAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    # Пагинация задаётся во view (backend.pagination). Списки, которые раньше
+    # отдавались массивом, пагинируются только с ?version=2
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '20')),
 }
 
+# Потолок длины списка для клиентов без ?version=2 (устаревший ответ массивом)
+API_LEGACY_LIST_LIMIT = int(os.getenv('API_LEGACY_LIST_LIMIT', '1000'))
+
+# PAGE_SIZE читает KeysetPagination, класс пагинации задаётся во view
+SILENCED_SYSTEM_CHECKS = ['rest_framework.W001']
+
 # Настройки JWT
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
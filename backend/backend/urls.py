@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .batch import BatchView
+from .profiler import QueryReportView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -12,4 +14,7 @@ urlpatterns = [
     path('api/like/', include('like.urls')),
     path('api/comments/', include('comments.urls')),
     path('api/feedback/', include('feedback.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    path('api/debug/queries/', QueryReportView.as_view(), name='query-report'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -7,11 +7,16 @@ class Comment(models.Model):
     entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['created_at']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            # Для /api/sync/
+            models.Index(fields=['user', 'updated_at'], name='comment_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} on {self.entry.title}: {self.text[:20]}"
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Emotion
+from .models import DailyEmotionStat, Emotion
 
 @admin.register(Emotion)
 class EmotionAdmin(admin.ModelAdmin):
@@ -8,3 +8,13 @@ class EmotionAdmin(admin.ModelAdmin):
     search_fields = ('user__username',)
     ordering = ('-timestamp',)
     date_hierarchy = 'timestamp'
+
+
+@admin.register(DailyEmotionStat)
+class DailyEmotionStatAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'joy', 'sadness', 'neutral')
+    search_fields = ('user__username',)
+    ordering = ('-day',)
+    date_hierarchy = 'day'
+    # Сводка ведётся автоматически, правка вручную разошлась бы с Emotion
+    readonly_fields = ('user', 'day', 'joy', 'sadness', 'neutral')
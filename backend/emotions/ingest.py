@@ -0,0 +1,87 @@
+"""
+Пакетная идемпотентная запись эмоций из очереди офлайн-клиента.
+
+Все элементы проверяются за один проход без запросов к базе, затем
+вставляются одним INSERT ... ON CONFLICT (user_id, idempotency_key)
+DO NOTHING RETURNING: повторная отправка того же ключа ничего не создаёт,
+а RETURNING точно говорит, какие строки вставлены, — только они попадают
+в дневную сводку (сигналы при такой вставке не срабатывают).
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Emotion
+from .rollup import apply_emotion_deltas, emotion_day
+from .serializers import EmotionBulkItemSerializer
+
+MAX_BULK_EMOTIONS = 500
+
+
+def _insert(user, items):
+    """Вставляет [(key, emotion_type, timestamp)]; возвращает {key: id} вставленных."""
+    table = Emotion._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (user_id, emotion_type, timestamp, updated_at, idempotency_key)
+            SELECT %s, v.emotion_type, v.ts, %s, v.key
+            FROM unnest(%s::varchar[], %s::varchar[], %s::timestamptz[]) AS v(key, emotion_type, ts)
+            ON CONFLICT (user_id, idempotency_key) DO NOTHING
+            RETURNING idempotency_key, id
+            """,
+            [
+                user.pk, timezone.now(),
+                [key for key, _, _ in items],
+                [emotion_type for _, emotion_type, _ in items],
+                [timestamp for _, _, timestamp in items],
+            ],
+        )
+        return dict(cursor.fetchall())
+
+
+@transaction.atomic
+def ingest_emotions(user, items):
+    """
+    Записывает эмоции из items и возвращает результаты в том же порядке:
+    status created, duplicate (ключ уже был — id существующей эмоции) или error.
+    """
+    now = timezone.now()
+    results = []
+    accepted = {}  # ключ -> (тип, время) первого элемента с этим ключом
+    for index, item in enumerate(items):
+        serializer = EmotionBulkItemSerializer(data=item)
+        key = item.get('idempotency_key') if isinstance(item, dict) else None
+        result = {'index': index, 'idempotency_key': key}
+        if not serializer.is_valid():
+            result.update(status='error', errors=serializer.errors)
+        else:
+            data = serializer.validated_data
+            # CharField обрезает пробелы и приводит числа к строке: в отчёте и
+            # сверке с RETURNING участвует тот же ключ, что ушёл в INSERT
+            result['idempotency_key'] = data['idempotency_key']
+            if data['idempotency_key'] not in accepted:
+                accepted[data['idempotency_key']] = (data['emotion_type'], data.get('client_timestamp') or now)
+                result['status'] = 'created'
+            else:
+                result['status'] = 'duplicate'
+        results.append(result)
+
+    created = _insert(user, [(key, emotion_type, ts) for key, (emotion_type, ts) in accepted.items()]) if accepted else {}
+    missing = [key for key in accepted if key not in created]
+    existing = dict(
+        Emotion.objects.filter(user=user, idempotency_key__in=missing).values_list('idempotency_key', 'id')
+    ) if missing else {}
+
+    for result in results:
+        key = result['idempotency_key']
+        if result['status'] == 'error':
+            continue
+        if key not in created:
+            # Ключ уже был в базе: прошлая отправка дошла
+            result['status'] = 'duplicate'
+        result['id'] = created.get(key) or existing.get(key)
+
+    apply_emotion_deltas(
+        (user.pk, emotion_day(accepted[key][1]), accepted[key][0], 1) for key in created
+    )
+    return results
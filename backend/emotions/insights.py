@@ -0,0 +1,270 @@
+"""
+Связь эмоций с днём недели, часом, хэштегами и местами.
+
+Один SQL-запрос отдаёт уже сгруппированные тройки (измерение, значение,
+эмоция) с числом наблюдений: день недели и час — по локальному времени
+эмоции, хэштеги и места — по записям того же дня (Entry.effective_date),
+место — ячейка geohash из GEOHASH_CELL символов (~5 км). Из них NumPy
+собирает таблицы сопряжённости и считает lift, стандартизованные остатки
+с p-значением, chi² и V Крамера. Эмоция дня с несколькими тегами
+учитывается у каждого из них, поэтому для тегов это эвристика, а не
+строгий тест независимости.
+
+Расчёт идёт в фоновом потоке, результат хранится в кэше с версией данных
+пользователя (эмоции и записи); пока он пересчитывается, отдаётся прошлый.
+"""
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from entries import feed_cache
+from entries.models import Entry, EntryHashtag, Hashtag
+from .models import Emotion
+from .rollup import EMOTION_TYPES, get_emotions_version
+
+logger = logging.getLogger(__name__)
+
+INSIGHTS_CACHE_TIMEOUT = getattr(settings, 'EMOTION_INSIGHTS_CACHE_TIMEOUT', 7 * 24 * 3600)
+GEOHASH_CELL = 5
+# Сколько самых частых тегов и мест попадает в таблицы
+MAX_KEYS = {'hashtag': 50, 'place': 20}
+# Минимум наблюдений в ячейке и порог p для «находок»
+MIN_SUPPORT = 5
+SIGNIFICANCE = 0.05
+MAX_HIGHLIGHTS = 10
+
+DIMENSIONS = ('weekday', 'hour', 'hashtag', 'place')
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'EMOTION_INSIGHTS_WORKERS', 1),
+    thread_name_prefix='emotion-insights',
+)
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def cache_key(user_id):
+    return f'emotions:insights:{user_id}'
+
+
+def data_version(user_id):
+    # Записи влияют на теги и места, эмоции — на всё
+    return f'{get_emotions_version(user_id)}:{feed_cache.get_user_version(user_id)}'
+
+
+def fetch_counts(user_id):
+    """Строки (измерение, значение, эмоция, число, подпись) одним запросом."""
+    emotions = Emotion._meta.db_table
+    entries = Entry._meta.db_table
+    links = EntryHashtag._meta.db_table
+    hashtags = Hashtag._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH em AS (
+                SELECT emotion_type, timestamp AT TIME ZONE %(tz)s AS local
+                FROM {emotions} WHERE user_id = %(user)s
+            ),
+            day_tags AS (
+                SELECT DISTINCT en.effective_date AS day, h.name
+                FROM {entries} en
+                JOIN {links} eh ON eh.entry_id = en.id
+                JOIN {hashtags} h ON h.id = eh.hashtag_id
+                WHERE en.user_id = %(user)s
+            ),
+            day_places AS (
+                SELECT effective_date AS day, LEFT(geohash, %(cell)s) AS cell, MAX(location->>'name') AS name
+                FROM {entries}
+                WHERE user_id = %(user)s AND geohash IS NOT NULL
+                GROUP BY 1, 2
+            )
+            SELECT 'weekday', EXTRACT(ISODOW FROM local)::int::text, emotion_type, COUNT(*), NULL
+            FROM em GROUP BY 2, 3
+            UNION ALL
+            SELECT 'hour', EXTRACT(HOUR FROM local)::int::text, emotion_type, COUNT(*), NULL
+            FROM em GROUP BY 2, 3
+            UNION ALL
+            SELECT 'hashtag', dt.name, em.emotion_type, COUNT(*), NULL
+            FROM em JOIN day_tags dt ON dt.day = em.local::date GROUP BY 2, 3
+            UNION ALL
+            SELECT 'place', dp.cell, em.emotion_type, COUNT(*), MAX(dp.name)
+            FROM em JOIN day_places dp ON dp.day = em.local::date GROUP BY 2, 3
+            """,
+            {'tz': timezone.get_current_timezone_name(), 'user': user_id, 'cell': GEOHASH_CELL},
+        )
+        return cursor.fetchall()
+
+
+# Коэффициенты приближения erfc(x) = t·exp(-x² + P(t)), t = 1 / (1 + x/2)
+# (Numerical Recipes, erfcc): относительная ошибка < 1.2e-7 при любом x ≥ 0
+_ERFC_COEFFS = (
+    -1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+    0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277,
+)
+
+
+def _erfc(x):
+    """erfc для массива x ≥ 0 целиком в NumPy (у math.erfc нет ufunc, SciPy не ставим)."""
+    t = 1.0 / (1.0 + 0.5 * x)
+    return t * np.exp(-x * x + np.polyval(_ERFC_COEFFS[::-1], t))
+
+
+def _normal_p(z):
+    """Двустороннее p-значение для стандартного нормального z."""
+    z = np.asarray(z, dtype=float)
+    with np.errstate(invalid='ignore'):
+        p = _erfc(np.abs(z) / math.sqrt(2))
+    return np.where(np.isnan(z), np.nan, np.minimum(p, 1.0))
+
+
+def contingency_stats(table):
+    """lift, z, p по ячейкам и chi², dof, V Крамера для таблицы значений × эмоций."""
+    table = np.asarray(table, dtype=float)
+    total = table.sum()
+    rows = table.sum(axis=1)
+    cols = table.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = np.outer(rows, cols) / total if total else np.zeros_like(table)
+        lift = np.where(expected > 0, table / expected, np.nan)
+        # Скорректированный остаток: при независимости ~ N(0, 1)
+        variance = expected * (1 - rows / total)[:, None] * (1 - cols / total)[None, :] if total else expected
+        z = np.where(variance > 0, (table - expected) / np.sqrt(variance), np.nan)
+        chi2 = float(np.sum(np.where(expected > 0, (table - expected) ** 2 / expected, 0.0)))
+    k = int((rows > 0).sum())
+    m = int((cols > 0).sum())
+    dof = max(k - 1, 0) * max(m - 1, 0)
+    cramers_v = math.sqrt(chi2 / (total * (min(k, m) - 1))) if total and min(k, m) > 1 else None
+    return {'lift': lift, 'z': z, 'p': _normal_p(z), 'chi2': chi2, 'dof': dof, 'cramers_v': cramers_v}
+
+
+def _round(value, digits=3):
+    return None if value is None or math.isnan(value) else round(float(value), digits)
+
+
+def build_dimension(name, rows):
+    """Таблица сопряжённости измерения из строк fetch_counts."""
+    if name == 'weekday':
+        keys = [str(day) for day in range(1, 8)]
+    elif name == 'hour':
+        keys = [str(hour) for hour in range(24)]
+    else:
+        keys = sorted({row[1] for row in rows})
+    labels = {row[1]: row[4] for row in rows if row[4]}
+
+    table = np.zeros((len(keys), len(EMOTION_TYPES)), dtype=np.int64)
+    if rows:
+        key_index = {key: i for i, key in enumerate(keys)}
+        positions = np.array([key_index[row[1]] for row in rows])
+        emotions = np.array([EMOTION_TYPES.index(row[2]) for row in rows])
+        np.add.at(table, (positions, emotions), np.array([row[3] for row in rows]))
+
+    if name in MAX_KEYS:
+        # Самые частые значения; порядок — по убыванию числа наблюдений
+        order = np.argsort(-table.sum(axis=1), kind='stable')[:MAX_KEYS[name]]
+        keys = [keys[i] for i in order]
+        table = table[order]
+
+    stats = contingency_stats(table)
+    values = []
+    for i, key in enumerate(keys):
+        if name == 'weekday':
+            label = WEEKDAYS[int(key) - 1]
+        elif name == 'hour':
+            label = f'{int(key):02d}:00'
+        else:
+            label = labels.get(key, key)
+        values.append({
+            'key': int(key) if name in ('weekday', 'hour') else key,
+            'label': label,
+            'total': int(table[i].sum()),
+            'counts': {t: int(table[i, j]) for j, t in enumerate(EMOTION_TYPES)},
+            'lift': {t: _round(stats['lift'][i, j]) for j, t in enumerate(EMOTION_TYPES)},
+            'z': {t: _round(stats['z'][i, j]) for j, t in enumerate(EMOTION_TYPES)},
+            'p': {t: _round(stats['p'][i, j], 4) for j, t in enumerate(EMOTION_TYPES)},
+        })
+    return {
+        'chi2': _round(stats['chi2']),
+        'dof': stats['dof'],
+        'cramers_v': _round(stats['cramers_v']),
+        'values': values,
+    }
+
+
+def compute_insights(user_id):
+    rows = fetch_counts(user_id)
+    by_dimension = {name: [row for row in rows if row[0] == name] for name in DIMENSIONS}
+    dimensions = {name: build_dimension(name, by_dimension[name]) for name in DIMENSIONS}
+
+    highlights = []
+    for name, dimension in dimensions.items():
+        for value in dimension['values']:
+            for emotion_type in EMOTION_TYPES:
+                p = value['p'][emotion_type]
+                if value['counts'][emotion_type] >= MIN_SUPPORT and p is not None and p < SIGNIFICANCE \
+                        and value['lift'][emotion_type] > 1:
+                    highlights.append({
+                        'dimension': name,
+                        'key': value['key'],
+                        'label': value['label'],
+                        'emotion': emotion_type,
+                        'count': value['counts'][emotion_type],
+                        'lift': value['lift'][emotion_type],
+                        'z': value['z'][emotion_type],
+                        'p': p,
+                    })
+    highlights.sort(key=lambda item: item['z'], reverse=True)
+    return {'dimensions': dimensions, 'highlights': highlights[:MAX_HIGHLIGHTS]}
+
+
+def refresh_insights(user_id):
+    # Версия берётся до чтения данных: запись во время расчёта сделает результат устаревшим
+    version = data_version(user_id)
+    data = compute_insights(user_id)
+    cache.set(cache_key(user_id), {
+        'version': version,
+        'computed_at': timezone.now().isoformat(),
+        'insights': data,
+    }, INSIGHTS_CACHE_TIMEOUT)
+
+
+def _run_in_worker(user_id):
+    try:
+        refresh_insights(user_id)
+    except Exception:
+        logger.exception(f"Error computing emotion insights for user {user_id}")
+    finally:
+        with _pending_lock:
+            _pending.discard(user_id)
+        close_old_connections()
+
+
+def schedule_refresh(user_id):
+    """Ставит пересчёт в фоновый поток; повторный вызов во время расчёта ничего не делает."""
+    if getattr(settings, 'EMOTION_INSIGHTS_SYNC', False):
+        refresh_insights(user_id)
+        return
+    with _pending_lock:
+        if user_id in _pending:
+            return
+        _pending.add(user_id)
+    _executor.submit(_run_in_worker, user_id)
+
+
+def get_insights(user_id):
+    """(status, cached) — ready, stale (идёт пересчёт) или pending (данных ещё нет)."""
+    cached = cache.get(cache_key(user_id))
+    if cached is not None and cached['version'] == data_version(user_id):
+        return 'ready', cached
+    schedule_refresh(user_id)
+    fresh = cache.get(cache_key(user_id))
+    if fresh is not None and fresh['version'] == data_version(user_id):
+        return 'ready', fresh
+    return ('stale', cached) if cached is not None else ('pending', None)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from emotions.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневную сводку эмоций (DailyEmotionStat) из таблицы Emotion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='ID пользователя (можно несколько раз), по умолчанию все')
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollup(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Emotion rollup rebuilt: {rows} daily rows'))
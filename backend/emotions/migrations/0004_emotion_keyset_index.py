@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emotions', '0003_delete_monthlyemotionstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emotion',
+            index=models.Index(fields=['user', '-timestamp', '-id'], name='emotion_user_ts_idx'),
+        ),
+    ]
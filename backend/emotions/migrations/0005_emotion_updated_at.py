@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def fill_updated_at(apps, schema_editor):
+    Emotion = apps.get_model('emotions', 'Emotion')
+    Emotion.objects.update(updated_at=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emotions', '0004_emotion_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emotion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='emotion',
+            index=models.Index(fields=['user', 'updated_at'], name='emotion_user_updated_idx'),
+        ),
+    ]
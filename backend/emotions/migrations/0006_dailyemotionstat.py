@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_rollup(apps, schema_editor):
+    DailyEmotionStat = apps.get_model('emotions', 'DailyEmotionStat')
+    Emotion = apps.get_model('emotions', 'Emotion')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {DailyEmotionStat._meta.db_table} (user_id, day, joy, sadness, neutral)
+            SELECT user_id, (timestamp AT TIME ZONE %s)::date AS day,
+                   COUNT(*) FILTER (WHERE emotion_type = 'joy'),
+                   COUNT(*) FILTER (WHERE emotion_type = 'sadness'),
+                   COUNT(*) FILTER (WHERE emotion_type = 'neutral')
+            FROM {Emotion._meta.db_table}
+            GROUP BY user_id, day
+            """,
+            [settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emotions', '0005_emotion_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEmotionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('joy', models.IntegerField(default=0)),
+                ('sadness', models.IntegerField(default=0)),
+                ('neutral', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_emotion_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_user_emotion_day')],
+            },
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
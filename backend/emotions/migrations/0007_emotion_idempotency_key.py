@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emotions', '0006_dailyemotionstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emotion',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='emotion',
+            constraint=models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_emotion_idempotency_key'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from users.models import User  # Импортируем пользовательскую модель напрямую
 
@@ -12,9 +12,73 @@ class Emotion(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='emotions')
     emotion_type = models.CharField(max_length=10, choices=EMOTION_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Ключ клиента для повторной отправки без дублей (POST /api/emotions/bulk/)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.emotion_type} at {self.timestamp}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rollup_key()
+        return instance
+
+    def remember_rollup_key(self):
+        # Значения из базы: по ним emotions.signals вычитает эмоцию из прежней строки сводки
+        loaded = self.__dict__
+        if all(name in loaded for name in ('user_id', 'timestamp', 'emotion_type')):
+            self._rollup_loaded = (self.user_id, self.timestamp, self.emotion_type)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.remember_rollup_key()
+
+    def save(self, *args, **kwargs):
+        # Строка и дельта сводки (post_save) фиксируются одной транзакцией
+        with transaction.atomic():
+            if self.pk is not None and not hasattr(self, '_rollup_loaded'):
+                # Экземпляр собран вручную или с отложенными полями: прежние значения берутся из базы
+                previous = Emotion.objects.filter(pk=self.pk).values_list('user_id', 'timestamp', 'emotion_type').first()
+                if previous is not None:
+                    self._rollup_loaded = previous
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='emotion_user_ts_idx'),
+            # Для /api/sync/
+            models.Index(fields=['user', 'updated_at'], name='emotion_user_updated_idx'),
+        ]
+        constraints = [
+            # NULL-ключи не конфликтуют: эмоции без ключа создаются как обычно
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_emotion_idempotency_key'),
+        ]
+
+
+class DailyEmotionStat(models.Model):
+    """
+    Число эмоций пользователя каждого типа за локальный день (TIME_ZONE).
+    Ведётся инкрементально в emotions.rollup, пересобирается командой
+    rebuild_emotion_rollup; из неё читается вся статистика эмоций.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_emotion_stats')
+    day = models.DateField()
+    joy = models.IntegerField(default=0)
+    sadness = models.IntegerField(default=0)
+    neutral = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Индекс ограничения покрывает выборки по пользователю и диапазону дней
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_user_emotion_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.day}: {self.joy}/{self.sadness}/{self.neutral}"
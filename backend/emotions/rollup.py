@@ -0,0 +1,100 @@
+"""
+Дневная сводка эмоций (DailyEmotionStat).
+
+Каждая вставка, изменение и удаление Emotion превращается в дельту
+(user_id, день, тип, ±1), которая применяется одним
+INSERT ... ON CONFLICT DO UPDATE в той же транзакции. Обычные save() и
+delete() обрабатываются сигналами (emotions.signals), Emotion.save() и
+delete() оборачивают запись и дельту в одну транзакцию; bulk_create и
+прочие массовые операции должны вызывать record_emotions сами, в
+транзакции с записью.
+
+После коммита дельта меняет версию данных эмоций пользователя — по ней
+строятся ключи кэша производной статистики (emotions.series).
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.conditional import bump_version_on_commit, get_version
+
+from .models import DailyEmotionStat, Emotion
+
+EMOTION_TYPES = [emotion_type for emotion_type, _ in Emotion.EMOTION_CHOICES]
+
+
+def version_key(user_id):
+    return f'emotions:user:{user_id}:version'
+
+
+def get_emotions_version(user_id):
+    return get_version(version_key(user_id))
+
+
+def emotion_day(timestamp):
+    """Локальный день эмоции — так же считаются месяцы в статистике."""
+    return timezone.localdate(timestamp)
+
+
+def apply_emotion_deltas(rows):
+    """Применяет четвёрки (user_id, day, emotion_type, delta) к сводке одним executemany."""
+    totals = {}
+    for user_id, day, emotion_type, delta in rows:
+        if emotion_type not in EMOTION_TYPES or not delta:
+            continue
+        counts = totals.setdefault((user_id, day), dict.fromkeys(EMOTION_TYPES, 0))
+        counts[emotion_type] += delta
+    if not totals:
+        return
+
+    table = DailyEmotionStat._meta.db_table
+    columns = ', '.join(EMOTION_TYPES)
+    placeholders = ', '.join(['%s'] * (len(EMOTION_TYPES) + 2))
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in EMOTION_TYPES)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"""
+            INSERT INTO {table} (user_id, day, {columns}) VALUES ({placeholders})
+            ON CONFLICT (user_id, day) DO UPDATE SET {updates}
+            """,
+            [
+                (user_id, day, *(counts[column] for column in EMOTION_TYPES))
+                for (user_id, day), counts in totals.items()
+            ],
+        )
+    for user_id in {user_id for user_id, _ in totals}:
+        bump_version_on_commit(version_key(user_id))
+
+
+def record_emotions(emotions, sign=1):
+    """Учитывает в сводке созданные (sign=1) или удалённые (sign=-1) в обход сигналов эмоции."""
+    apply_emotion_deltas(
+        (emotion.user_id, emotion_day(emotion.timestamp), emotion.emotion_type, sign)
+        for emotion in emotions
+    )
+
+
+@transaction.atomic
+def rebuild_rollup(user_ids=None):
+    """Пересчитывает сводку из Emotion целиком или для user_ids; возвращает число строк."""
+    table = DailyEmotionStat._meta.db_table
+    source = Emotion._meta.db_table
+    counts = ', '.join(f"COUNT(*) FILTER (WHERE emotion_type = '{column}')" for column in EMOTION_TYPES)
+    where, params = '', [timezone.get_current_timezone_name()]
+    if user_ids is not None:
+        where, params = 'WHERE user_id = ANY(%s)', params + [list(user_ids)]
+
+    with connection.cursor() as cursor:
+        # Блокировка не даёт параллельным upsert'ам попасть между DELETE и INSERT:
+        # они дождутся коммита и применятся поверх пересчитанных строк
+        cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'DELETE FROM {table} {where}', params[1:])
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (user_id, day, {', '.join(EMOTION_TYPES)})
+            SELECT user_id, (timestamp AT TIME ZONE %s)::date AS day, {counts}
+            FROM {source} {where}
+            GROUP BY user_id, day
+            """,
+            params,
+        )
+        return cursor.rowcount
@@ -1,7 +1,26 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Emotion
 
+# Допустимое расхождение часов клиента с сервером для client_timestamp
+CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+
+
 class EmotionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Emotion
         fields = ['id', 'emotion_type', 'timestamp']
+
+
+class EmotionBulkItemSerializer(serializers.Serializer):
+    """Элемент очереди офлайн-клиента для POST /api/emotions/bulk/."""
+    emotion_type = serializers.ChoiceField(choices=Emotion.EMOTION_CHOICES)
+    client_timestamp = serializers.DateTimeField(required=False)
+    idempotency_key = serializers.CharField(max_length=64)
+
+    def validate_client_timestamp(self, value):
+        if value > timezone.now() + CLIENT_CLOCK_SKEW:
+            raise serializers.ValidationError('client_timestamp is in the future')
+        return value
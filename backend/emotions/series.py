@@ -0,0 +1,217 @@
+"""
+Плотные временные ряды эмоций по дням, неделям или месяцам и аналитика
+поверх них: скользящие средние, индекс настроения и серии.
+
+Счётчики берутся одним сгруппированным запросом: из дневной сводки, если
+пояс запроса совпадает с поясом сервера (в нём посчитаны её дни), иначе
+из Emotion с переводом timestamp в пояс пользователя. Пустые интервалы
+заполняются нулями, вся аналитика — операции NumPy над массивами.
+Результат кэшируется по версии данных эмоций пользователя (emotions.rollup).
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import DailyEmotionStat, Emotion
+from .rollup import EMOTION_TYPES, get_emotions_version
+
+SERIES_CACHE_TIMEOUT = getattr(settings, 'EMOTION_SERIES_CACHE_TIMEOUT', 3600)
+MAX_BUCKETS = 1000
+MAX_WINDOW = 90
+BUCKETS = ('day', 'week', 'month')
+# Окно скользящего среднего и длина ряда по умолчанию, в интервалах
+DEFAULT_WINDOW = {'day': 7, 'week': 4, 'month': 3}
+DEFAULT_LENGTH = {'day': 30, 'week': 12, 'month': 12}
+# Серии считаются по интервалам, где эмоция была не реже любой другой
+STREAK_TYPES = ('joy', 'sadness')
+
+
+class SeriesError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SeriesParams:
+    bucket: str
+    tz: str
+    start: date
+    end: date
+    window: int
+
+    @property
+    def cache_key(self):
+        return f'{self.bucket}:{self.tz}:{self.start}:{self.end}:{self.window}'
+
+
+def bucket_start(value, bucket):
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise SeriesError(f'{name} must be a date in YYYY-MM-DD format')
+
+
+def parse_params(query_params):
+    bucket = query_params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise SeriesError(f"bucket must be one of: {', '.join(BUCKETS)}")
+
+    tz = query_params.get('tz') or timezone.get_current_timezone_name()
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise SeriesError(f'Unknown time zone: {tz}')
+
+    end = _parse_date(query_params['to'], 'to') if query_params.get('to') else timezone.localdate(timezone=zone)
+    if query_params.get('from'):
+        start = _parse_date(query_params['from'], 'from')
+    elif bucket == 'month':
+        month = end.year * 12 + end.month - DEFAULT_LENGTH['month']
+        start = date(month // 12, month % 12 + 1, 1)
+    else:
+        step = 7 if bucket == 'week' else 1
+        start = end - timedelta(days=step * (DEFAULT_LENGTH[bucket] - 1))
+    if start > end:
+        raise SeriesError('from must not be after to')
+    start = bucket_start(start, bucket)
+
+    try:
+        window = int(query_params.get('window', DEFAULT_WINDOW[bucket]))
+    except ValueError:
+        raise SeriesError('window must be an integer')
+    if not 1 <= window <= MAX_WINDOW:
+        raise SeriesError(f'window must be between 1 and {MAX_WINDOW}')
+
+    params = SeriesParams(bucket, tz, start, end, window)
+    if len(bucket_labels(params)) > MAX_BUCKETS:
+        raise SeriesError(f'The range is too long, at most {MAX_BUCKETS} buckets are allowed')
+    return params
+
+
+def bucket_labels(params):
+    """Начала интервалов от start до end: datetime64[M] для месяцев, иначе datetime64[D]."""
+    if params.bucket == 'month':
+        return np.arange(np.datetime64(params.start, 'M'), np.datetime64(params.end, 'M') + 1)
+    # Не datetime64[W]: его недели начинаются с четверга 1970-01-01, а не с понедельника
+    step = 7 if params.bucket == 'week' else 1
+    return np.arange(np.datetime64(params.start, 'D'), np.datetime64(params.end, 'D') + 1, step)
+
+
+def fetch_counts(user, params):
+    """[(начало интервала, {тип: число})] одним сгруппированным запросом."""
+    if params.tz == timezone.get_current_timezone_name():
+        rows = (
+            DailyEmotionStat.objects.filter(user=user, day__gte=params.start, day__lte=params.end)
+            .annotate(bucket=Trunc('day', params.bucket, output_field=DateField()))
+            .values('bucket')
+            .annotate(**{emotion_type: Sum(emotion_type) for emotion_type in EMOTION_TYPES})
+        )
+    else:
+        zone = ZoneInfo(params.tz)
+        rows = (
+            Emotion.objects.filter(
+                user=user,
+                timestamp__gte=datetime.combine(params.start, time.min, tzinfo=zone),
+                timestamp__lt=datetime.combine(params.end + timedelta(days=1), time.min, tzinfo=zone),
+            )
+            .annotate(bucket=Trunc('timestamp', params.bucket, output_field=DateField(), tzinfo=zone))
+            .values('bucket')
+            .annotate(**{
+                emotion_type: Count('pk', filter=Q(emotion_type=emotion_type))
+                for emotion_type in EMOTION_TYPES
+            })
+        )
+    return list(rows.order_by('bucket'))
+
+
+def moving_average(counts, window):
+    """Скользящее среднее по последним window интервалам (в начале ряда — по имеющимся)."""
+    n = counts.shape[1]
+    cumulative = np.concatenate([np.zeros((counts.shape[0], 1)), np.cumsum(counts, axis=1)], axis=1)
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[:, ends] - cumulative[:, starts]) / (ends - starts)
+
+
+def streaks(mask, skip_last):
+    """(самая длинная, текущая) серия подряд идущих True."""
+    if skip_last:
+        # Текущий интервал ещё не закончился: пустой не обрывает серию
+        mask = mask[:-1]
+    if not mask.size:
+        return 0, 0
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    longest = int((ends - starts).max()) if starts.size else 0
+    current = int(mask.size - starts[-1]) if mask[-1] else 0
+    return longest, current
+
+
+def _floats(values):
+    return [None if np.isnan(value) else round(float(value), 3) for value in values]
+
+
+def build_series(user, params):
+    labels = bucket_labels(params)
+    counts = np.zeros((len(EMOTION_TYPES), len(labels)), dtype=np.int64)
+    rows = fetch_counts(user, params)
+    if rows:
+        positions = np.searchsorted(labels, np.array([row['bucket'] for row in rows], dtype=labels.dtype))
+        counts[:, positions] = np.array([[row[t] for t in EMOTION_TYPES] for row in rows]).T
+
+    totals = counts.sum(axis=0)
+    joy, sadness = counts[EMOTION_TYPES.index('joy')], counts[EMOTION_TYPES.index('sadness')]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Индекс настроения: (радость − грусть) / все эмоции интервала, от −1 до 1
+        mood = np.where(totals > 0, (joy - sadness) / totals, np.nan)
+    averages = moving_average(counts, params.window)
+
+    today = timezone.localdate(timezone=ZoneInfo(params.tz))
+    last_is_open = params.end >= bucket_start(today, params.bucket) and totals.size and totals[-1] == 0
+    streak_result = {}
+    for emotion_type in STREAK_TYPES:
+        i = EMOTION_TYPES.index(emotion_type)
+        dominant = (counts[i] > 0) & np.all(counts[i] >= np.delete(counts, i, axis=0), axis=0)
+        longest, current = streaks(dominant, bool(last_is_open))
+        streak_result[emotion_type] = {'longest': longest, 'current': current}
+
+    overall = totals.sum()
+    return {
+        'bucket': params.bucket,
+        'tz': params.tz,
+        'from': params.start.isoformat(),
+        'to': params.end.isoformat(),
+        'window': params.window,
+        'buckets': [str(label) for label in labels],
+        'counts': {t: counts[i].tolist() for i, t in enumerate(EMOTION_TYPES)},
+        'total': totals.tolist(),
+        'moving_average': {t: _floats(averages[i]) for i, t in enumerate(EMOTION_TYPES)},
+        'mood_index': _floats(mood),
+        'mood_index_overall': round(float((joy.sum() - sadness.sum()) / overall), 3) if overall else None,
+        'streaks': streak_result,
+    }
+
+
+def get_series(user, params):
+    """build_series с кэшем; ключ меняется при любой записи эмоций пользователя."""
+    key = f'emotions:series:{user.pk}:{get_emotions_version(user.pk)}:{params.cache_key}'
+    data = cache.get(key)
+    if data is None:
+        data = build_series(user, params)
+        cache.set(key, data, SERIES_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,37 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from .models import Emotion
+from .rollup import apply_emotion_deltas, emotion_day
+
+ROLLUP_FIELDS = {'user', 'user_id', 'emotion_type', 'timestamp'}
+
+
+@receiver(post_save, sender=Emotion)
+def update_rollup_on_save(sender, instance, created, update_fields=None, **kwargs):
+    # Вызывается внутри транзакции Emotion.save(): строка и сводка не расходятся
+    current = (instance.user_id, emotion_day(instance.timestamp), instance.emotion_type)
+    previous = getattr(instance, '_rollup_loaded', None)
+    instance._rollup_loaded = (instance.user_id, instance.timestamp, instance.emotion_type)
+    if created:
+        apply_emotion_deltas([(*current, 1)])
+        return
+    if update_fields is not None and not ROLLUP_FIELDS & set(update_fields):
+        return
+    if previous is None:
+        return
+    user_id, timestamp, emotion_type = previous
+    previous = (user_id, emotion_day(timestamp), emotion_type)
+    if previous != current:
+        apply_emotion_deltas([(*previous, -1), (*current, 1)])
+
+
+@receiver(post_delete, sender=Emotion)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    # Collector.delete шлёт post_delete внутри своей транзакции.
+    # Строки сводки удаляются каскадом вместе с пользователем
+    if isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User):
+        return
+    apply_emotion_deltas([(instance.user_id, emotion_day(instance.timestamp), instance.emotion_type, -1)])
@@ -0,0 +1,195 @@
+"""
+Агрегаты по эмоциям, общие для API-статистики, профиля, админки и отчётов.
+
+Всё читается из дневной сводки DailyEmotionStat (emotions.rollup), поэтому
+стоимость запроса зависит от числа дней в диапазоне, а не от числа эмоций.
+Скользящие окна day/week/month начинаются посреди локального дня: целые дни
+берутся из сводки, а неполный первый день досчитывается по Emotion в пределах
+индекса (user, timestamp).
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import DailyEmotionStat, Emotion
+from .rollup import EMOTION_TYPES, get_emotions_version
+
+MONTHLY_SNAPSHOT_TIMEOUT = getattr(settings, 'EMOTION_MONTHLY_SNAPSHOT_TIMEOUT', 24 * 3600)
+
+
+def _sums():
+    return {emotion_type: Coalesce(Sum(emotion_type), 0) for emotion_type in EMOTION_TYPES}
+
+
+def emotion_totals(user, since=None):
+    """{'joy': n, 'sadness': n, 'neutral': n} начиная с локального дня since (или за всё время)."""
+    stats = DailyEmotionStat.objects.filter(user=user)
+    if since is not None:
+        stats = stats.filter(day__gte=since)
+    return stats.aggregate(**_sums())
+
+
+def monthly_breakdown(user, since=None, descending=False):
+    """Список {'month': date, 'joy': n, ...} по месяцам, в которых были эмоции."""
+    stats = DailyEmotionStat.objects.filter(user=user)
+    if since is not None:
+        stats = stats.filter(day__gte=since)
+    return list(
+        stats.annotate(month=TruncMonth('day'))
+        .values('month')
+        .annotate(**_sums())
+        .order_by('-month' if descending else 'month')
+    )
+
+
+def monthly_snapshot(user_id):
+    """
+    Помесячные эмоции профиля за всё время, от новых к старым. Снимок
+    хранится в кэше под версией эмоций пользователя, поэтому новая эмоция
+    делает его недействительным без отдельной инвалидации.
+    """
+    key = f'emotions:monthly:{user_id}:{get_emotions_version(user_id)}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = [
+            {
+                'month': row['month'].strftime('%B %Y'),
+                'joy': row['joy'],
+                'sadness': row['sadness'],
+                'neutral': row['neutral'],
+            }
+            for row in monthly_breakdown(user_id, descending=True)
+        ]
+        cache.set(key, snapshot, MONTHLY_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def _month_item(row):
+    return {
+        'month': row['month'].strftime('%Y-%m'),
+        'month_name': row['month'].strftime('%b %Y'),
+        'joy': row['joy'],
+        'sadness': row['sadness'],
+        'neutral': row['neutral'],
+    }
+
+
+def year_start():
+    """Начало окна помесячной статистики: первое число месяца год назад."""
+    return (timezone.localdate().replace(day=1) - timedelta(days=365)).replace(day=1)
+
+
+def monthly_stats(user):
+    """Число эмоций каждого типа по месяцам за последний год, по возрастанию месяца."""
+    return [_month_item(row) for row in monthly_breakdown(user, since=year_start())]
+
+
+# Скользящие окна, как до появления сводки: day — последние 24 часа,
+# week — 7 суток, month — 30 суток. Неизвестный период считается как month.
+ROLLING_PERIODS = {
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30),
+}
+
+# Календарный период: только текущий локальный день
+TODAY = 'today'
+
+PERIODS = (*ROLLING_PERIODS, TODAY)
+
+
+def rolling_window(period):
+    """
+    Возвращает (since, first_full_day, edge_end): начало окна, первый локальный
+    день, целиком попадающий в окно, и полночь, которой заканчивается неполный
+    первый день.
+    """
+    since = timezone.now() - ROLLING_PERIODS.get(period, ROLLING_PERIODS['month'])
+    first_full_day = timezone.localdate(since) + timedelta(days=1)
+    edge_end = timezone.make_aware(datetime.combine(first_full_day, time.min))
+    return since, first_full_day, edge_end
+
+
+def _edge_filter(since, edge_end):
+    return Q(timestamp__gte=since, timestamp__lt=edge_end)
+
+
+def period_totals(user, period):
+    """Суммы за period: скользящее окно из ROLLING_PERIODS или today."""
+    if period == TODAY:
+        return emotion_totals(user, since=timezone.localdate())
+    since, first_full_day, edge_end = rolling_window(period)
+    totals = emotion_totals(user, since=first_full_day)
+    edge = (
+        Emotion.objects.filter(_edge_filter(since, edge_end), user=user, emotion_type__in=EMOTION_TYPES)
+        .values('emotion_type')
+        .annotate(count=Count('id'))
+    )
+    for row in edge:
+        totals[row['emotion_type']] += row['count']
+    return totals
+
+
+def dashboard(user):
+    """
+    Все агрегаты экрана настроения двумя запросами. Сводка группируется по
+    месяцам, а суммы за периоды считаются там же через
+    SUM(...) FILTER (WHERE day >= ...) и складываются по месяцам в Python.
+    Неполные первые дни скользящих окон досчитываются вторым запросом по
+    Emotion с COUNT(...) FILTER на каждое окно.
+    """
+    windows = {period: rolling_window(period) for period in ROLLING_PERIODS}
+    starts = {period: first_full_day for period, (_, first_full_day, _) in windows.items()}
+    starts[TODAY] = timezone.localdate()
+
+    # Суммы по периодам объявляются раньше общих: иначе Sum('joy') сослался
+    # бы на одноимённую аннотацию, а не на столбец
+    annotations = {}
+    for period, since in starts.items():
+        for emotion_type in EMOTION_TYPES:
+            annotations[f'{period}_{emotion_type}'] = Coalesce(
+                Sum(emotion_type, filter=Q(day__gte=since)), 0
+            )
+    annotations.update(_sums())
+    months = list(
+        DailyEmotionStat.objects.filter(user=user)
+        .annotate(month=TruncMonth('day'))
+        .values('month')
+        .annotate(**annotations)
+        .order_by('month')
+    )
+
+    def total(prefix=''):
+        return {t: sum(row[f'{prefix}{t}'] for row in months) for t in EMOTION_TYPES}
+
+    current = timezone.localdate().replace(day=1)
+    current_row = next((row for row in months if row['month'] == current), None)
+    empty = dict.fromkeys(EMOTION_TYPES, 0)
+    result = {period: total(f'{period}_') for period in PERIODS}
+    edges = {period: _edge_filter(since, edge_end) for period, (since, _, edge_end) in windows.items()}
+    edge_rows = (
+        Emotion.objects.filter(Q(*edges.values(), _connector=Q.OR), user=user, emotion_type__in=EMOTION_TYPES)
+        .values('emotion_type')
+        .annotate(**{period: Count('id', filter=q) for period, q in edges.items()})
+    )
+    for row in edge_rows:
+        for period in ROLLING_PERIODS:
+            result[period][row['emotion_type']] += row[period]
+    result.update({
+        'all_time': total(),
+        'current_month': {
+            **({t: current_row[t] for t in EMOTION_TYPES} if current_row else empty),
+            'month': current.strftime('%B %Y'),
+        },
+        # Как stats/last_month/: последний месяц, в котором были эмоции
+        'last_month': (
+            {**{t: months[-1][t] for t in EMOTION_TYPES}, 'month': months[-1]['month'].strftime('%B %Y')}
+            if months else {**empty, 'month': None}
+        ),
+        'by_month': [_month_item(row) for row in months if row['month'] >= year_start()],
+    })
+    return result
@@ -1,3 +1,368 @@
-from django.test import TestCase
+import math
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from entries.hashtags import sync_entry_hashtags
+from entries.models import Entry
+from users.models import User
+from .insights import _normal_p, contingency_stats
+from .models import DailyEmotionStat, Emotion
+from .rollup import get_emotions_version, rebuild_rollup
+from .stats import emotion_totals, monthly_stats
+
+
+def rollup_rows(user):
+    return list(DailyEmotionStat.objects.filter(user=user).order_by('day').values_list('day', 'joy', 'sadness', 'neutral'))
+
+
+class EmotionRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='feeler', email='feeler@example.com', password='pass12345')
+
+    def test_rollup_follows_inserts_updates_and_deletes(self):
+        today = timezone.localdate()
+        joy = Emotion.objects.create(user=self.user, emotion_type='joy')
+        Emotion.objects.create(user=self.user, emotion_type='joy')
+        self.assertEqual(rollup_rows(self.user), [(today, 2, 0, 0)])
+
+        joy.emotion_type = 'sadness'
+        joy.save()
+        self.assertEqual(rollup_rows(self.user), [(today, 1, 1, 0)])
+
+        # Перенос в прошлое переносит и счётчик в другой день
+        joy.timestamp = timezone.now() - timedelta(days=40)
+        joy.save()
+        self.assertEqual(rollup_rows(self.user), [(timezone.localdate(joy.timestamp), 0, 1, 0), (today, 1, 0, 0)])
+
+        joy.delete()
+        self.assertEqual(emotion_totals(self.user), {'joy': 1, 'sadness': 0, 'neutral': 0})
+
+    def test_update_uses_loaded_state_without_extra_select(self):
+        emotion = Emotion.objects.create(user=self.user, emotion_type='joy')
+        emotion = Emotion.objects.get(pk=emotion.pk)
+        emotion.emotion_type = 'neutral'
+        with CaptureQueriesContext(connection) as queries:
+            emotion.save()
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')])
+        self.assertEqual(rollup_rows(self.user), [(timezone.localdate(), 0, 0, 1)])
+
+        # Экземпляр не из базы: прежние значения читаются перед записью
+        Emotion(pk=emotion.pk, user=self.user, emotion_type='sadness', timestamp=emotion.timestamp).save()
+        self.assertEqual(rollup_rows(self.user), [(timezone.localdate(), 0, 1, 0)])
+
+    def test_failed_rollup_rolls_back_emotion_and_keeps_version(self):
+        version = get_emotions_version(self.user.pk)
+        with mock.patch('emotions.signals.apply_emotion_deltas', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                Emotion.objects.create(user=self.user, emotion_type='joy')
+        self.assertFalse(Emotion.objects.filter(user=self.user).exists())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Emotion.objects.create(user=self.user, emotion_type='joy')
+            # До коммита версия прежняя: кэш не наполнится незафиксированными данными
+            self.assertEqual(get_emotions_version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_emotions_version(self.user.pk), version)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        for emotion_type in ['joy', 'neutral', 'neutral']:
+            Emotion.objects.create(user=self.user, emotion_type=emotion_type)
+        expected = rollup_rows(self.user)
+        DailyEmotionStat.objects.filter(user=self.user).update(joy=100)
+
+        out = StringIO()
+        call_command('rebuild_emotion_rollup', stdout=out)
+        self.assertIn('1 daily rows', out.getvalue())
+        self.assertEqual(rollup_rows(self.user), expected)
+        self.assertEqual(rebuild_rollup([self.user.pk]), 1)
+
+    def test_user_deletion_removes_rollup(self):
+        other = User.objects.create_user(username='gone', email='gone@example.com', password='pass12345')
+        Emotion.objects.create(user=other, emotion_type='joy')
+        other.delete()
+        self.assertFalse(DailyEmotionStat.objects.exists())
+
+
+class EmotionStatsEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='stats', email='stats@example.com', password='pass12345')
+        old = Emotion.objects.create(user=cls.user, emotion_type='sadness')
+        old.timestamp = timezone.now() - timedelta(days=20)
+        old.save()
+        Emotion.objects.create(user=cls.user, emotion_type='joy')
+        Emotion.objects.create(user=cls.user, emotion_type='neutral')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_period_and_all_time_stats(self):
+        self.assertEqual(self.client.get('/api/emotions/stats/week/').json(), {'joy': 1, 'sadness': 0, 'neutral': 1})
+        self.assertEqual(self.client.get('/api/emotions/stats/month/').json(), {'joy': 1, 'sadness': 1, 'neutral': 1})
+        self.assertEqual(self.client.get('/api/emotions/stats/all_time/').json(), {'joy': 1, 'sadness': 1, 'neutral': 1})
+        self.assertEqual(sum(m['sadness'] for m in monthly_stats(self.user)), 1)
+
+    def test_stats_cost_does_not_grow_with_emotion_count(self):
+        with CaptureQueriesContext(connection) as before:
+            self.client.get('/api/emotions/stats/month/')
+        for _ in range(20):
+            Emotion.objects.create(user=self.user, emotion_type='joy')
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get('/api/emotions/stats/month/')
+        self.assertEqual(response.json()['joy'], 21)
+        self.assertEqual(len(after), len(before))
+        # Сырые эмоции читаются только за неполный первый день окна
+        raw = [q['sql'] for q in after.captured_queries if 'emotions_emotion' in q['sql']]
+        self.assertEqual(len(raw), 1)
+        self.assertIn('"timestamp" <', raw[0])
+
+    def test_day_is_rolling_and_today_is_calendar(self):
+        midnight = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        for ts, emotion_type in [(midnight - timedelta(seconds=1), 'sadness'),
+                                 (timezone.now() - timedelta(hours=25), 'sadness')]:
+            emotion = Emotion.objects.create(user=self.user, emotion_type=emotion_type)
+            emotion.timestamp = ts
+            emotion.save()
+        self.assertEqual(self.client.get('/api/emotions/stats/day/').json(), {'joy': 1, 'sadness': 1, 'neutral': 1})
+        self.assertEqual(self.client.get('/api/emotions/stats/today/').json(), {'joy': 1, 'sadness': 0, 'neutral': 1})
+        self.assertEqual(self.client.get('/api/emotions/stats/week/').json(), {'joy': 1, 'sadness': 2, 'neutral': 1})
+
+
+class EmotionDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='mood', email='mood@example.com', password='pass12345')
+        for days_ago, emotion_type in [(0, 'joy'), (3, 'sadness'), (20, 'neutral'), (400, 'joy')]:
+            emotion = Emotion.objects.create(user=cls.user, emotion_type=emotion_type)
+            emotion.timestamp = timezone.now() - timedelta(days=days_ago)
+            emotion.save()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dashboard_matches_separate_endpoints_in_two_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/emotions/dashboard/').json()
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all('FILTER' in q['sql'] for q in queries.captured_queries))
+
+        for period in ['day', 'week', 'month', 'today']:
+            self.assertEqual(data[period], self.client.get(f'/api/emotions/stats/{period}/').json())
+        for name in ['all_time', 'last_month', 'current_month']:
+            self.assertEqual(data[name], self.client.get(f'/api/emotions/stats/{name}/').json())
+        self.assertEqual(data['by_month'], self.client.get('/api/emotions/stats/by_month/').json())
+        self.assertEqual(data['all_time'], {'joy': 2, 'sadness': 1, 'neutral': 1})
+        self.assertEqual(data['day']['joy'], 1)
+
+    def test_named_stats_routes_are_not_shadowed_by_period(self):
+        response = self.client.get('/api/emotions/stats/all_time/')
+        self.assertEqual(response.json()['joy'], 2)
+        self.assertIsInstance(self.client.get('/api/emotions/stats/by_month/').json(), list)
+
+
+class EmotionSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='series', email='series@example.com', password='pass12345')
+        # Радость 1–3 дня назад, грусть 5 дней назад, сегодня пусто
+        for days_ago, emotion_type in [(1, 'joy'), (2, 'joy'), (2, 'neutral'), (3, 'joy'), (5, 'sadness')]:
+            emotion = Emotion.objects.create(user=cls.user, emotion_type=emotion_type)
+            emotion.timestamp = timezone.now() - timedelta(days=days_ago)
+            emotion.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_daily_series_is_gap_filled_with_analytics(self):
+        today = timezone.localdate()
+        start = today - timedelta(days=6)
+        data = self.client.get('/api/emotions/series/', {'from': start.isoformat(), 'window': 2}).json()
+        self.assertEqual(data['buckets'][0], start.isoformat())
+        self.assertEqual(len(data['buckets']), 7)
+        self.assertEqual(data['counts']['joy'], [0, 0, 0, 1, 1, 1, 0])
+        self.assertEqual(data['counts']['sadness'], [0, 1, 0, 0, 0, 0, 0])
+        self.assertEqual(data['mood_index'][:2], [None, -1.0])
+        self.assertEqual(data['mood_index'][4], 0.5)
+        self.assertEqual(data['moving_average']['joy'][3:], [0.5, 1.0, 1.0, 0.5])
+        self.assertEqual(data['mood_index_overall'], 0.4)
+        # Пустое сегодня не обрывает текущую серию радости
+        self.assertEqual(data['streaks']['joy'], {'longest': 3, 'current': 3})
+        self.assertEqual(data['streaks']['sadness'], {'longest': 1, 'current': 0})
+
+    def test_other_time_zone_and_month_buckets_match_totals(self):
+        month = self.client.get('/api/emotions/series/', {'bucket': 'month'}).json()
+        self.assertEqual(len(month['buckets']), 12)
+        self.assertEqual(sum(month['total']), 5)
+        tokyo = self.client.get('/api/emotions/series/', {'bucket': 'week', 'tz': 'Asia/Tokyo'}).json()
+        self.assertEqual(tokyo['tz'], 'Asia/Tokyo')
+        self.assertEqual(sum(tokyo['counts']['joy']), 3)
+        self.assertTrue(all(date.fromisoformat(d).weekday() == 0 for d in tokyo['buckets']))
+
+    def test_cache_is_invalidated_by_new_emotions(self):
+        first = self.client.get('/api/emotions/series/').json()
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(self.client.get('/api/emotions/series/').json(), first)
+        self.assertEqual(len(cached), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Emotion.objects.create(user=self.user, emotion_type='sadness')
+        second = self.client.get('/api/emotions/series/').json()
+        self.assertEqual(second['counts']['sadness'][-1], 1)
+
+    def test_rejects_bad_parameters(self):
+        for params in [{'bucket': 'hour'}, {'tz': 'Mars/Base'}, {'from': '2024-13-01'},
+                       {'from': '2020-01-01', 'to': '2019-01-01'}, {'from': '1990-01-01'}, {'window': '0'}]:
+            self.assertEqual(self.client.get('/api/emotions/series/', params).status_code, 400, params)
+
+
+class EmotionBulkIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='offline', email='offline@example.com', password='pass12345')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, emotions):
+        response = self.client.post('/api/emotions/bulk/', {'emotions': emotions}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_flush_is_idempotent_and_reports_each_item(self):
+        week_ago = timezone.now() - timedelta(days=7)
+        queue = [
+            {'emotion_type': 'joy', 'client_timestamp': week_ago.isoformat(), 'idempotency_key': 'a'},
+            {'emotion_type': 'sadness', 'idempotency_key': 'b'},
+            {'emotion_type': 'joy', 'idempotency_key': 'a'},
+            {'emotion_type': 'anger', 'idempotency_key': 'c'},
+            {'emotion_type': 'neutral', 'client_timestamp': (timezone.now() + timedelta(days=1)).isoformat(),
+             'idempotency_key': 'd'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            data = self.post(queue)
+        self.assertEqual([r['status'] for r in data['results']], ['created', 'created', 'duplicate', 'error', 'error'])
+        self.assertEqual(data['results'][2]['id'], data['results'][0]['id'])
+        self.assertIn('emotion_type', data['results'][3]['errors'])
+        self.assertEqual((data['created'], data['duplicate'], data['error']), (2, 1, 2))
+        self.assertEqual(sum('INSERT INTO emotions_emotion' in q['sql'] for q in queries.captured_queries), 1)
+
+        joy = Emotion.objects.get(pk=data['results'][0]['id'])
+        self.assertEqual(joy.timestamp, week_ago)
+        self.assertEqual(emotion_totals(self.user), {'joy': 1, 'sadness': 1, 'neutral': 0})
+
+        # Повтор после обрыва связи: ничего нового, те же id
+        retry = self.post(queue[:2])
+        self.assertEqual([r['status'] for r in retry['results']], ['duplicate', 'duplicate'])
+        self.assertEqual([r['id'] for r in retry['results']], [r['id'] for r in data['results'][:2]])
+        self.assertEqual(Emotion.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(emotion_totals(self.user), {'joy': 1, 'sadness': 1, 'neutral': 0})
+
+    def test_reports_normalized_keys(self):
+        data = self.post([
+            {'emotion_type': 'joy', 'idempotency_key': ' padded '},
+            {'emotion_type': 'sadness', 'idempotency_key': 5},
+            {'emotion_type': 'joy', 'idempotency_key': 'padded'},
+        ])
+        results = data['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'created', 'duplicate'])
+        self.assertEqual([r['idempotency_key'] for r in results], ['padded', '5', 'padded'])
+        self.assertTrue(all(r['id'] for r in results))
+        self.assertEqual(results[2]['id'], results[0]['id'])
+        self.assertEqual(
+            set(Emotion.objects.filter(user=self.user).values_list('idempotency_key', flat=True)), {'padded', '5'},
+        )
+
+    def test_rejects_malformed_batches(self):
+        self.assertEqual(self.client.post('/api/emotions/bulk/', {'emotions': []}, format='json').status_code, 400)
+        too_many = [{'emotion_type': 'joy', 'idempotency_key': str(i)} for i in range(501)]
+        self.assertEqual(self.client.post('/api/emotions/bulk/', {'emotions': too_many}, format='json').status_code, 400)
+
+
+class EmotionInsightsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='insight', email='insight@example.com', password='pass12345')
+        # Дни со #sport — радость, остальные — грусть
+        for days_ago in range(1, 13):
+            sport = days_ago % 2 == 0
+            moment = timezone.now() - timedelta(days=days_ago)
+            entry = Entry.objects.create(
+                user=cls.user, title='Day', hashtags='#sport' if sport else '#work', date=timezone.localdate(moment),
+                location={'latitude': 55.75, 'longitude': 37.61, 'name': 'Moscow'} if sport else None,
+            )
+            sync_entry_hashtags(entry)
+            emotion = Emotion.objects.create(user=cls.user, emotion_type='joy' if sport else 'sadness')
+            emotion.timestamp = moment
+            emotion.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_contingency_stats_lift_and_residuals(self):
+        stats = contingency_stats([[30, 10, 0], [10, 30, 0]])
+        self.assertAlmostEqual(stats['lift'][0, 0], 1.5)
+        self.assertAlmostEqual(stats['chi2'], 20.0)
+        self.assertEqual(stats['dof'], 1)
+        self.assertAlmostEqual(stats['cramers_v'], 0.5)
+        self.assertLess(stats['p'][0, 0], 0.001)
+        self.assertTrue(np.isnan(stats['lift'][0, 2]))
+
+    def test_normal_p_matches_erfc(self):
+        z = np.array([[0.0, -1.96, 3.0], [8.5, np.nan, -np.inf]])
+        p = _normal_p(z)
+        for value, got in zip(z.flat, p.flat):
+            if math.isnan(value):
+                self.assertTrue(math.isnan(got))
+            else:
+                expected = math.erfc(abs(value) / math.sqrt(2))
+                # Относительная точность важна и для очень малых p
+                self.assertLessEqual(abs(got - expected), 2e-7 * expected)
+
+    @override_settings(EMOTION_INSIGHTS_SYNC=True)
+    def test_insights_link_emotions_to_hashtags_places_and_time(self):
+        data = self.client.get('/api/emotions/insights/').json()
+        self.assertEqual(data['status'], 'ready')
+        hashtags = {v['key']: v for v in data['dimensions']['hashtag']['values']}
+        self.assertEqual(hashtags['sport']['counts'], {'joy': 6, 'sadness': 0, 'neutral': 0})
+        self.assertEqual(hashtags['sport']['lift']['joy'], 2.0)
+        self.assertEqual([v['label'] for v in data['dimensions']['place']['values']], ['Moscow'])
+        self.assertEqual(len(data['dimensions']['weekday']['values']), 7)
+        self.assertEqual(sum(v['total'] for v in data['dimensions']['hour']['values']), 12)
+        self.assertEqual(data['highlights'][0]['emotion'], 'joy')
+        self.assertIn(data['highlights'][0]['dimension'], ('hashtag', 'place'))
+
+        with CaptureQueriesContext(connection) as cached:
+            self.assertEqual(self.client.get('/api/emotions/insights/').json(), data)
+        self.assertEqual(len(cached), 0)
+
+    def test_serves_stale_result_while_recomputing(self):
+        with mock.patch('emotions.insights.schedule_refresh') as schedule:
+            self.assertEqual(self.client.get('/api/emotions/insights/').status_code, 202)
+            schedule.assert_called_once_with(self.user.pk)
+        with override_settings(EMOTION_INSIGHTS_SYNC=True):
+            self.client.get('/api/emotions/insights/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Emotion.objects.create(user=self.user, emotion_type='neutral')
+        with mock.patch('emotions.insights.schedule_refresh'):
+            response = self.client.get('/api/emotions/insights/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'stale')
@@ -3,9 +3,14 @@ from .views import EmotionViewSet
 
 urlpatterns = [
     path('', EmotionViewSet.as_view({'get': 'list', 'post': 'create'})),
-    path('stats/<str:period>/', EmotionViewSet.as_view({'get': 'get_emotion_stats'})),
+    path('bulk/', EmotionViewSet.as_view({'post': 'bulk'})),
+    path('insights/', EmotionViewSet.as_view({'get': 'insights'})),
+    path('series/', EmotionViewSet.as_view({'get': 'series'})),
+    path('dashboard/', EmotionViewSet.as_view({'get': 'dashboard'})),
     path('stats/by_month/', EmotionViewSet.as_view({'get': 'get_monthly_stats'})),
     path('stats/current_month/', EmotionViewSet.as_view({'get': 'get_current_month_stats'})),
     path('stats/all_time/', EmotionViewSet.as_view({'get': 'get_all_time_stats'})),
     path('stats/last_month/', EmotionViewSet.as_view({'get': 'get_last_month_stats'})),
+    # Последним: иначе <period> перехватывает by_month, all_time и остальные
+    path('stats/<str:period>/', EmotionViewSet.as_view({'get': 'get_emotion_stats'})),
 ]
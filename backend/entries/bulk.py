@@ -0,0 +1,90 @@
+"""
+Массовые операции над своими записями набором SQL-запросов на все записи сразу.
+
+QuerySet.delete() при подключённых сигналах загружает каждую запись,
+комментарий и лайк и вызывает обработчики по одному. Здесь удаление — по
+одному DELETE ... WHERE entry_id = ANY(...) на таблицу, а работа сигналов
+(счётчики трендов, кэш ленты, отметки для синхронизации) делается
+агрегатами и сигналом entries_bulk_deleted.
+"""
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from comments.models import Comment
+from like.models import Like
+
+from .hashtags import apply_hashtag_count_deltas
+from .models import Entry, EntryHashtag
+from .signals import entries_bulk_deleted, invalidate_entry_pages
+
+MAX_BULK_IDS = 500
+BULK_UPDATE_FIELDS = ('is_public', 'emotion', 'date')
+
+
+def _hashtag_deltas(entry_ids, sign):
+    """Тройки (hashtag_id, day, ±число записей) для счётчиков трендов."""
+    if not entry_ids:
+        return []
+    rows = (
+        EntryHashtag.objects.filter(entry_id__in=entry_ids)
+        .annotate(day=TruncDate('entry__created_at'))
+        .values('hashtag_id', 'day')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    return [(row['hashtag_id'], row['day'], sign * row['n']) for row in rows]
+
+
+@transaction.atomic
+def bulk_delete_entries(user, ids):
+    """Удаляет записи пользователя из ids; возвращает id удалённых."""
+    found = list(
+        Entry.objects.select_for_update()
+        .filter(user=user, pk__in=ids)
+        .values_list('pk', 'is_public')
+    )
+    entry_ids = [pk for pk, _ in found]
+    if not entry_ids:
+        return []
+    public_ids = [pk for pk, is_public in found if is_public]
+    apply_hashtag_count_deltas(_hashtag_deltas(public_ids, -1))
+
+    comments = list(Comment.objects.filter(entry_id__in=entry_ids).values_list('pk', 'user_id'))
+    likes = list(Like.objects.filter(entry_id__in=entry_ids).values_list('pk', 'user_id'))
+    with connection.cursor() as cursor:
+        # Каскада на уровне БД нет, поэтому сначала зависимые таблицы
+        for model in (Like, Comment, EntryHashtag):
+            cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE entry_id = ANY(%s)', [entry_ids])
+        cursor.execute(f'DELETE FROM {Entry._meta.db_table} WHERE id = ANY(%s)', [entry_ids])
+
+    entries_bulk_deleted.send(
+        sender=Entry, user_id=user.pk, entry_ids=entry_ids, comments=comments, likes=likes,
+    )
+    invalidate_entry_pages(user.pk, bool(public_ids))
+    return entry_ids
+
+
+@transaction.atomic
+def bulk_update_entries(user, ids, changes):
+    """
+    Меняет поля из BULK_UPDATE_FIELDS у записей пользователя одним UPDATE;
+    возвращает число изменённых записей.
+    """
+    entries = Entry.objects.filter(user=user, pk__in=ids)
+    list(entries.select_for_update().values_list('pk', flat=True))
+
+    values = {field: changes[field] for field in BULK_UPDATE_FIELDS if field in changes}
+    if 'is_public' in values:
+        flipping = list(entries.exclude(is_public=values['is_public']).values_list('pk', flat=True))
+        apply_hashtag_count_deltas(_hashtag_deltas(flipping, 1 if values['is_public'] else -1))
+    if 'date' in values:
+        # Как в Entry.save(): дата записи или локальная дата создания
+        values['effective_date'] = values['date'] or TruncDate('created_at')
+    # update() не трогает auto_now, а по updated_at работает синхронизация
+    values['updated_at'] = timezone.now()
+
+    updated = entries.update(**values)
+    invalidate_entry_pages(user.pk, True)
+    return updated
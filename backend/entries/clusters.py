@@ -0,0 +1,133 @@
+"""
+Кластеры публичных записей для карты.
+
+Мир делится на тайлы в градусах (на зуме z — 2^z × 2^z тайлов по 360/2^z
+долготы и 180/2^z широты), каждый тайл — на сетку CELLS_PER_TILE ×
+CELLS_PER_TILE ячеек. Записи группируются по квантованным координатам
+одним GROUP BY, результат кэшируется по тайлам с версией публичной ленты,
+поэтому размер ответа ограничен числом видимых ячеек, а не объёмом данных.
+"""
+from django.core.cache import cache
+from django.db.models import Aggregate, Avg, CharField, Count, F, FloatField, Func, IntegerField
+from django.db.models.functions import Floor
+from django.contrib.postgres.aggregates import ArrayAgg
+
+from . import feed_cache
+from .models import Entry
+
+MAX_ZOOM = 18
+CELLS_PER_TILE = 8
+# Больше тайлов за запрос не отдаём: экран не вмещает
+MAX_TILES = 64
+SAMPLE_SIZE = 5
+
+
+class Mode(Aggregate):
+    """Самое частое значение (ordered-set агрегат PostgreSQL)."""
+    function = 'MODE'
+    template = '%(function)s() WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = CharField()
+
+
+class ArrayHead(Func):
+    """Первые size элементов массива."""
+    template = '(%(expressions)s)[1:%(size)s]'
+
+
+def tile_size(zoom):
+    return 360.0 / 2 ** zoom, 180.0 / 2 ** zoom
+
+
+def tile_ranges(bbox, zoom):
+    """((x0, x1), (y0, y1)) — включительные диапазоны тайлов, пересекающих bbox."""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    width, height = tile_size(zoom)
+    last = 2 ** zoom - 1
+    x0, x1 = int((min_lng + 180) // width), min(int((max_lng + 180) // width), last)
+    y0, y1 = int((min_lat + 90) // height), min(int((max_lat + 90) // height), last)
+    return (x0, x1), (y0, y1)
+
+
+def tile_count(bbox, zoom):
+    """Число тайлов bbox без их перечисления: проверка размера до tiles_for_bbox."""
+    (x0, x1), (y0, y1) = tile_ranges(bbox, zoom)
+    return max(x1 - x0 + 1, 0) * max(y1 - y0 + 1, 0)
+
+
+def tiles_for_bbox(bbox, zoom):
+    """Список (x, y) тайлов, пересекающих bbox = (min_lng, min_lat, max_lng, max_lat)."""
+    (x0, x1), (y0, y1) = tile_ranges(bbox, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def tile_key(version, zoom, x, y):
+    return f'map:{version}:{zoom}:{x}:{y}'
+
+
+def get_clusters(bbox, zoom):
+    """Кластеры в видимой области: из кэша тайлов, недостающие тайлы — одним запросом."""
+    tiles = tiles_for_bbox(bbox, zoom)
+    # Версия публичной ленты меняется при любой правке публичных записей
+    version = feed_cache.get_public_version()
+    keys = {tile: tile_key(version, zoom, *tile) for tile in tiles}
+    cached = cache.get_many(list(keys.values()))
+
+    by_tile = {tile: cached[key] for tile, key in keys.items() if key in cached}
+    missing = [tile for tile in tiles if tile not in by_tile]
+    if missing:
+        built = _build_tiles(missing, zoom)
+        cache.set_many({keys[tile]: built[tile] for tile in missing}, feed_cache.FEED_CACHE_TIMEOUT)
+        by_tile.update(built)
+
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return [
+        cluster
+        for tile in tiles
+        for cluster in by_tile[tile]
+        if min_lat <= cluster['lat'] <= max_lat and min_lng <= cluster['lng'] <= max_lng
+    ]
+
+
+def _build_tiles(tiles, zoom):
+    width, height = tile_size(zoom)
+    cell_width, cell_height = width / CELLS_PER_TILE, height / CELLS_PER_TILE
+    xs = [x for x, _ in tiles]
+    ys = [y for _, y in tiles]
+    # Прямоугольник, охватывающий все недостающие тайлы
+    min_lng, max_lng = min(xs) * width - 180, (max(xs) + 1) * width - 180
+    min_lat, max_lat = min(ys) * height - 90, (max(ys) + 1) * height - 90
+
+    rows = (
+        Entry.objects.filter(
+            is_public=True,
+            latitude__gte=min_lat, latitude__lt=max_lat,
+            longitude__gte=min_lng, longitude__lt=max_lng,
+        )
+        .annotate(
+            cell_x=Floor((F('longitude') + 180) / cell_width, output_field=IntegerField()),
+            cell_y=Floor((F('latitude') + 90) / cell_height, output_field=IntegerField()),
+        )
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('id'),
+            lat=Avg('latitude', output_field=FloatField()),
+            lng=Avg('longitude', output_field=FloatField()),
+            top_emotion=Mode('emotion'),
+            sample_ids=ArrayHead(ArrayAgg('id', ordering='-created_at'), size=SAMPLE_SIZE),
+        )
+        .order_by()
+    )
+
+    built = {tile: [] for tile in tiles}
+    last = 2 ** zoom - 1
+    for row in rows:
+        tile = (min(int(row['cell_x']) // CELLS_PER_TILE, last), min(int(row['cell_y']) // CELLS_PER_TILE, last))
+        if tile in built:
+            built[tile].append({
+                'lat': round(row['lat'], 6),
+                'lng': round(row['lng'], 6),
+                'count': row['count'],
+                'top_emotion': row['top_emotion'],
+                'sample_ids': row['sample_ids'],
+            })
+    return built
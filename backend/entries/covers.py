@@ -0,0 +1,116 @@
+"""
+Манифест стандартных обложек из MEDIA_ROOT/covers.
+
+Строится один раз и хранится в памяти процесса; при каждом запросе
+сверяется только mtime каталога (один stat). При изменении каталога
+заново обрабатываются лишь новые или изменённые файлы — сведения об
+остальных берутся из предыдущего манифеста по (имя, размер, mtime).
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+from PIL import Image, ImageFilter, ImageOps
+
+logger = logging.getLogger(__name__)
+
+COVERS_SUBDIR = 'covers'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+# Ширина размытого превью для плейсхолдера, px
+PLACEHOLDER_WIDTH = 16
+
+_lock = threading.Lock()
+_manifest = {'key': None, 'items': [], 'etag': None}
+_files = {}
+
+
+def covers_dir():
+    return os.path.join(settings.MEDIA_ROOT, COVERS_SUBDIR)
+
+
+def get_manifest():
+    """Возвращает (items, etag), перестраивая манифест при смене mtime каталога."""
+    directory = covers_dir()
+    try:
+        key = (directory, os.stat(directory).st_mtime_ns)
+    except FileNotFoundError:
+        return [], '"empty"'
+
+    if _manifest['key'] == key:
+        return _manifest['items'], _manifest['etag']
+    with _lock:
+        if _manifest['key'] != key:
+            items = _build(directory)
+            fingerprint = ';'.join(f"{item['name']}:{item['hash']}" for item in items)
+            digest = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+            _manifest.update(key=key, items=items, etag=f'"{digest}"')
+        return _manifest['items'], _manifest['etag']
+
+
+def _build(directory):
+    items = []
+    seen = {}
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        stat = entry.stat()
+        file_key = (entry.path, stat.st_size, stat.st_mtime_ns)
+        item = _files.get(file_key)
+        if item is None:
+            try:
+                item = _describe(entry.path, entry.name, stat.st_size)
+            except Exception as e:
+                logger.error(f"Error reading cover {entry.name}: {str(e)}")
+                continue
+        seen[file_key] = item
+        items.append(item)
+
+    # Сведения об удалённых и изменённых файлах не держим в памяти
+    _files.clear()
+    _files.update(seen)
+    return items
+
+
+def _describe(path, name, size):
+    with open(path, 'rb') as f:
+        content = f.read()
+    content_hash = hashlib.sha256(content).hexdigest()[:16]
+
+    image = Image.open(io.BytesIO(content))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    width, height = image.size
+
+    return {
+        'name': name,
+        # Хэш в URL позволяет клиенту кэшировать файл бессрочно
+        'url': f'{settings.MEDIA_URL}{COVERS_SUBDIR}/{name}?v={content_hash}',
+        'width': width,
+        'height': height,
+        'bytes': size,
+        'hash': content_hash,
+        'dominant_color': _dominant_color(image),
+        'placeholder': _placeholder(image),
+    }
+
+
+def _dominant_color(image):
+    small = image.copy()
+    small.thumbnail((64, 64))
+    palette_image = small.quantize(colors=5)
+    palette = palette_image.getpalette()
+    count, index = max(palette_image.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def _placeholder(image):
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='WEBP', quality=40)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
@@ -0,0 +1,82 @@
+"""
+Кэш сериализованных страниц публичной ленты на Django cache framework.
+
+Ключи страниц содержат версию (см. backend.conditional): общую для ленты
+public и отдельную для записей каждого автора. Сигналы из entries.signals
+меняют версию после коммита записи в Entry, Comment, Like и User, и старые
+страницы просто перестают читаться (их вытеснит TTL); до коммита версия
+прежняя, так что параллельный запрос не закэширует незафиксированные данные
+под новой. Те же версии служат валидаторами ETag для условных GET. Версии
+должны быть общими для воркеров — нужен общий кэш (backend.E001).
+Кэшируются только ответы анонимным пользователям: у авторизованных в ответе
+есть персональное поле liked_by_me.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from backend.conditional import bump_version_on_commit, get_version, request_fingerprint
+
+FEED_CACHE_TIMEOUT = getattr(settings, 'FEED_CACHE_TIMEOUT', 300)
+
+PUBLIC_VERSION_KEY = 'feed:public:version'
+HITS_KEY = 'feed:stats:hits'
+MISSES_KEY = 'feed:stats:misses'
+
+
+def user_version_key(user_id):
+    return f'feed:user:{user_id}:version'
+
+
+def get_public_version():
+    return get_version(PUBLIC_VERSION_KEY)
+
+
+def get_user_version(user_id):
+    return get_version(user_version_key(user_id))
+
+
+def bump_public_version():
+    bump_version_on_commit(PUBLIC_VERSION_KEY)
+
+
+def bump_user_version(user_id):
+    bump_version_on_commit(user_version_key(user_id))
+
+
+def public_page_key(request):
+    return f'feed:public:{get_public_version()}:{request_fingerprint(request)}'
+
+
+def user_page_key(request, user_id):
+    return f'feed:user:{user_id}:{get_user_version(user_id)}:{request_fingerprint(request)}'
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_or_build(key, build):
+    """Возвращает (данные, hit). build() вызывается только при промахе."""
+    data = cache.get(key)
+    if data is not None:
+        _incr(HITS_KEY)
+        return data, True
+    data = build()
+    cache.set(key, data, FEED_CACHE_TIMEOUT)
+    _incr(MISSES_KEY)
+    return data, False
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,116 @@
+"""
+Координаты записей: разбор Entry.location, geohash и расстояние по
+формуле гаверсинусов (в Python и в SQL).
+"""
+import math
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+# Километров в одном градусе широты
+KM_PER_DEGREE = 111.32
+GEOHASH_PRECISION = 12
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def parse_location(location):
+    """(lat, lng) из JSON Entry.location или (None, None), если координат нет или они вне диапазона."""
+    if not isinstance(location, dict):
+        return None, None
+    try:
+        lat = float(location.get('latitude'))
+        lng = float(location.get('longitude'))
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or math.isnan(lat) or math.isnan(lng):
+        return None, None
+    return lat, lng
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(высота, ширина) ячейки geohash заданной длины в градусах."""
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lng_bits = total_bits - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_geohashes(lat, lng, radius_km):
+    """
+    Префиксы geohash (ячейка точки и 8 соседних), покрывающие круг радиуса
+    radius_km. Длина выбирается максимальной, при которой ячейка не меньше
+    радиуса. Пустой список — круг слишком велик для фильтра по префиксу.
+    """
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = geohash_cell_size(precision)
+        if height * KM_PER_DEGREE >= radius_km and width * KM_PER_DEGREE * cos_lat >= radius_km:
+            break
+    else:
+        return []
+
+    prefixes = set()
+    for dlat in (-height, 0, height):
+        for dlng in (-width, 0, width):
+            cell_lat = min(max(lat + dlat, -90.0), 90.0)
+            cell_lng = (lng + dlng + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(cell_lat, cell_lng, precision))
+    return sorted(prefixes)
+
+
+def bounding_box(lat, lng, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng); долгота не ограничивается у полюсов и на антимеридиане."""
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(lat))
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if cos_lat < 1e-6 or max_lat >= 90.0 or min_lat <= -90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+    if lng - dlng < -180.0 or lng + dlng > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_expression(lat, lng, lat_field='latitude', lng_field='longitude'):
+    """Выражение Django для расстояния в км от точки до координат строки."""
+    dphi = Radians(F(lat_field) - Value(lat))
+    dlambda = Radians(F(lng_field) - Value(lng))
+    a = (
+        Power(Sin(dphi / 2), 2)
+        + Value(math.cos(math.radians(lat))) * Cos(Radians(F(lat_field))) * Power(Sin(dlambda / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Value(1.0), Sqrt(a)), output_field=FloatField())
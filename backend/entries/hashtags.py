@@ -0,0 +1,90 @@
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EntryHashtag, Hashtag, HashtagDailyCount
+
+MAX_HASHTAG_LENGTH = Hashtag._meta.get_field('name').max_length
+
+# Фронтенд разделяет хэштеги запятыми и/или пробелами
+HASHTAG_SPLIT_RE = re.compile(r'[\s,]+')
+
+
+def parse_hashtags(value):
+    """Разбирает строку Entry.hashtags в упорядоченный список уникальных имён тегов."""
+    if not value:
+        return []
+    names = []
+    for raw in HASHTAG_SPLIT_RE.split(value):
+        name = raw.lstrip('#').strip().lower()[:MAX_HASHTAG_LENGTH]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_hashtags(names):
+    """Возвращает {имя: Hashtag}, создавая недостающие теги одним INSERT."""
+    if not names:
+        return {}
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return {tag.name: tag for tag in Hashtag.objects.filter(name__in=names)}
+
+
+def bump_hashtag_counts(hashtag_ids, day, delta):
+    """Атомарно прибавляет delta к дневным счётчикам тегов (INSERT ... ON CONFLICT)."""
+    if not hashtag_ids or not delta:
+        return
+    apply_hashtag_count_deltas([(hashtag_id, day, delta) for hashtag_id in hashtag_ids])
+
+
+def apply_hashtag_count_deltas(rows):
+    """То же для набора троек (hashtag_id, day, delta) одним executemany."""
+    rows = [row for row in rows if row[2]]
+    if not rows:
+        return
+    table = HashtagDailyCount._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"""
+            INSERT INTO {table} (hashtag_id, day, count) VALUES (%s, %s, %s)
+            ON CONFLICT (hashtag_id, day) DO UPDATE SET count = {table}.count + EXCLUDED.count
+            """,
+            rows,
+        )
+
+
+def entry_day(entry):
+    return timezone.localdate(entry.created_at)
+
+
+@transaction.atomic
+def sync_entry_hashtags(entry, was_public=False):
+    """
+    Приводит связи записи с тегами в соответствие с entry.hashtags и
+    обновляет счётчики трендов. was_public — значение is_public до изменения
+    (False для новой записи).
+    """
+    current = {
+        link.hashtag.name: link.hashtag
+        for link in EntryHashtag.objects.filter(entry=entry).select_related('hashtag')
+    }
+    wanted = get_or_create_hashtags(parse_hashtags(entry.hashtags))
+
+    added = [tag for name, tag in wanted.items() if name not in current]
+    removed = [tag for name, tag in current.items() if name not in wanted]
+
+    if added:
+        EntryHashtag.objects.bulk_create(
+            [EntryHashtag(entry=entry, hashtag=tag) for tag in added],
+            ignore_conflicts=True,
+        )
+    if removed:
+        EntryHashtag.objects.filter(entry=entry, hashtag__in=removed).delete()
+
+    # В тренды попадают только теги публичных записей
+    counted_before = {tag.id for tag in current.values()} if was_public else set()
+    counted_after = {tag.id for tag in wanted.values()} if entry.is_public else set()
+    day = entry_day(entry)
+    bump_hashtag_counts(counted_after - counted_before, day, 1)
+    bump_hashtag_counts(counted_before - counted_after, day, -1)
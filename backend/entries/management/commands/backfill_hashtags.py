@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from entries.hashtags import get_or_create_hashtags, parse_hashtags
+from entries.models import Entry, EntryHashtag, HashtagDailyCount
+
+
+class Command(BaseCommand):
+    help = 'Заполняет связи записей с тегами из Entry.hashtags и пересчитывает счётчики трендов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        processed = 0
+
+        while True:
+            batch = list(
+                Entry.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', 'hashtags')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            parsed = {pk: parse_hashtags(hashtags) for pk, hashtags in batch}
+            with transaction.atomic():
+                tags = get_or_create_hashtags(sorted({name for names in parsed.values() for name in names}))
+                EntryHashtag.objects.filter(entry_id__in=parsed.keys()).delete()
+                EntryHashtag.objects.bulk_create([
+                    EntryHashtag(entry_id=pk, hashtag=tags[name])
+                    for pk, names in parsed.items()
+                    for name in names
+                ])
+
+            processed += len(batch)
+            self.stdout.write(f'Processed {processed} entries')
+
+        with transaction.atomic():
+            # Как в rebuild_rollup: upsert'ы из sync_entry_hashtags дождутся коммита
+            # и применятся поверх пересчитанных строк, а не пропадут между DELETE и INSERT
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {HashtagDailyCount._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+            HashtagDailyCount.objects.all().delete()
+            rows = (
+                EntryHashtag.objects.filter(entry__is_public=True)
+                .annotate(day=TruncDate('entry__created_at'))
+                .values('hashtag_id', 'day')
+                .annotate(count=Count('id'))
+                .order_by()
+            )
+            counters = HashtagDailyCount.objects.bulk_create(
+                [HashtagDailyCount(**row) for row in rows.iterator()],
+                batch_size=batch_size,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(counters)} daily hashtag counters'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from entries.geo import geohash_encode, parse_location
+from entries.models import Entry
+
+
+class Command(BaseCommand):
+    help = 'Заполняет latitude/longitude/geohash записей из Entry.location'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        processed = 0
+        located = 0
+
+        while True:
+            batch = list(
+                Entry.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .only('pk', 'location', 'latitude', 'longitude', 'geohash')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].pk
+
+            for entry in batch:
+                entry.latitude, entry.longitude = parse_location(entry.location)
+                entry.geohash = geohash_encode(entry.latitude, entry.longitude) if entry.latitude is not None else None
+                located += entry.latitude is not None
+            Entry.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+
+            processed += len(batch)
+            self.stdout.write(f'Processed {processed} entries')
+
+        self.stdout.write(self.style.SUCCESS(f'{located} of {processed} entries have coordinates'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from entries.reports import build_workbook, report_filename
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Формирует XLSX-отчёт по записям и эмоциям пользователя'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='ID, email или username пользователя')
+        parser.add_argument('--output', help='Путь к файлу (по умолчанию taimbook-<username>-<дата>.xlsx)')
+
+    def handle(self, *args, **options):
+        lookup = options['user']
+        query = Q(email=lookup) | Q(username=lookup)
+        if lookup.isdigit():
+            query |= Q(pk=int(lookup))
+        user = User.objects.filter(query).first()
+        if user is None:
+            raise CommandError(f'User "{lookup}" does not exist')
+
+        output = options['output'] or report_filename(user)
+        build_workbook(user, output)
+        self.stdout.write(self.style.SUCCESS(f'Report for {user.username} written to {output}'))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.dataset import DatasetConfig, DatasetGenerator, dataset_users
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетический набор данных (Faker, bulk insert) для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        defaults = DatasetConfig()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--entries-per-user', type=int, default=defaults.entries_per_user)
+        parser.add_argument('--emotions-per-user', type=int, default=defaults.emotions_per_user)
+        parser.add_argument('--comments-per-entry', type=int, default=defaults.comments_per_entry,
+                            help='Среднее число комментариев к публичной записи')
+        parser.add_argument('--likes-per-entry', type=int, default=defaults.likes_per_entry,
+                            help='Среднее число лайков публичной записи')
+        parser.add_argument('--years', type=int, default=defaults.years, help='За сколько лет распределить даты')
+        parser.add_argument('--prefix', default=defaults.prefix, help='Префикс username сгенерированных пользователей')
+        parser.add_argument('--password', default=defaults.password)
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+        parser.add_argument('--flush', action='store_true',
+                            help='Сначала удалить пользователей с этим префиксом и все их данные')
+
+    def handle(self, *args, **options):
+        config = DatasetConfig(
+            users=options['users'],
+            entries_per_user=options['entries_per_user'],
+            emotions_per_user=options['emotions_per_user'],
+            comments_per_entry=options['comments_per_entry'],
+            likes_per_entry=options['likes_per_entry'],
+            years=options['years'],
+            prefix=options['prefix'],
+            password=options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        if not config.prefix:
+            raise CommandError('--prefix must not be empty')
+        if options['flush']:
+            deleted, _ = dataset_users(config.prefix).delete()
+            self.stdout.write(f'Deleted {deleted} existing objects')
+
+        try:
+            counts = DatasetGenerator(config, log=self.stdout.write).generate()
+        except ValueError as e:
+            raise CommandError(str(e))
+        summary = ', '.join(f'{name}: {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Dataset generated ({summary})'))
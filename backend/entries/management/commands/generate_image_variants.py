@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from backend.images import process_instance
+from entries.models import Entry
+from users.models import User
+
+TARGETS = [
+    (Entry, 'cover_image', 'cover_variants', 'cover'),
+    (User, 'profile_photo', 'profile_photo_variants', 'avatar'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Генерирует уменьшенные копии обложек и фото профиля, которых ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать копии для всех изображений')
+
+    def handle(self, *args, **options):
+        for model, field_name, variants_field, kind in TARGETS:
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            processed = 0
+            for pk, name, variants in queryset.values_list('pk', field_name, variants_field).iterator():
+                if not options['force'] and variants.get('source') == name:
+                    continue
+                try:
+                    process_instance(model, pk, field_name, variants_field, kind)
+                    processed += 1
+                except Exception as e:
+                    self.stderr.write(f'{model.__name__} {pk}: {e}')
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: processed {processed} images'))
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.benchmark import SCENARIOS_BY_NAME, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Замеряет пропускную способность и p50/p95/p99 задержки эндпоинтов API, результат — JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='Адрес запущенного сервера; без него запросы идут внутри процесса')
+        parser.add_argument('--endpoint', action='append', choices=sorted(SCENARIOS_BY_NAME), dest='endpoints',
+                            help='Эндпоинт для замера (можно несколько раз), по умолчанию все чтения')
+        parser.add_argument('--include-writes', action='store_true',
+                            help='Замерять и сценарии с записью (каждый запрос отменяется парным)')
+        parser.add_argument('--requests', type=int, default=200, help='Число запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=10, help='Запросов на прогрев перед замером')
+        parser.add_argument('--prefix', default='bench_', help='Префикс пользователей из generate_dataset')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive')
+        log = self.stderr.write if not options['output'] else self.stdout.write
+        try:
+            report = run_benchmark(
+                prefix=options['prefix'],
+                scenarios=options['endpoints'],
+                requests_count=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                base_url=options['base_url'],
+                seed=options['seed'],
+                log=log,
+                include_writes=options['include_writes'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        data = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(data)
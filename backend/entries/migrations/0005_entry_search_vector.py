@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 19:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Русская и английская конфигурации, как и у запроса в EntryViewSet.search
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce({row}.content, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}.content, '')), 'B') ||
+    setweight(to_tsvector('russian', replace(coalesce({row}.hashtags, ''), ',', ' ')), 'C') ||
+    setweight(to_tsvector('english', replace(coalesce({row}.hashtags, ''), ',', ' ')), 'C')
+"""
+
+CREATE_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION entries_entry_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER entries_entry_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, content, hashtags ON entries_entry
+    FOR EACH ROW EXECUTE FUNCTION entries_entry_search_vector_update();
+
+UPDATE entries_entry SET search_vector = {SEARCH_VECTOR_SQL.format(row='entries_entry')};
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS entries_entry_search_vector_trigger ON entries_entry;
+DROP FUNCTION IF EXISTS entries_entry_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0004_entry_emotion_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='entry_search_vector_gin'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0005_entry_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EntryHashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entry_hashtags', to='entries.entry')),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entry_hashtags', to='entries.hashtag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='entries', through='entries.EntryHashtag', to='entries.hashtag'),
+        ),
+        migrations.CreateModel(
+            name='HashtagDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='entries.hashtag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entryhashtag',
+            index=models.Index(fields=['hashtag', 'entry'], name='entryhashtag_hashtag_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='entryhashtag',
+            constraint=models.UniqueConstraint(fields=('entry', 'hashtag'), name='unique_entry_hashtag'),
+        ),
+        migrations.AddIndex(
+            model_name='hashtagdailycount',
+            index=models.Index(fields=['day'], name='hashtagdailycount_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hashtagdailycount',
+            constraint=models.UniqueConstraint(fields=('hashtag', 'day'), name='unique_hashtag_day'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 19:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def fill_effective_date(apps, schema_editor):
+    Entry = apps.get_model('entries', 'Entry')
+    Entry.objects.update(effective_date=Coalesce('date', TruncDate('created_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0006_hashtags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='effective_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_effective_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='entry',
+            name='effective_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['user', 'effective_date'], name='entry_user_eff_date_idx'),
+        ),
+    ]
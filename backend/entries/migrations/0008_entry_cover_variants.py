@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entries', '0007_entry_effective_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,5 +1,43 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from users.models import User  # Импортируем пользовательскую модель напрямую
+from .geo import geohash_encode, parse_location
+
+
+class EntryQuerySet(models.QuerySet):
+    def with_engagement(self, user=None):
+        """
+        Добавляет автора и счётчики comments_count, likes_count, liked_by_me
+        коррелированными подзапросами, чтобы сериализация списка не делала
+        по запросу на каждую запись.
+        """
+        # Импорт внутри метода: comments и like сами импортируют Entry
+        from comments.models import Comment
+        from like.models import Like
+
+        comments = (
+            Comment.objects.filter(entry=OuterRef('pk'))
+            .order_by().values('entry').annotate(c=Count('id')).values('c')
+        )
+        likes = (
+            Like.objects.filter(entry=OuterRef('pk'))
+            .order_by().values('entry').annotate(c=Count('id')).values('c')
+        )
+        if user is not None and user.is_authenticated:
+            liked_by_me = Exists(Like.objects.filter(entry=OuterRef('pk'), user=user))
+        else:
+            liked_by_me = Value(False)
+
+        return self.select_related('user').annotate(
+            comments_count=Coalesce(Subquery(comments), 0),
+            likes_count=Coalesce(Subquery(likes), 0),
+            liked_by_me=liked_by_me,
+        )
+
 
 class Entry(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entries')
@@ -13,17 +51,106 @@ class Entry(models.Model):
     is_strikethrough = models.BooleanField(default=False)  # Зачеркнутый текст
     list_type = models.CharField(max_length=10, null=True, blank=True)  # Тип списка (unordered/ordered)
     location = models.JSONField(null=True, blank=True)  # Местоположение в формате JSON
+    # Координаты из location для индексов и запросов «рядом»; заполняются в save()
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, null=True, blank=True, editable=False)
     cover_image = models.ImageField(upload_to='entries/covers/', null=True, blank=True)
+    # Уменьшенные копии обложки, заполняются фоново (backend.images)
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
     date = models.DateField(null=True, blank=True)  # Дата записи
+    # date, а если её нет — локальная дата created_at; заполняется в save()
+    effective_date = models.DateField(editable=False)
     hashtags = models.TextField(null=True, blank=True)  # Хэштеги через запятую
     is_public = models.BooleanField(default=False)  # Флаг публичности записи
     emotion = models.CharField(max_length=10, null=True, blank=True) # Эмоция связанная с записью
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # tsvector по title/content/hashtags, заполняется триггером в БД (миграция 0005)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    tags = models.ManyToManyField('Hashtag', through='EntryHashtag', related_name='entries', blank=True)
+
+    objects = EntryQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Entries'
+        indexes = [
+            # Индексы под keyset-пагинацию по (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='entry_user_created_idx'),
+            models.Index(fields=['is_public', '-created_at', '-id'], name='entry_public_created_idx'),
+            GinIndex(fields=['search_vector'], name='entry_search_vector_gin'),
+            # Для календаря и by_date
+            models.Index(fields=['user', 'effective_date'], name='entry_user_eff_date_idx'),
+            # Для /nearby/: префиксный LIKE по geohash и диапазон по координатам
+            models.Index(fields=['geohash'], name='entry_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['latitude', 'longitude'], name='entry_lat_lng_idx'),
+            # Для /api/sync/
+            models.Index(fields=['user', 'updated_at'], name='entry_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+    def set_derived_fields(self):
+        """Заполняет effective_date и координаты; вызывать и перед bulk_create."""
+        created = timezone.localdate(self.created_at) if self.created_at else timezone.localdate()
+        self.effective_date = self.date or created
+        self.latitude, self.longitude = parse_location(self.location)
+        self.geohash = geohash_encode(self.latitude, self.longitude) if self.latitude is not None else None
+
+    def save(self, *args, **kwargs):
+        self.set_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = set()
+            if 'date' in update_fields:
+                derived.add('effective_date')
+            if 'location' in update_fields:
+                derived.update({'latitude', 'longitude', 'geohash'})
+            if derived:
+                kwargs['update_fields'] = {*update_fields, *derived}
+        super().save(*args, **kwargs)
+
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # Без '#', в нижнем регистре
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class EntryHashtag(models.Model):
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name='entry_hashtags')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='entry_hashtags')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entry', 'hashtag'], name='unique_entry_hashtag'),
+        ]
+        indexes = [
+            # Для выборки "записи с тегом X"
+            models.Index(fields=['hashtag', 'entry'], name='entryhashtag_hashtag_idx'),
+        ]
+
+
+class HashtagDailyCount(models.Model):
+    """
+    Инкрементальный счётчик использования тега в публичных записях по дням
+    (день создания записи). Обновляется в entries.hashtags, а не агрегатом.
+    """
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='daily_counts')
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hashtag', 'day'], name='unique_hashtag_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='hashtagdailycount_day_idx'),
+        ]
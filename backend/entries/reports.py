@@ -0,0 +1,125 @@
+"""
+XLSX-отчёт по дневнику пользователя: листы «Записи», «Эмоции по месяцам»
+(те же числа, что /api/emotions/stats/by_month/) и «Сводка».
+
+Книга строится в write-only режиме openpyxl: строки листов сразу уходят во
+временные файлы, а записи читаются серверным курсором (.iterator()), так что
+память не зависит от объёма дневника. Готовый ZIP-контейнер XLSX openpyxl
+собирает при save(); он пишется во временный файл, который отдаётся
+клиенту кусками.
+"""
+import tempfile
+
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from emotions.models import Emotion
+from emotions.stats import emotion_totals, monthly_stats
+
+from .models import Entry
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CHUNK_SIZE = 64 * 1024
+ITERATOR_CHUNK_SIZE = 1000
+# Предел длины текста в ячейке Excel
+MAX_CELL_LENGTH = 32767
+
+ENTRY_COLUMNS = [
+    ('Дата', 'effective_date'),
+    ('Создана', 'created_at'),
+    ('Заголовок', 'title'),
+    ('Эмоция', 'emotion'),
+    ('Хэштеги', 'hashtags'),
+    ('Публичная', 'is_public'),
+    ('Комментарии', 'comments_count'),
+    ('Лайки', 'likes_count'),
+    ('Текст', 'content'),
+]
+
+
+def report_filename(user):
+    return f"taimbook-{user.username}-{timezone.localdate():%Y%m%d}.xlsx"
+
+
+def _header(sheet, titles):
+    bold = Font(bold=True)
+    cells = []
+    for title in titles:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = bold
+        cells.append(cell)
+    sheet.append(cells)
+
+
+def _excel_value(value):
+    # Excel не хранит часовые пояса: переводим в локальное время
+    if hasattr(value, 'tzinfo') and value.tzinfo is not None:
+        return timezone.localtime(value).replace(tzinfo=None)
+    if isinstance(value, str) and len(value) > MAX_CELL_LENGTH:
+        return value[:MAX_CELL_LENGTH]
+    return value
+
+
+def build_workbook(user, output):
+    """Записывает отчёт пользователя в output (путь или файловый объект)."""
+    workbook = Workbook(write_only=True)
+
+    entries_sheet = workbook.create_sheet('Записи')
+    _header(entries_sheet, [title for title, _ in ENTRY_COLUMNS])
+    fields = [field for _, field in ENTRY_COLUMNS]
+    entries = (
+        Entry.objects.filter(user=user)
+        .with_engagement()
+        .order_by('effective_date', 'pk')
+        .values_list(*fields)
+    )
+    for row in entries.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        entries_sheet.append([_excel_value(value) for value in row])
+
+    monthly_sheet = workbook.create_sheet('Эмоции по месяцам')
+    _header(monthly_sheet, ['Месяц', 'Радость', 'Грусть', 'Нейтральный'])
+    for row in monthly_stats(user):
+        monthly_sheet.append([row['month'], row['joy'], row['sadness'], row['neutral']])
+
+    summary_sheet = workbook.create_sheet('Сводка')
+    for label, value in summary_rows(user):
+        summary_sheet.append([label, _excel_value(value)])
+
+    workbook.save(output)
+
+
+def summary_rows(user):
+    totals = Entry.objects.filter(user=user).aggregate(
+        total=Count('id'),
+        public=Count('id', filter=Q(is_public=True)),
+        first=Min('effective_date'),
+        last=Max('effective_date'),
+    )
+    emotion_counts = emotion_totals(user)
+    rows = [
+        ('Пользователь', user.username),
+        ('Сформирован', timezone.now()),
+        ('Всего записей', totals['total']),
+        ('Публичных записей', totals['public']),
+        ('Первая запись', totals['first']),
+        ('Последняя запись', totals['last']),
+        ('Всего эмоций', sum(emotion_counts.values())),
+    ]
+    for emotion_type, label in Emotion.EMOTION_CHOICES:
+        rows.append((label, emotion_counts.get(emotion_type, 0)))
+    return rows
+
+
+def report_chunks(user):
+    """Генератор байтов готового XLSX для StreamingHttpResponse."""
+    with tempfile.TemporaryFile() as output:
+        build_workbook(user, output)
+        output.seek(0)
+        while True:
+            chunk = output.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
@@ -1,26 +1,77 @@
 from rest_framework import serializers
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from .models import Entry
+from emotions.models import Emotion
+from .hashtags import sync_entry_hashtags
+from backend.images import schedule_variants, strip_metadata, variant_urls
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Длина отрывка в кратком представлении, символов
+EXCERPT_LENGTH = 200
+# Сколько символов content читать из базы для отрывка (с запасом на HTML-теги)
+EXCERPT_SOURCE_LENGTH = EXCERPT_LENGTH * 3
+
+# Поля краткого представления для экранов-списков (?view=summary)
+SUMMARY_FIELDS = [
+    'id', 'title', 'excerpt', 'cover_image', 'cover_variants', 'date', 'created_at',
+    'hashtags', 'is_public', 'emotion', 'author',
+    'comments_count', 'likes_count', 'liked_by_me',
+]
+
 class EntrySerializer(serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+    likes_count = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    cover_variants = serializers.SerializerMethodField()
+
+    # Поля, которые отдаются при любом ?fields=
+    always_fields = {'id'}
 
     class Meta:
         model = Entry
         fields = [
             'id', 'title', 'content', 'text_color',
             'font_size', 'text_align', 'is_bold', 'is_underline', 
-            'is_strikethrough', 'list_type', 'location', 'cover_image', 
+            'is_strikethrough', 'list_type', 'location', 'cover_image', 'cover_variants',
             'date', 'created_at', 'updated_at', 'hashtags', 'is_public',
             'author',
             'comments_count',
+            'likes_count',
+            'liked_by_me',
             'emotion',
+            'excerpt',
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is None:
+            # Отрывок только для краткого представления, в полном есть content
+            requested = set(self.Meta.fields) - {'excerpt'}
+        for name in set(self.fields) - requested - self.always_fields:
+            self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        """
+        Набор полей из ?view=summary или ?fields=a,b для GET-запросов,
+        None — полное представление.
+        """
+        if request is None or request.method != 'GET':
+            return None
+        if request.query_params.get('view') == 'summary':
+            return set(SUMMARY_FIELDS)
+        fields = request.query_params.get('fields')
+        if fields:
+            return {name.strip() for name in fields.split(',') if name.strip()}
+        return None
+
     def get_author(self, obj):
         user = obj.user
         request = self.context.get('request')
@@ -34,12 +85,46 @@ class EntrySerializer(serializers.ModelSerializer):
             'id': user.id,
             'username': user.username,
             'name': user.username,
-            'photo': photo_url
+            'photo': photo_url,
+            'photo_variants': variant_urls(user.profile_photo, user.profile_photo_variants, request),
         }
 
+    def get_cover_variants(self, obj):
+        # {'webp': {ширина: url}, 'jpeg': {...}} для srcset; None, пока копии не готовы
+        return variant_urls(obj.cover_image, obj.cover_variants, self.context.get('request'))
+
+    def validate_cover_image(self, value):
+        # Оригинал отдаётся публично: EXIF с координатами съёмки в хранилище не попадает
+        return strip_metadata(value) if value else value
+
+    # Счётчики берутся из аннотаций Entry.objects.with_engagement();
+    # запрос в базу остаётся только для неаннотированных объектов (create/update)
     def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_count'):
+            return obj.comments_count
         return obj.comments.count()
 
+    def get_likes_count(self, obj):
+        if hasattr(obj, 'likes_count'):
+            return obj.likes_count
+        return obj.likes.count()
+
+    def get_liked_by_me(self, obj):
+        if hasattr(obj, 'liked_by_me'):
+            return obj.liked_by_me
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        return obj.likes.filter(user=request.user).exists()
+
+    def get_excerpt(self, obj):
+        # excerpt_source — начало content, аннотированное во вьюхе вместо загрузки всего текста
+        source = getattr(obj, 'excerpt_source', None)
+        if source is None:
+            source = obj.content
+        text = ' '.join(strip_tags(source or '').split())
+        return Truncator(text).chars(EXCERPT_LENGTH)
+
     def create(self, validated_data):
         # Manually handle location from initial data if it's flat
         if 'location.latitude' in self.initial_data and 'location.longitude' in self.initial_data:
@@ -51,7 +136,10 @@ class EntrySerializer(serializers.ModelSerializer):
         
         try:
             logger.debug(f"Entry create validated_data: {validated_data}")
-            return Entry.objects.create(**validated_data)
+            entry = Entry.objects.create(**validated_data)
+            sync_entry_hashtags(entry)
+            schedule_variants(entry, 'cover_image', 'cover_variants', 'cover')
+            return entry
         except Exception as e:
             logger.error(f"Error creating entry: {str(e)}")
             raise serializers.ValidationError(f"Error creating entry: {str(e)}")
@@ -69,10 +157,15 @@ class EntrySerializer(serializers.ModelSerializer):
         if cover_image is not None:
             instance.cover_image = cover_image
 
+        was_public = instance.is_public
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
+        if 'hashtags' in validated_data or 'is_public' in validated_data:
+            sync_entry_hashtags(instance, was_public=was_public)
+        if cover_image is not None:
+            schedule_variants(instance, 'cover_image', 'cover_variants', 'cover')
         return instance
 
     def to_representation(self, instance):
@@ -82,3 +175,61 @@ class EntrySerializer(serializers.ModelSerializer):
         # representation.pop('content', None)
 
         return representation
+
+
+class EntrySearchSerializer(EntrySerializer):
+    """Результат поиска: запись плюс релевантность и сниппет с подсветкой."""
+    rank = serializers.FloatField(read_only=True)
+    headline = serializers.CharField(read_only=True)
+
+    always_fields = {'id', 'rank', 'headline'}
+
+    class Meta(EntrySerializer.Meta):
+        fields = EntrySerializer.Meta.fields + ['rank', 'headline']
+
+
+class EntryNearbySerializer(EntrySerializer):
+    """Запись рядом с точкой запроса и расстояние до неё в километрах."""
+    distance_km = serializers.FloatField(read_only=True)
+
+    always_fields = {'id', 'distance_km'}
+
+    class Meta(EntrySerializer.Meta):
+        fields = EntrySerializer.Meta.fields + ['distance_km']
+
+
+class EntryImportSerializer(serializers.ModelSerializer):
+    """Проверка строки импорта (entries.transfer); обложки не импортируются."""
+    emotion = serializers.ChoiceField(choices=Emotion.EMOTION_CHOICES, required=False, allow_null=True, allow_blank=True)
+    # Время создания из экспорта; без него — время импорта
+    created_at = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = Entry
+        fields = [
+            'title', 'content', 'text_color', 'font_size', 'text_align',
+            'is_bold', 'is_underline', 'is_strikethrough', 'list_type',
+            'location', 'date', 'hashtags', 'is_public', 'emotion', 'created_at',
+        ]
+
+
+class EmotionImportSerializer(serializers.Serializer):
+    """Строка emotion из экспорта (entries.transfer)."""
+    emotion_type = serializers.ChoiceField(choices=Emotion.EMOTION_CHOICES)
+    timestamp = serializers.DateTimeField()
+
+
+class EntryBulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+
+
+class EntryBulkUpdateSerializer(EntryBulkDeleteSerializer):
+    """Поля, которые можно менять сразу у многих записей (entries.bulk)."""
+    is_public = serializers.BooleanField(required=False)
+    emotion = serializers.CharField(max_length=10, required=False, allow_null=True, allow_blank=True)
+    date = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError('Nothing to update: pass is_public, emotion or date')
+        return attrs
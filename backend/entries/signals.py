@@ -0,0 +1,92 @@
+import copy
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import feed_cache
+from .hashtags import bump_hashtag_counts, entry_day
+from .models import Entry
+
+# Отправляется entries.bulk.bulk_delete_entries вместо post_delete по каждой
+# записи; аргументы: user_id, entry_ids, comments и likes — списки (id, user_id)
+entries_bulk_deleted = Signal()
+
+
+@receiver(pre_delete, sender=Entry)
+def decrement_hashtag_counts(sender, instance, **kwargs):
+    # Связи удалятся каскадом, поэтому счётчики трендов уменьшаем заранее
+    if instance.is_public:
+        hashtag_ids = list(instance.entry_hashtags.values_list('hashtag_id', flat=True))
+        bump_hashtag_counts(hashtag_ids, entry_day(instance), -1)
+
+
+@receiver(post_init, sender=Entry)
+def remember_public_flag(sender, instance, **kwargs):
+    # Нужен, чтобы при снятии публикации тоже сбросить кэш ленты
+    instance._loaded_is_public = instance.is_public
+
+
+def invalidate_entry_pages(user_id, is_public):
+    feed_cache.bump_user_version(user_id)
+    if is_public:
+        feed_cache.bump_public_version()
+
+
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def invalidate_feed_on_entry_change(sender, instance, **kwargs):
+    was_public = getattr(instance, '_loaded_is_public', False)
+    invalidate_entry_pages(instance.user_id, instance.is_public or was_public)
+    instance._loaded_is_public = instance.is_public
+
+
+@receiver(post_save, sender='comments.Comment')
+@receiver(post_delete, sender='comments.Comment')
+@receiver(post_save, sender='like.Like')
+@receiver(post_delete, sender='like.Like')
+def invalidate_feed_on_engagement_change(sender, instance, **kwargs):
+    # Комментарии и лайки меняют comments_count/likes_count записи в ленте
+    owner = Entry.objects.filter(pk=instance.entry_id).values_list('user_id', 'is_public').first()
+    if owner is not None:
+        invalidate_entry_pages(*owner)
+
+
+# Поля автора, встроенные в каждую его запись в ленте (EntrySerializer.get_author)
+FEED_USER_FIELDS = ('username', 'profile_photo', 'profile_photo_variants')
+
+
+def _feed_user_state(instance):
+    # Из __dict__, чтобы не догружать отложенные поля; файл сравнивается по имени
+    deferred = instance.get_deferred_fields()
+    state = {}
+    for name in FEED_USER_FIELDS:
+        if name not in deferred:
+            value = instance.__dict__.get(name)
+            state[name] = getattr(value, 'name', value) if name == 'profile_photo' else copy.deepcopy(value)
+    return state
+
+
+@receiver(post_init, sender='users.User')
+def remember_feed_user_fields(sender, instance, **kwargs):
+    instance._loaded_feed_state = _feed_user_state(instance)
+
+
+@receiver(post_save, sender='users.User')
+def invalidate_feed_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    # Вход (last_login) и прочие поля ленту не меняют: кэш сбрасываем только
+    # при смене имени или фото. У нового пользователя записей ещё нет
+    if created or (update_fields is not None and not set(update_fields) & set(FEED_USER_FIELDS)):
+        return
+    loaded = getattr(instance, '_loaded_feed_state', {})
+    current = _feed_user_state(instance)
+    # Поле, не загруженное при чтении, считаем изменённым
+    if any(name not in loaded or loaded[name] != current.get(name) for name in FEED_USER_FIELDS):
+        feed_cache.bump_user_version(instance.pk)
+        feed_cache.bump_public_version()
+    instance._loaded_feed_state = current
+
+
+@receiver(post_delete, sender='users.User')
+def invalidate_feed_on_user_delete(sender, instance, **kwargs):
+    feed_cache.bump_user_version(instance.pk)
+    feed_cache.bump_public_version()
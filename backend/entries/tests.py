@@ -1,3 +1,973 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend import profiler
+from backend.benchmark import SCENARIOS, percentile, run_benchmark
+from backend.conditional import check_shared_cache
+from backend.dataset import DatasetConfig, DatasetGenerator
+from comments.models import Comment
+from emotions.models import Emotion
+from emotions.stats import emotion_totals, monthly_stats
+from like.models import Like
+from sync.models import Tombstone
+from users.models import User
+from . import feed_cache
+from .models import Entry, HashtagDailyCount
+
+
+class PublicFeedPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author', email='author@example.com', password='pass12345')
+        for i in range(7):
+            Entry.objects.create(user=cls.user, title=f'Entry {i}', is_public=True)
+        Entry.objects.create(user=cls.user, title='Private', is_public=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_walks_feed_forward_and_back(self):
+        first = self.client.get('/api/entries/public/', {'page_size': 3, 'version': '2'}).json()
+        self.assertEqual(len(first['results']), 3)
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(first['next']).json()
+        third = self.client.get(second['next']).json()
+        self.assertEqual(len(third['results']), 1)
+        self.assertIsNone(third['next'])
+
+        seen = [e['id'] for page in (first, second, third) for e in page['results']]
+        expected = list(Entry.objects.filter(is_public=True).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        back = self.client.get(third['previous']).json()
+        self.assertEqual(back['results'], second['results'])
+
+    def test_page_query_has_no_offset_or_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/entries/public/', {'page_size': 3, 'version': '2'})
+        sql = ' '.join(q['sql'].upper() for q in ctx.captured_queries if 'FROM "ENTRIES_ENTRY"' in q['sql'].upper())
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(*)', sql)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/entries/public/', {'cursor': 'garbage', 'version': '2'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_unversioned_clients_get_plain_list(self):
+        data = self.client.get('/api/entries/public/').json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 7)
+        self.assertEqual(self.client.get('/api/entries/public/', {'version': '3'}).status_code, 404)
+
+    @override_settings(API_LEGACY_LIST_LIMIT=3)
+    def test_unversioned_list_is_capped(self):
+        data = self.client.get('/api/entries/public/').json()
+        expected = list(Entry.objects.filter(is_public=True).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([e['id'] for e in data], expected[:3])
+
+    def test_version_is_checked_only_by_paginated_views(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/users/me/', {'version': '3'}).status_code, 200)
+
+
+class EntryListQueryCountTests(TestCase):
+    """Списки записей должны стоить постоянное число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='writer', email='writer@example.com', password='pass12345')
+        for owner in (cls.user, cls.other):
+            for i in range(5):
+                entry = Entry.objects.create(user=owner, title=f'{owner.username} {i}', is_public=True)
+                Comment.objects.create(user=cls.other, entry=entry, text='first')
+                Comment.objects.create(user=cls.user, entry=entry, text='second')
+                Like.objects.create(user=cls.other, entry=entry)
+        cls.liked = Entry.objects.filter(user=cls.other).first()
+        Like.objects.create(user=cls.user, entry=cls.liked)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/entries/')
+        results = response.json()
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(e['comments_count'] == 2 and e['likes_count'] == 1 for e in results))
+
+    def test_public(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/entries/public/')
+        by_id = {e['id']: e for e in response.json()}
+        self.assertTrue(by_id[self.liked.id]['liked_by_me'])
+        self.assertEqual(by_id[self.liked.id]['likes_count'], 2)
+        self.assertEqual(sum(e['liked_by_me'] for e in by_id.values()), 1)
+
+    def test_public_by_user(self):
+        # Один запрос на пользователя и один на страницу записей
+        with self.assertNumQueries(2):
+            self.client.get('/api/entries/public_by_user/', {'user_id': self.other.id})
+
+    def test_by_date(self):
+        day = Entry.objects.filter(user=self.user).first().created_at.date().isoformat()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/entries/by_date/', {'date': day})
+        self.assertEqual(len(response.json()), 5)
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+
+class EntrySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='seeker', email='seeker@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='hider', email='hider@example.com', password='pass12345')
+        cls.own = Entry.objects.create(user=cls.user, title='Прогулка', content='Гуляли по осеннему парку с собакой')
+        cls.public = Entry.objects.create(user=cls.other, title='Парки города', content='Лучшие парки для прогулок', is_public=True)
+        cls.hidden = Entry.objects.create(user=cls.other, title='Парк', content='Секретный парк')
+        cls.english = Entry.objects.create(user=cls.user, title='Running', content='Went running in the parks today', hashtags='sport,morning')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_finds_own_and_public_entries_only(self):
+        response = self.client.get('/api/entries/search/', {'q': 'парк'})
+        ids = {e['id'] for e in response.json()['results']}
+        self.assertEqual(ids, {self.own.id, self.public.id})
+        self.assertTrue(all('<mark>' in e['headline'] for e in response.json()['results']))
+
+    def test_english_stemming_and_hashtags(self):
+        ids = [e['id'] for e in self.client.get('/api/entries/search/', {'q': 'run'}).json()['results']]
+        self.assertEqual(ids, [self.english.id])
+        ids = [e['id'] for e in self.client.get('/api/entries/search/', {'q': 'morning'}).json()['results']]
+        self.assertEqual(ids, [self.english.id])
+
+    def test_vector_follows_updates(self):
+        self.own.content = 'Сегодня было море'
+        self.own.save()
+        ids = [e['id'] for e in self.client.get('/api/entries/search/', {'q': 'море'}).json()['results']]
+        self.assertEqual(ids, [self.own.id])
+
+    def test_paginates_by_rank(self):
+        first = self.client.get('/api/entries/search/', {'q': 'парк', 'page_size': 1}).json()
+        second = self.client.get(first['next']).json()
+        self.assertGreaterEqual(first['results'][0]['rank'], second['results'][0]['rank'])
+        self.assertIsNone(second['next'])
+
+    def test_requires_query(self):
+        self.assertEqual(self.client.get('/api/entries/search/').status_code, 400)
+
+
+class HashtagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tagger', email='tagger@example.com', password='pass12345')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_entry(self, hashtags, is_public=True):
+        response = self.client.post('/api/entries/', {'title': 't', 'hashtags': hashtags, 'is_public': is_public})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def trending(self):
+        return {row['tag']: row['count'] for row in self.client.get('/api/hashtags/trending/').json()}
+
+    def test_tags_are_synced_and_counted(self):
+        first = self.create_entry('#Sea, #sun')
+        self.create_entry('#sea #mountains')
+        self.create_entry('#secret', is_public=False)
+        self.assertEqual(self.trending(), {'sea': 2, 'sun': 1, 'mountains': 1})
+
+        self.client.patch(f'/api/entries/{first}/', {'hashtags': '#sun, #beach'})
+        self.assertEqual(self.trending(), {'sea': 1, 'sun': 1, 'beach': 1, 'mountains': 1})
+
+        self.client.patch(f'/api/entries/{first}/', {'is_public': False})
+        self.assertEqual(self.trending(), {'sea': 1, 'mountains': 1})
+
+        self.client.delete(f'/api/entries/{Entry.objects.get(hashtags="#sea #mountains").id}/')
+        self.assertEqual(self.trending(), {})
+
+    def test_filter_by_tag(self):
+        tagged = self.create_entry('#sea')
+        self.create_entry('#sun')
+        ids = [e['id'] for e in self.client.get('/api/entries/', {'tag': '#SEA'}).json()]
+        self.assertEqual(ids, [tagged])
+
+    def test_backfill_command(self):
+        Entry.objects.create(user=self.user, title='old', hashtags='#legacy, #sea', is_public=True)
+        Entry.objects.create(user=self.user, title='old', hashtags='#legacy', is_public=True)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('backfill_hashtags', batch_size=1, stdout=StringIO())
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(self.trending(), {'legacy': 2, 'sea': 1})
+        self.assertEqual(HashtagDailyCount.objects.count(), 2)
+        # Счётчики пересобираются под блокировкой, взятой до DELETE
+        lock = next(i for i, q in enumerate(sql) if q.startswith('LOCK TABLE entries_hashtagdailycount'))
+        self.assertTrue(sql[lock + 1].startswith('DELETE FROM "entries_hashtagdailycount"'))
+
+
+class CalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', email='planner@example.com', password='pass12345')
+        Entry.objects.create(user=cls.user, title='a', date=date(2025, 5, 3), emotion='joy')
+        Entry.objects.create(user=cls.user, title='b', date=date(2025, 5, 3), emotion='joy')
+        Entry.objects.create(user=cls.user, title='c', date=date(2025, 5, 3), emotion='sadness')
+        Entry.objects.create(user=cls.user, title='d', date=date(2025, 5, 20), emotion='sadness')
+        Entry.objects.create(user=cls.user, title='e', date=date(2025, 6, 1), emotion='sadness')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_month_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/entries/calendar/', {'month': '2025-05'}).json()
+        self.assertEqual(data['dominant_emotion'], 'joy')
+        self.assertEqual(data['days'], [
+            {'date': '2025-05-03', 'count': 3, 'dominant_emotion': 'joy'},
+            {'date': '2025-05-20', 'count': 1, 'dominant_emotion': 'sadness'},
+        ])
+
+    def test_effective_date_falls_back_to_created_at(self):
+        entry = Entry.objects.create(user=self.user, title='undated')
+        self.assertEqual(entry.effective_date, timezone.localdate(entry.created_at))
+        ids = [e['id'] for e in self.client.get('/api/entries/by_date/', {'date': entry.effective_date.isoformat()}).json()]
+        self.assertEqual(ids, [entry.id])
+
+    def test_invalid_month(self):
+        self.assertEqual(self.client.get('/api/entries/calendar/', {'month': '2025-13'}).status_code, 400)
+
+
+class PublicFeedCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='poster', email='poster@example.com', password='pass12345')
+        cls.entry = Entry.objects.create(user=cls.author, title='Hello', is_public=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertEqual(self.client.get('/api/entries/public/')['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/entries/public/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(feed_cache.get_stats(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_comment_and_like_invalidate_pages(self):
+        self.client.get('/api/entries/public/')
+        self.client.get('/api/entries/public_by_user/', {'user_id': self.author.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=self.author, entry=self.entry, text='hi')
+            Like.objects.create(user=self.author, entry=self.entry)
+
+        feed = self.client.get('/api/entries/public/')
+        by_user = self.client.get('/api/entries/public_by_user/', {'user_id': self.author.id})
+        self.assertEqual(feed['X-Cache'], 'MISS')
+        self.assertEqual(by_user['X-Cache'], 'MISS')
+        self.assertEqual(feed.json()[0]['comments_count'], 1)
+        self.assertEqual(by_user.json()[0]['likes_count'], 1)
+
+    def test_unpublishing_invalidates_feed(self):
+        self.client.get('/api/entries/public/')
+        entry = Entry.objects.get(pk=self.entry.pk)
+        entry.is_public = False
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.save()
+        self.assertEqual(self.client.get('/api/entries/public/').json(), [])
+
+    def test_version_changes_only_after_commit(self):
+        self.client.get('/api/entries/public/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=self.author, entry=self.entry, text='pending')
+            # Запрос до коммита берёт страницу из кэша, а не кладёт незафиксированную под новую версию
+            self.assertEqual(self.client.get('/api/entries/public/')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/entries/public/')['X-Cache'], 'MISS')
+
+    def test_only_author_fields_invalidate_feed_on_user_save(self):
+        self.client.get('/api/entries/public/')
+        author = User.objects.get(pk=self.author.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            # Вход обновляет только last_login
+            author.last_login = timezone.now()
+            author.save(update_fields=['last_login'])
+            author.first_name = 'Not in feed'
+            author.save()
+        self.assertEqual(self.client.get('/api/entries/public/')['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            author.username = 'renamed'
+            author.save()
+        response = self.client.get('/api/entries/public/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['author']['username'], 'renamed')
+
+    def test_private_entry_keeps_public_feed(self):
+        self.client.get('/api/entries/public/')
+        Entry.objects.create(user=self.author, title='Secret')
+        self.assertEqual(self.client.get('/api/entries/public/')['X-Cache'], 'HIT')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='mobile', email='mobile@example.com', password='pass12345')
+        cls.entry = Entry.objects.create(user=cls.user, title='Cached', is_public=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_revalidates_without_queries(self):
+        etag = self.client.get('/api/entries/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/entries/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(user=self.user, entry=self.entry, text='changed')
+        self.assertEqual(self.client.get('/api/entries/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_public_etag_depends_on_viewer(self):
+        etag = self.client.get('/api/entries/public/')['ETag']
+        self.assertEqual(self.client.get('/api/entries/public/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(APIClient().get('/api/entries/public/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validates_by_etag_only(self):
+        response = self.client.get('/api/entries/public/')
+        self.assertNotIn('Last-Modified', response)
+        # If-Modified-Since с секундной точностью не различил бы две записи в одну секунду
+        response = self.client.get('/api/entries/public/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Entry.objects.create(user=self.user, title='Same second', is_public=True)
+        self.assertEqual(self.client.get('/api/entries/public/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deploy_check_requires_shared_cache(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['backend.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='skimmer', email='skimmer@example.com', password='pass12345')
+        cls.entry = Entry.objects.create(
+            user=cls.user, title='Long read', is_public=True,
+            content='<p>' + 'Очень длинный текст записи. ' * 200 + '</p>',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_summary_view(self):
+        with CaptureQueriesContext(connection) as ctx:
+            entry = self.client.get('/api/entries/', {'view': 'summary'}).json()[0]
+        self.assertNotIn('content', entry)
+        self.assertNotIn('font_size', entry)
+        self.assertTrue(entry['excerpt'].startswith('Очень длинный текст'))
+        self.assertLessEqual(len(entry['excerpt']), 200)
+        self.assertNotIn('<p>', entry['excerpt'])
+        # content целиком не читается, только его начало через SUBSTRING
+        sql = ctx.captured_queries[0]['sql']
+        self.assertEqual(sql.count('"entries_entry"."content"'), 1)
+        self.assertIn('SUBSTRING("entries_entry"."content"', sql)
+
+    def test_fields_param(self):
+        entry = self.client.get('/api/entries/public/', {'fields': 'title,likes_count'}).json()[0]
+        self.assertEqual(set(entry), {'id', 'title', 'likes_count'})
+
+    def test_full_representation_by_default(self):
+        entry = self.client.get('/api/entries/').json()[0]
+        self.assertIn('content', entry)
+        self.assertNotIn('excerpt', entry)
+
+
+class CoverVariantsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='photographer', email='photo@example.com', password='pass12345')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_SYNC=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_upload(self):
+        # Кадр 400x200, снятый «на боку»: EXIF Orientation=6 (повернуть на 90°)
+        image = Image.new('RGB', (400, 200), (200, 40, 40))
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif.get_ifd(0x8825)[1] = 'N'  # GPSLatitudeRef
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('cover.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_produces_oriented_stripped_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/entries/', {'title': 'With cover', 'cover_image': self.make_upload()}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        entry = Entry.objects.get(pk=response.json()['id'])
+        self.assertEqual(entry.cover_variants['source'], entry.cover_image.name)
+        # Оригинал уже 200px в ширину после поворота, поэтому без увеличения
+        self.assertEqual(set(entry.cover_variants['webp']), {'160', '200'})
+
+        with default_storage.open(entry.cover_variants['jpeg']['160']) as f:
+            variant = Image.open(f)
+            self.assertEqual(variant.size, (160, 320))
+            self.assertEqual(len(variant.getexif()), 0)
+
+        data = self.client.get(f'/api/entries/{entry.pk}/').json()
+        self.assertTrue(data['cover_variants']['webp']['160'].endswith('_160.webp'))
+
+    def test_original_is_stored_without_metadata(self):
+        response = self.client.post('/api/entries/', {'title': 'With cover', 'cover_image': self.make_upload()}, format='multipart')
+        entry = Entry.objects.get(pk=response.json()['id'])
+        with entry.cover_image.open('rb'):
+            original = Image.open(entry.cover_image)
+            self.assertEqual(original.size, (200, 400))
+            self.assertEqual(len(original.getexif()), 0)
+
+    def test_worker_strips_previously_stored_original(self):
+        entry = Entry.objects.create(user=self.user, title='Legacy', cover_image=self.make_upload())
+        name = entry.cover_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_image_variants', stdout=StringIO())
+        entry.refresh_from_db()
+        self.assertEqual(entry.cover_image.name, name)
+        with entry.cover_image.open('rb'):
+            original = Image.open(entry.cover_image)
+            self.assertEqual(original.size, (200, 400))
+            self.assertEqual(len(original.getexif()), 0)
+
+    def test_variants_bump_updated_at_for_sync(self):
+        entry = Entry.objects.create(user=self.user, title='Synced', cover_image=self.make_upload())
+        before = entry.updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_image_variants', stdout=StringIO())
+        entry.refresh_from_db()
+        self.assertGreater(entry.updated_at, before)
+        changed = self.client.get('/api/sync/').json()['changes']['entries']
+        self.assertIsNotNone(next(e for e in changed if e['id'] == entry.pk)['cover_variants'])
+
+    def test_variants_hidden_until_ready(self):
+        entry = Entry.objects.create(user=self.user, title='Pending', cover_image=self.make_upload())
+        data = self.client.get(f'/api/entries/{entry.pk}/').json()
+        self.assertIsNone(data['cover_variants'])
+
+
+class CoverManifestTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.covers = os.path.join(self.media_root, 'covers')
+        os.makedirs(self.covers)
+        Image.new('RGB', (120, 60), (10, 120, 200)).save(os.path.join(self.covers, 'sea.jpg'))
+        self.client = APIClient()
+
+    def test_manifest_describes_covers_and_supports_etag(self):
+        response = self.client.get('/api/covers/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('max-age', response['Cache-Control'])
+        [item] = response.json()
+        self.assertEqual((item['name'], item['width'], item['height']), ('sea.jpg', 120, 60))
+        self.assertTrue(item['url'].endswith(f"?v={item['hash']}"))
+        self.assertTrue(item['placeholder'].startswith('data:image/webp;base64,'))
+        self.assertRegex(item['dominant_color'], r'^#[0-9a-f]{6}$')
+
+        cached = self.client.get('/api/covers/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_manifest_refreshes_when_directory_changes(self):
+        first = self.client.get('/api/covers/')
+        Image.new('RGB', (40, 40), (250, 250, 0)).save(os.path.join(self.covers, 'sun.png'))
+        # mtime каталога может не смениться в пределах разрешения ФС
+        stat = os.stat(self.covers)
+        os.utime(self.covers, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        second = self.client.get('/api/covers/')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertEqual([item['name'] for item in second.json()], ['sea.jpg', 'sun.png'])
+
+
+class ExportImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', email='writer@example.com', password='pass12345')
+        entry = Entry.objects.create(user=cls.user, title='Day one', content='Hello', hashtags='#sun', date=date(2024, 5, 1))
+        Emotion.objects.create(user=cls.user, emotion_type='joy')
+        Comment.objects.create(user=cls.user, entry=entry, text='Note to self')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read_lines(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get('/api/entries/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_lines(response)
+        self.assertEqual([line['type'] for line in lines], ['meta', 'entry', 'emotion', 'comment'])
+        self.assertEqual(lines[1]['title'], 'Day one')
+
+    def test_import_round_trip_with_row_errors(self):
+        exported = b''.join(self.client.get('/api/entries/export/').streaming_content)
+        payload = exported + b'{"type": "entry", "title": "Bad", "emotion": "rage"}\nnot json\n'
+
+        response = self.client.generic('POST', '/api/entries/import/', payload, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        result = self.read_lines(response)[-1]
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['emotions_created'], 1)
+        self.assertEqual(result['skipped'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [5, 6])
+        self.assertIn('emotion', result['errors'][0]['errors'])
+
+        original = Entry.objects.filter(user=self.user).earliest('pk')
+        imported = Entry.objects.filter(user=self.user).latest('pk')
+        self.assertEqual(imported.effective_date, date(2024, 5, 1))
+        self.assertEqual(imported.created_at, original.created_at)
+        self.assertEqual(list(imported.tags.values_list('name', flat=True)), ['sun'])
+        self.assertEqual(
+            Entry.objects.filter(user=self.user, search_vector__isnull=False).count(), 2,
+        )
+        timestamps = list(Emotion.objects.filter(user=self.user).values_list('timestamp', flat=True))
+        self.assertEqual(len(timestamps), 2)
+        self.assertEqual(timestamps[0], timestamps[1])
+
+    def test_import_reports_each_full_batch(self):
+        payload = ''.join(json.dumps({'type': 'entry', 'title': f'N{i}'}) + '\n' for i in range(5)).encode()
+        with mock.patch('entries.transfer.IMPORT_CHUNK_SIZE', 2):
+            response = self.client.generic('POST', '/api/entries/import/', payload, content_type='application/x-ndjson')
+        lines = self.read_lines(response)
+        self.assertEqual([(line['type'], line.get('line'), line['created']) for line in lines],
+                         [('batch', 2, 2), ('batch', 4, 4), ('result', None, 5)])
+
+    def test_import_restores_dates_for_emotions_and_trends(self):
+        written = timezone.now() - timedelta(days=100)
+        payload = '\n'.join(json.dumps(row) for row in [
+            {'type': 'entry', 'title': 'Old', 'hashtags': '#past', 'is_public': True,
+             'emotion': 'sadness', 'created_at': written.isoformat()},
+            {'type': 'entry', 'title': 'Undated', 'emotion': 'joy'},
+        ])
+        response = self.client.generic('POST', '/api/entries/import/', payload, content_type='application/x-ndjson')
+        self.assertEqual(self.read_lines(response)[-1]['emotions_created'], 2)
+
+        old = Entry.objects.get(user=self.user, title='Old')
+        self.assertEqual(old.created_at, written)
+        self.assertEqual(old.effective_date, timezone.localdate(written))
+        # Без строк emotion эмоции создаются из записей на время записи
+        self.assertTrue(Emotion.objects.filter(user=self.user, emotion_type='sadness', timestamp=written).exists())
+        self.assertEqual(
+            list(HashtagDailyCount.objects.filter(hashtag__name='past').values_list('day', 'count')),
+            [(timezone.localdate(written), 1)],
+        )
+        self.assertEqual(emotion_totals(self.user, since=timezone.localdate(written))['sadness'], 1)
+
+
+class XlsxReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='analyst', email='analyst@example.com', password='pass12345')
+        Entry.objects.create(user=cls.user, title='Good day', emotion='joy', date=date(2024, 3, 2))
+        Entry.objects.create(user=cls.user, title='Quiet day', is_public=True)
+        Emotion.objects.create(user=cls.user, emotion_type='joy')
+        Emotion.objects.create(user=cls.user, emotion_type='sadness')
+
+    def test_report_endpoint_streams_workbook(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/entries/report/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Записи', 'Эмоции по месяцам', 'Сводка'])
+
+        entries = list(workbook['Записи'].values)
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(entries[1][2], 'Good day')
+
+        monthly_api = monthly_stats(self.user)
+        monthly_rows = list(workbook['Эмоции по месяцам'].values)[1:]
+        self.assertEqual(
+            [list(row) for row in monthly_rows],
+            [[m['month'], m['joy'], m['sadness'], m['neutral']] for m in monthly_api],
+        )
+
+        summary = dict(workbook['Сводка'].values)
+        self.assertEqual(summary['Всего записей'], 2)
+        self.assertEqual(summary['Публичных записей'], 1)
+        self.assertEqual(summary['Всего эмоций'], 2)
+
+    def test_management_command_writes_file(self):
+        output = os.path.join(tempfile.mkdtemp(), 'report.xlsx')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output), ignore_errors=True)
+        call_command('export_xlsx_report', 'analyst', output=output, stdout=StringIO())
+        self.assertEqual(load_workbook(output, read_only=True).sheetnames[0], 'Записи')
+
+
+class NearbyTests(TestCase):
+    center = (55.7558, 37.6173)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='walker', email='walker@example.com', password='pass12345')
+        other = User.objects.create_user(username='stranger', email='stranger@example.com', password='pass12345')
+        lat, lng = cls.center
+        # ~0.01° широты ≈ 1.1 км
+        Entry.objects.create(user=cls.user, title='Near', location={'latitude': lat + 0.01, 'longitude': lng})
+        Entry.objects.create(user=other, title='Public 3km', is_public=True, location={'latitude': str(lat), 'longitude': str(lng + 0.045)})
+        Entry.objects.create(user=other, title='Private', location={'latitude': lat, 'longitude': lng + 0.001})
+        Entry.objects.create(user=cls.user, title='Far', location={'latitude': lat + 0.3, 'longitude': lng})
+        Entry.objects.create(user=cls.user, title='Nowhere', location={'name': 'Home'})
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_coordinates_synced_on_save(self):
+        entry = Entry.objects.get(title='Near')
+        self.assertAlmostEqual(entry.latitude, self.center[0] + 0.01)
+        self.assertTrue(entry.geohash.startswith('ucfv'))
+        self.assertIsNone(Entry.objects.get(title='Nowhere').geohash)
+
+        entry.location = None
+        entry.save(update_fields=['location'])
+        entry.refresh_from_db()
+        self.assertIsNone(entry.latitude)
+
+    def test_nearby_ranks_by_distance_within_radius(self):
+        lat, lng = self.center
+        data = self.client.get('/api/entries/nearby/', {'lat': lat, 'lng': lng, 'radius': 5}).json()
+        self.assertEqual([e['title'] for e in data], ['Near', 'Public 3km'])
+        self.assertAlmostEqual(data[0]['distance_km'], 1.11, places=1)
+
+        wide = self.client.get('/api/entries/nearby/', {'lat': lat, 'lng': lng, 'radius': 50}).json()
+        self.assertEqual([e['title'] for e in wide], ['Near', 'Public 3km', 'Far'])
+
+    def test_nearby_validates_params(self):
+        self.assertEqual(self.client.get('/api/entries/nearby/', {'lat': 'x', 'lng': 1}).status_code, 400)
+        self.assertEqual(self.client.get('/api/entries/nearby/', {'lat': 91, 'lng': 1}).status_code, 400)
+
+    def test_backfill_command(self):
+        Entry.objects.update(latitude=None, longitude=None, geohash=None)
+        call_command('backfill_locations', stdout=StringIO())
+        self.assertEqual(Entry.objects.filter(geohash__isnull=False).count(), 4)
+
+
+class MapClusterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='mapper', email='mapper@example.com', password='pass12345')
+        for i, emotion in enumerate(['joy', 'joy', 'sadness']):
+            Entry.objects.create(
+                user=user, title=f'Moscow {i}', is_public=True, emotion=emotion,
+                location={'latitude': 55.75 + i * 0.001, 'longitude': 37.61},
+            )
+        Entry.objects.create(user=user, title='Paris', is_public=True, location={'latitude': 48.85, 'longitude': 2.35})
+        Entry.objects.create(user=user, title='Hidden', location={'latitude': 55.75, 'longitude': 37.61})
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_world_view_groups_points_into_clusters(self):
+        response = self.client.get('/api/entries/map/', {'bbox': '-180,-90,180,90', 'zoom': 2})
+        self.assertEqual(response.status_code, 200)
+        clusters = sorted(response.json()['clusters'], key=lambda c: -c['count'])
+        self.assertEqual([c['count'] for c in clusters], [3, 1])
+        self.assertEqual(clusters[0]['top_emotion'], 'joy')
+        self.assertEqual(len(clusters[0]['sample_ids']), 3)
+        self.assertAlmostEqual(clusters[0]['lat'], 55.751, places=3)
+
+    def test_tiles_are_cached_until_public_change(self):
+        params = {'bbox': '30,50,40,60', 'zoom': 4}
+        self.client.get('/api/entries/map/', params)
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/entries/map/', params).json()
+        self.assertEqual(cached['clusters'][0]['count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Entry.objects.create(user=User.objects.get(username='mapper'), title='New', is_public=True,
+                                 location={'latitude': 55.76, 'longitude': 37.62})
+        fresh = self.client.get('/api/entries/map/', params).json()
+        self.assertEqual(sum(c['count'] for c in fresh['clusters']), 4)
+
+    def test_rejects_oversized_bbox(self):
+        response = self.client.get('/api/entries/map/', {'bbox': '-180,-90,180,90', 'zoom': 10})
+        self.assertEqual(response.status_code, 400)
+
+    def test_huge_zoom_is_clamped_and_rejected_without_enumerating_tiles(self):
+        with mock.patch('entries.clusters.tiles_for_bbox') as tiles_for_bbox:
+            response = self.client.get('/api/entries/map/', {'bbox': '-180,-90,180,90', 'zoom': 1000})
+        self.assertEqual(response.status_code, 400)
+        tiles_for_bbox.assert_not_called()
+
+    def test_rejects_non_finite_and_out_of_range_bbox(self):
+        for bbox in ('nan,0,1,1', '-inf,0,1,1', '0,0,inf,1', '0,-91,1,1', '-181,0,1,1'):
+            response = self.client.get('/api/entries/map/', {'bbox': bbox, 'zoom': 3})
+            self.assertEqual(response.status_code, 400, bbox)
+
+
+class BulkEntryOperationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cleaner', email='cleaner@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='visitor', email='visitor@example.com', password='pass12345')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.entries = []
+        for i in range(3):
+            response = self.client.post('/api/entries/', {'title': f'E{i}', 'hashtags': '#tidy', 'is_public': True}, format='json')
+            self.entries.append(Entry.objects.get(pk=response.json()['id']))
+        Comment.objects.create(user=self.other, entry=self.entries[0], text='Nice')
+        Like.objects.create(user=self.other, entry=self.entries[0])
+        self.foreign = Entry.objects.create(user=self.other, title='Not yours')
+
+    def tidy_count(self):
+        return sum(HashtagDailyCount.objects.filter(hashtag__name='tidy').values_list('count', flat=True))
+
+    def test_bulk_delete_uses_set_based_queries(self):
+        ids = [e.pk for e in self.entries[:2]] + [self.foreign.pk]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/entries/bulk_delete/', {'ids': ids}, format='json')
+        self.assertEqual(sorted(response.json()['deleted']), sorted(ids[:2]))
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 4)
+
+        self.assertTrue(Entry.objects.filter(pk=self.foreign.pk).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.tidy_count(), 1)
+        self.assertEqual(
+            set(Tombstone.objects.values_list('resource', flat=True)), {'entries', 'comments', 'likes'},
+        )
+
+    def test_bulk_update_changes_own_entries_in_one_update(self):
+        ids = [e.pk for e in self.entries] + [self.foreign.pk]
+        response = self.client.post(
+            '/api/entries/bulk_update/', {'ids': ids, 'is_public': False, 'date': '2024-01-15'}, format='json',
+        )
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(self.tidy_count(), 0)
+        self.assertEqual(
+            set(Entry.objects.filter(user=self.user).values_list('is_public', 'effective_date')),
+            {(False, date(2024, 1, 15))},
+        )
+        self.assertFalse(Entry.objects.get(pk=self.foreign.pk).is_public)  # не тронута: и так приватная
+        self.assertEqual(self.client.post('/api/entries/bulk_update/', {'ids': ids}, format='json').status_code, 400)
+
+
+class BatchRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='batcher', email='batcher@example.com', password='pass12345')
+        cls.entry = Entry.objects.create(user=cls.user, title='Opened', is_public=True)
+        Comment.objects.create(user=cls.user, entry=cls.entry, text='First')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_dispatches_sub_requests_through_urlconf(self):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'url': f'/api/entries/{self.entry.pk}/'},
+            {'url': f'/api/comments/{self.entry.pk}/'},
+            {'url': f'/api/like/{self.entry.pk}/count/'},
+            {'url': '/api/users/by_username/?username=batcher'},
+            {'url': '/api/nowhere/'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([r['status'] for r in responses], [200, 200, 200, 200, 404])
+        self.assertEqual(responses[0]['body']['title'], 'Opened')
+        self.assertEqual(responses[1]['body'][0]['text'], 'First')
+        self.assertEqual(responses[2]['body'], {'count': 0})
+        self.assertIn('ETag', responses[3]['headers'])
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        response = self.client.post('/api/batch/', {'atomic': True, 'requests': [
+            {'method': 'POST', 'url': '/api/entries/', 'body': {'title': 'Will vanish'}},
+            {'method': 'POST', 'url': '/api/entries/bulk_update/', 'body': {'ids': []}},
+            {'url': '/api/entries/'},
+        ]}, format='json').json()
+        self.assertEqual([r['status'] for r in response['responses']], [201, 400, 424])
+        self.assertFalse(response['committed'])
+        self.assertFalse(Entry.objects.filter(title='Will vanish').exists())
+
+    def test_sub_requests_ignore_outer_conditional_headers(self):
+        url = '/api/users/by_username/?username=batcher'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.post('/api/batch/', {'requests': [{'url': url}]}, format='json', HTTP_IF_NONE_MATCH=etag)
+        sub = response.json()['responses'][0]
+        self.assertEqual(sub['status'], 200)
+        self.assertEqual(sub['body']['username'], 'batcher')
+
+    def test_sub_requests_reuse_outer_jwt_authentication(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        with mock.patch('rest_framework_simplejwt.authentication.JWTAuthentication.get_validated_token',
+                        wraps=JWTAuthentication().get_validated_token) as validate:
+            response = client.post('/api/batch/', {'requests': [
+                {'url': f'/api/entries/{self.entry.pk}/'},
+                {'url': f'/api/like/{self.entry.pk}/count/'},
+            ]}, format='json')
+        self.assertEqual([r['status'] for r in response.json()['responses']], [200, 200])
+        self.assertEqual(validate.call_count, 1)
+
+    def test_rejects_nested_batches(self):
+        response = self.client.post('/api/batch/', {'requests': [{'url': '/api/batch/'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profiled', email='profiled@example.com', password='pass12345')
+        for i in range(5):
+            entry = Entry.objects.create(user=cls.user, title=f'P{i}', is_public=True)
+            Comment.objects.create(user=cls.user, entry=entry, text='c')
+            Like.objects.create(user=cls.user, entry=entry)
+
+    def setUp(self):
+        cache.clear()
+        profiler.clear_report()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(QUERY_PROFILER_ALLOW_HEADER=True)
+    def test_header_enables_profiling_headers_and_report(self):
+        plain = self.client.get('/api/entries/')
+        self.assertFalse(plain.has_header('X-Query-Count'))
+
+        response = self.client.get('/api/entries/', HTTP_X_PROFILE_QUERIES='1')
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertIn('X-Query-Time-Ms', response)
+        report = profiler.get_report()
+        self.assertEqual(report['views']['entry-list']['requests'], 1)
+        self.assertTrue(any(s['explain'] for s in report['recent'][0]['slowest']))
+
+    def test_header_is_ignored_by_default(self):
+        response = self.client.get('/api/entries/', HTTP_X_PROFILE_QUERIES='1')
+        self.assertFalse(response.has_header('X-Query-Count'))
+
+    @override_settings(QUERY_PROFILER_ALLOW_HEADER=True)
+    def test_streaming_responses_are_marked_unprofiled(self):
+        response = self.client.get('/api/entries/export/', HTTP_X_PROFILE_QUERIES='1')
+        b''.join(response.streaming_content)
+        self.assertEqual(response['X-Query-Profile'], 'unavailable')
+        self.assertFalse(response.has_header('X-Query-Count'))
+        self.assertEqual(profiler.get_report()['recent'], [])
+
+    def test_fingerprints_group_n_plus_one_queries(self):
+        queries = [
+            {'sql': f'SELECT * FROM comments_comment WHERE entry_id = {i}', 'params': (), 'many': False, 'time': 0.001}
+            for i in range(4)
+        ] + [{'sql': 'SELECT 1 WHERE id IN (%s, %s)', 'params': (1, 2), 'many': False, 'time': 0.001}] * 2
+        summary = profiler.summarize(queries, explain_count=0)
+        self.assertEqual(summary['duplicates'], 1)
+        self.assertEqual(summary['similar'][0], {
+            'fingerprint': 'SELECT * FROM comments_comment WHERE entry_id = ?', 'count': 4,
+        })
+        self.assertEqual(summary['similar'][1]['fingerprint'], 'SELECT ? WHERE id IN (...)')
+
+    @override_settings(QUERY_PROFILER_STRICT=True)
+    def test_main_endpoints_fit_their_budgets(self):
+        entry = Entry.objects.filter(user=self.user).first()
+        for url in ['/api/entries/', f'/api/entries/{entry.pk}/', '/api/entries/public/',
+                    f'/api/entries/public_by_user/?user_id={self.user.pk}', '/api/users/me/']:
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    @override_settings(QUERY_PROFILER_STRICT=True, QUERY_PROFILER_BUDGETS={'entry-list': 0})
+    def test_strict_mode_fails_on_budget_overrun(self):
+        with self.assertRaises(profiler.QueryBudgetExceeded):
+            self.client.get('/api/entries/')
+
+
+class DatasetAndBenchmarkTests(TestCase):
+    def test_generates_backdated_dataset_and_benchmarks_it(self):
+        config = DatasetConfig(users=3, entries_per_user=4, emotions_per_user=10, years=2, seed=7)
+        counts = DatasetGenerator(config).generate()
+        self.assertEqual(counts['users'], 3)
+        self.assertEqual(Entry.objects.filter(user__username__startswith='bench_').count(), 12)
+        self.assertEqual(Emotion.objects.filter(user__username__startswith='bench_').count(), 30)
+        self.assertEqual(Like.objects.count(), counts['likes'])
+        # Даты разнесены по прошлому, а производные поля согласованы с ними
+        year_ago = timezone.now() - timedelta(days=365)
+        self.assertTrue(Emotion.objects.filter(timestamp__lt=year_ago).exists())
+        for entry in Entry.objects.all():
+            self.assertEqual(entry.effective_date, timezone.localdate(entry.created_at))
+        with self.assertRaises(ValueError):
+            DatasetGenerator(config).generate()
+
+        report = run_benchmark(requests_count=5, concurrency=1, warmup=0)
+        self.assertEqual(set(report['endpoints']), {scenario.name for scenario in SCENARIOS if not scenario.writes})
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['requests'], 5)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+        # Запись включается явно, и каждый toggle отменяется: лайки не меняются
+        likes = set(Like.objects.values_list('user_id', 'entry_id'))
+        report = run_benchmark(scenarios=['like_toggle'], requests_count=6, concurrency=1, warmup=2)
+        self.assertEqual(report['endpoints']['like_toggle']['errors'], 0)
+        self.assertTrue(report['meta']['writes'])
+        self.assertEqual(set(Like.objects.values_list('user_id', 'entry_id')), likes)
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertIsNone(percentile([], 50))
@@ -0,0 +1,178 @@
+"""
+Экспорт и импорт дневника в формате NDJSON: одна JSON-строка на объект,
+тип объекта — в поле "type" (meta, entry, emotion, comment).
+
+Экспорт читает таблицы серверным курсором (.iterator()), поэтому память не
+растёт с размером дневника. Импорт сначала читает и проверяет весь файл,
+затем вставляет записи и эмоции пачками через bulk_create внутри одной
+транзакции; save() и сигналы при этом не вызываются, поэтому
+effective_date, координаты, теги, сводка эмоций и сброс кэша ленты
+выполняются здесь явно, а created_at и время эмоций из файла проставляются
+UPDATE после вставки (backend.bulk.backdate).
+"""
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from backend.bulk import backdate
+from comments.models import Comment
+from emotions.models import Emotion
+from emotions.rollup import record_emotions
+
+from .hashtags import apply_hashtag_count_deltas, entry_day, get_or_create_hashtags, parse_hashtags
+from .models import Entry, EntryHashtag
+from .serializers import EmotionImportSerializer, EntryImportSerializer
+from .signals import invalidate_entry_pages
+
+FORMAT_VERSION = 1
+EXPORT_CHUNK_SIZE = 500
+IMPORT_CHUNK_SIZE = 500
+# Сколько ошибок строк возвращать клиенту, чтобы ответ не разрастался
+MAX_REPORTED_ERRORS = 100
+
+ENTRY_EXPORT_FIELDS = ['id', 'updated_at'] + EntryImportSerializer.Meta.fields
+IMPORT_SERIALIZERS = {'entry': EntryImportSerializer, 'emotion': EmotionImportSerializer}
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд; при импорте нужно исходное до микросекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _line(obj):
+    return json.dumps(obj, cls=ExportEncoder, ensure_ascii=False) + '\n'
+
+
+def export_lines(user):
+    """Генератор строк NDJSON со всеми записями, эмоциями и комментариями пользователя."""
+    yield _line({'type': 'meta', 'version': FORMAT_VERSION, 'user': user.username, 'exported_at': timezone.now()})
+
+    entries = Entry.objects.filter(user=user).order_by('pk').values(*ENTRY_EXPORT_FIELDS)
+    for row in entries.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _line({'type': 'entry', **row})
+
+    emotions = Emotion.objects.filter(user=user).order_by('pk').values('id', 'emotion_type', 'timestamp')
+    for row in emotions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _line({'type': 'emotion', **row})
+
+    comments = Comment.objects.filter(user=user).order_by('pk').values('id', 'entry_id', 'text', 'created_at')
+    for row in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield _line({'type': 'comment', **row})
+
+
+def import_lines(user, lines):
+    """
+    Импортирует записи и эмоции из итератора строк NDJSON и возвращает
+    строки отчёта: сводку {"type": "batch", ...} по каждой полной пачке
+    записей и итоговую {"type": "result", ...}. Импорт идёт одной
+    транзакцией, поэтому весь отчёт готов только после коммита — это не
+    живой прогресс, а разбивка результата по пачкам; зато медленный клиент
+    не держит транзакцию открытой. Вход читается и проверяется целиком до
+    начала транзакции. Строки с ошибками пропускаются и попадают в отчёт
+    с номером строки; строки других типов (meta, comment) учитываются как
+    skipped. Эмоции берутся из строк emotion; если их в файле нет (файл не
+    из экспорта), они создаются из поля emotion записей на время записи.
+    """
+    report = {'type': 'result', 'created': 0, 'emotions_created': 0, 'skipped': 0, 'errors': [], 'error_count': 0}
+
+    def add_error(line_no, errors):
+        report['error_count'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_no, 'errors': errors})
+
+    entry_rows, emotion_rows = [], []
+    for line_no, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as e:
+            add_error(line_no, {'non_field_errors': [f'Invalid JSON: {str(e)}']})
+            continue
+        if not isinstance(row, dict):
+            add_error(line_no, {'non_field_errors': ['Expected a JSON object']})
+            continue
+        row_type = row.get('type', 'entry')
+        if row_type not in IMPORT_SERIALIZERS:
+            report['skipped'] += 1
+            continue
+
+        serializer = IMPORT_SERIALIZERS[row_type](data=row)
+        if not serializer.is_valid():
+            add_error(line_no, serializer.errors)
+            continue
+        (entry_rows if row_type == 'entry' else emotion_rows).append((line_no, serializer.validated_data))
+
+    output = []
+    with transaction.atomic():
+        for start in range(0, len(entry_rows), IMPORT_CHUNK_SIZE):
+            chunk = entry_rows[start:start + IMPORT_CHUNK_SIZE]
+            _insert_entries(user, [data for _, data in chunk], report, derive_emotions=not emotion_rows)
+            if len(chunk) == IMPORT_CHUNK_SIZE:
+                output.append(_line({'type': 'batch', 'line': chunk[-1][0], 'created': report['created']}))
+        for start in range(0, len(emotion_rows), IMPORT_CHUNK_SIZE):
+            chunk = emotion_rows[start:start + IMPORT_CHUNK_SIZE]
+            _insert_emotions(user, [(data['emotion_type'], data['timestamp']) for _, data in chunk], report)
+
+    invalidate_entry_pages(user.pk, True)
+    output.append(_line(report))
+    return output
+
+
+def _insert_entries(user, rows, report, derive_emotions):
+    now = timezone.now()
+    entries = [Entry(user=user, **data) for data in rows]
+    for entry in entries:
+        entry.created_at = entry.created_at or now
+        # bulk_create не вызывает Entry.save(), где считаются effective_date и координаты
+        entry.set_derived_fields()
+    created_at = [entry.created_at for entry in entries]
+    Entry.objects.bulk_create(entries)
+    # auto_now_add перезаписал created_at временем вставки: возвращаем время из файла.
+    # updated_at остаётся временем импорта, чтобы /api/sync/ отдал новые записи клиентам
+    backdate(Entry, [(entry.pk, moment) for entry, moment in zip(entries, created_at)], ['created_at'])
+    for entry, moment in zip(entries, created_at):
+        entry.created_at = moment
+    _link_hashtags(entries)
+    report['created'] += len(entries)
+    if derive_emotions:
+        _insert_emotions(user, [(entry.emotion, entry.created_at) for entry in entries if entry.emotion], report)
+
+
+def _insert_emotions(user, rows, report):
+    """Вставляет эмоции [(тип, время)] с исходным временем и учитывает их в дневной сводке."""
+    emotions = Emotion.objects.bulk_create([Emotion(user=user, emotion_type=emotion_type) for emotion_type, _ in rows])
+    backdate(Emotion, [(emotion.pk, moment) for emotion, (_, moment) in zip(emotions, rows)], ['timestamp'])
+    for emotion, (_, moment) in zip(emotions, rows):
+        emotion.timestamp = moment
+    record_emotions(emotions)
+    report['emotions_created'] += len(emotions)
+
+
+def _link_hashtags(entries):
+    parsed = {entry.pk: parse_hashtags(entry.hashtags) for entry in entries}
+    tags = get_or_create_hashtags(sorted({name for names in parsed.values() for name in names}))
+    EntryHashtag.objects.bulk_create([
+        EntryHashtag(entry_id=pk, hashtag=tags[name])
+        for pk, names in parsed.items()
+        for name in names
+    ])
+    # Счётчики трендов: публичная запись — плюс один к каждому её тегу за день её создания,
+    # как в sync_entry_hashtags
+    deltas = {}
+    for entry in entries:
+        if entry.is_public:
+            for name in parsed[entry.pk]:
+                key = (tags[name].id, entry_day(entry))
+                deltas[key] = deltas.get(key, 0) + 1
+    apply_hashtag_count_deltas([(tag_id, day, count) for (tag_id, day), count in deltas.items()])
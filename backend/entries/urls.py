@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EntryViewSet, CoverListView
+from .views import EntryViewSet, CoverListView, TrendingHashtagsView
 
 router = DefaultRouter()
 router.register(r'entries', EntryViewSet, basename='entry')
@@ -8,4 +8,5 @@ router.register(r'entries', EntryViewSet, basename='entry')
 urlpatterns = [
     path('', include(router.urls)),
     path('covers/', CoverListView.as_view(), name='cover-list'),
+    path('hashtags/trending/', TrendingHashtagsView.as_view(), name='hashtags-trending'),
 ]
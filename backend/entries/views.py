@@ -1,19 +1,36 @@
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
-from .models import Entry
-from .serializers import EntrySerializer
+from .models import Entry, HashtagDailyCount
+from .hashtags import parse_hashtags
+from .covers import get_manifest
+from .geo import bounding_box, covering_geohashes, haversine_expression
+from .transfer import export_lines, import_lines
+from . import clusters, feed_cache, reports
+from backend.conditional import conditional_get, make_etag, request_fingerprint
+from backend.pagination import KeysetPagination, ListVersioning, VersionedKeysetPagination
+from .serializers import (
+    EntrySerializer, EntrySearchSerializer, EntryNearbySerializer,
+    EntryBulkDeleteSerializer, EntryBulkUpdateSerializer, EXCERPT_SOURCE_LENGTH,
+)
+from .bulk import bulk_delete_entries, bulk_update_entries
 from users.models import User  # Импортируем кастомную модель User
 from emotions.models import Emotion
 import logging
+import math
 import traceback
-from datetime import datetime
-from django.db.models import Q
-import os
-from django.conf import settings
+from collections import Counter
+from datetime import datetime, timedelta
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.db.models.functions import Cast, Substr
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
 
 
 logger = logging.getLogger(__name__)
@@ -22,31 +39,98 @@ logger = logging.getLogger(__name__)
 
 class EntryViewSet(viewsets.ModelViewSet):
     serializer_class = EntrySerializer
+    pagination_class = VersionedKeysetPagination
+    versioning_class = ListVersioning
+    # Поле keyset-пагинации; action search переопределяет его на 'rank'
+    cursor_field = 'created_at'
+    # Ограничения /nearby/
+    nearby_default_radius = 5
+    nearby_max_radius = 500
+    nearby_default_limit = 50
+    nearby_max_limit = 100
 
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         """
-        if self.action == 'public' or self.action == 'public_by_user':
+        if self.action in ('public', 'public_by_user', 'map_clusters'):
             permission_classes = [AllowAny]
+        elif self.action == 'feed_cache_stats':
+            permission_classes = [IsAdminUser]
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Entry.objects.filter(user=self.request.user).order_by('-created_at')
+            queryset = Entry.objects.filter(user=self.request.user).with_engagement(self.request.user).order_by('-created_at')
+            return self.shape_queryset(self.filter_by_tag(queryset))
         return Entry.objects.none()
 
+    def shape_queryset(self, queryset):
+        """
+        Для GET не загружает из базы колонки, которые не попадут в ответ
+        (?view=summary, ?fields=), а отрывок берёт из начала content в SQL.
+        """
+        if self.request.method != 'GET':
+            return queryset
+        queryset = queryset.defer('search_vector')
+        requested = EntrySerializer.requested_fields(self.request)
+        if requested is None:
+            return queryset
+        # Ключи пагинации и связи не откладываем
+        keep = requested | {'id', 'user', 'created_at'}
+        if 'cover_variants' in requested:
+            keep.add('cover_image')
+        deferred = [
+            field.name for field in Entry._meta.concrete_fields
+            if field.name not in keep and field.name != 'search_vector'
+        ]
+        queryset = queryset.defer(*deferred)
+        if 'excerpt' in requested:
+            queryset = queryset.annotate(excerpt_source=Substr('content', 1, EXCERPT_SOURCE_LENGTH))
+        return queryset
+
+    def filter_by_tag(self, queryset):
+        """Фильтр ?tag= через индексированную таблицу связей EntryHashtag."""
+        tag = self.request.query_params.get('tag')
+        if tag:
+            name = parse_hashtags(tag)
+            queryset = queryset.filter(entry_hashtags__hashtag__name=name[0] if name else '')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # Версия записей пользователя меняется сигналами при правке записей,
+        # комментариев, лайков и профиля — по ней отвечаем 304 без запросов к базе
+        version = feed_cache.get_user_version(request.user.id)
+        etag = make_etag('entries', request.user.id, version, request_fingerprint(request))
+        return conditional_get(request, etag, lambda: super(EntryViewSet, self).list(request, *args, **kwargs))
+
     @action(detail=False, methods=['get'])
     def public(self, request):
         """
         Возвращает все публичные записи всех пользователей.
         """
+        version = feed_cache.get_public_version()
+        # liked_by_me зависит от читателя, поэтому он тоже входит в ETag
+        etag = make_etag('public', request.user.id or 0, version, request_fingerprint(request))
+        return conditional_get(request, etag, lambda: self.build_public_page(request))
+
+    def build_public_page(self, request):
         try:
-            entries = Entry.objects.filter(is_public=True).select_related('user').order_by('-created_at')
-            serializer = self.get_serializer(entries, many=True, context={'request': request})
-            return Response(serializer.data)
+            def build():
+                entries = self.shape_queryset(self.filter_by_tag(Entry.objects.filter(is_public=True).with_engagement(request.user)))
+                page = self.paginate_queryset(entries)
+                serializer = self.get_serializer(page, many=True, context={'request': request})
+                return self.get_paginated_response(serializer.data).data
+
+            if request.user.is_authenticated:
+                return Response(build())
+            data, hit = feed_cache.get_or_build(feed_cache.public_page_key(request), build)
+            return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+        except NotFound:
+            # Невалидный курсор пагинации или несуществующий пользователь
+            raise
         except Exception as e:
             logger.error(f"Error fetching all public entries: {str(e)}")
             return Response(
@@ -98,11 +182,7 @@ class EntryViewSet(viewsets.ModelViewSet):
             logger.debug(f"Request data: {request.data}")
             logger.info(f"Date from request: {request.data.get('date')}")
             logger.info(f"User creating entry: {request.user.username}, ID: {request.user.id}")
-            
-            # Получаем всех пользователей из базы (для диагностики)
-            all_users = User.objects.all()
-            logger.info(f"All users in database: {', '.join([f'{u.id}({u.username})' for u in all_users[:10]])}")
-            
+
             # Создаем копию данных для модификации
             data = request.data.copy()
             
@@ -181,12 +261,8 @@ class EntryViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            entries = self.get_queryset().filter(
-                Q(date=date) | Q(created_at__date=date)
-            ).order_by('-created_at')
-            
-            logger.info(f"Found {entries.count()} entries for date {date}")
-            logger.info(f"Query: {entries.query}")
+            # effective_date = date или дата создания, покрыт индексом (user, effective_date)
+            entries = self.get_queryset().filter(effective_date=date).order_by('-created_at')
 
             serializer = self.get_serializer(entries, many=True)
             return Response(serializer.data)
@@ -197,6 +273,57 @@ class EntryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Тепловая карта месяца: число записей и преобладающая эмоция по дням
+        одним сгруппированным запросом вместо вызова by_date на каждый день.
+        """
+        month_str = request.query_params.get('month')
+        if not month_str:
+            return Response(
+                {"detail": "month parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            month_start = datetime.strptime(month_str, '%Y-%m').date()
+        except ValueError:
+            return Response(
+                {"detail": "Invalid month format. Use YYYY-MM"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+
+        rows = (
+            Entry.objects
+            .filter(user=request.user, effective_date__gte=month_start, effective_date__lt=next_month)
+            .values('effective_date', 'emotion')
+            .annotate(count=Count('id'))
+            .order_by('effective_date', 'emotion')
+        )
+
+        days = {}
+        month_emotions = Counter()
+        for row in rows:
+            day = days.setdefault(row['effective_date'], {'count': 0, 'emotions': Counter()})
+            day['count'] += row['count']
+            if row['emotion']:
+                day['emotions'][row['emotion']] += row['count']
+                month_emotions[row['emotion']] += row['count']
+
+        return Response({
+            'month': month_start.strftime('%Y-%m'),
+            'dominant_emotion': month_emotions.most_common(1)[0][0] if month_emotions else None,
+            'days': [
+                {
+                    'date': date.isoformat(),
+                    'count': day['count'],
+                    'dominant_emotion': day['emotions'].most_common(1)[0][0] if day['emotions'] else None,
+                }
+                for date, day in days.items()
+            ],
+        })
+
     @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
     def public_by_user(self, request):
         try:
@@ -207,20 +334,27 @@ class EntryViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                return Response(
-                    {"detail": f"User with ID {user_id} does not exist"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Get only public entries for the specified user
-            entries = Entry.objects.filter(user=user, is_public=True).order_by('-created_at')
-            logger.info(f"Found {entries.count()} public entries for user {user.username}")
-            
-            serializer = self.get_serializer(entries, many=True)
-            return Response(serializer.data)
+            def build():
+                try:
+                    user = User.objects.get(id=user_id)
+                except User.DoesNotExist:
+                    raise NotFound(f"User with ID {user_id} does not exist")
+
+                # Get only public entries for the specified user
+                entries = self.shape_queryset(Entry.objects.filter(user=user, is_public=True).with_engagement(request.user))
+                page = self.paginate_queryset(entries)
+                logger.info(f"Fetched {len(page)} public entries for user {user.username}")
+
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data).data
+
+            if request.user.is_authenticated:
+                return Response(build())
+            data, hit = feed_cache.get_or_build(feed_cache.user_page_key(request, user_id), build)
+            return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+        except NotFound:
+            # Невалидный курсор пагинации или несуществующий пользователь
+            raise
         except Exception as e:
             logger.error(f"Error fetching public entries: {str(e)}")
             return Response(
@@ -228,13 +362,284 @@ class EntryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Удаляет свои записи {"ids": [...]} набором DELETE на все записи сразу."""
+        serializer = EntryBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            deleted = bulk_delete_entries(request.user, serializer.validated_data['ids'])
+            return Response({'deleted': deleted})
+        except Exception as e:
+            logger.error(f"Error in bulk_delete: {str(e)}")
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """Меняет is_public, emotion и/или date у своих записей {"ids": [...]} одним UPDATE."""
+        serializer = EntryBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        ids = changes.pop('ids')
+        try:
+            return Response({'updated': bulk_update_entries(request.user, ids, changes)})
+        except Exception as e:
+            logger.error(f"Error in bulk_update: {str(e)}")
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Весь дневник пользователя потоком NDJSON (см. entries.transfer)."""
+        filename = f"taimbook-{request.user.username}-{timezone.localdate():%Y%m%d}.ndjson"
+        response = StreamingHttpResponse(export_lines(request.user), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """XLSX-отчёт: записи, эмоции по месяцам и сводка (см. entries.reports)."""
+        response = StreamingHttpResponse(reports.report_chunks(request.user), content_type=reports.CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="{reports.report_filename(request.user)}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_entries(self, request):
+        """
+        Импорт записей и эмоций из NDJSON: файл в поле file (multipart) или тело
+        запроса. Отвечает сводками по пачкам и итоговым отчётом с ошибками по
+        строкам; весь отчёт отдаётся после коммита импорта.
+        """
+        try:
+            if request.content_type.startswith('multipart/'):
+                upload = request.FILES.get('file')
+                if upload is None:
+                    return Response(
+                        {"detail": "file is required"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                lines = iter(upload)
+            else:
+                lines = iter(request.body.splitlines())
+            return StreamingHttpResponse(iter(import_lines(request.user, lines)), content_type='application/x-ndjson')
+        except Exception as e:
+            logger.error(f"Error in import: {str(e)}")
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    def feed_cache_stats(self, request):
+        """Счётчики попаданий/промахов кэша публичной ленты (только для staff)."""
+        return Response(feed_cache.get_stats())
+
+    # Поиск появился уже с keyset-пагинацией: страницы без версии
+    @action(detail=False, methods=['get'], cursor_field='rank', pagination_class=KeysetPagination)
+    def search(self, request):
+        """
+        Полнотекстовый поиск по своим и публичным записям.
+        Использует tsvector-колонку search_vector и её GIN-индекс.
+        """
+        query_text = request.query_params.get('q', '').strip()
+        if not query_text:
+            return Response(
+                {"detail": "q parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        query = (
+            SearchQuery(query_text, config='russian', search_type='websearch') |
+            SearchQuery(query_text, config='english', search_type='websearch')
+        )
+        entries = (
+            self.shape_queryset(Entry.objects.filter(Q(user=request.user) | Q(is_public=True), search_vector=query))
+            .with_engagement(request.user)
+            # float8, чтобы значение ранга в курсоре совпадало с базой без потери точности
+            .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        )
+        page = self.paginate_queryset(entries)
+
+        # Сниппеты дорогие, поэтому считаем их только для записей текущей страницы
+        headlines = dict(
+            Entry.objects.filter(pk__in=[entry.pk for entry in page])
+            .annotate(headline=SearchHeadline(
+                'content', query, config='russian',
+                start_sel='<mark>', stop_sel='</mark>', max_fragments=2,
+            ))
+            .values_list('pk', 'headline')
+        )
+        for entry in page:
+            entry.headline = headlines.get(entry.pk, '')
+
+        serializer = EntrySearchSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Свои и публичные записи в радиусе ?radius= км (по умолчанию 5) от
+        ?lat=&lng=, ближайшие первыми. Кандидатов отбирают bounding box и
+        префиксы geohash по индексам, точное расстояние — гаверсинус в SQL.
+        """
+        try:
+            lat = float(request.query_params['lat'])
+            lng = float(request.query_params['lng'])
+            radius = float(request.query_params.get('radius', self.nearby_default_radius))
+            limit = int(request.query_params.get('limit', self.nearby_default_limit))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "lat and lng are required; lat, lng, radius and limit must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+            return Response(
+                {"detail": "lat/lng out of range or radius is not positive"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        radius = min(radius, self.nearby_max_radius)
+        limit = min(max(limit, 1), self.nearby_max_limit)
+
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+        candidates = Entry.objects.filter(
+            Q(user=request.user) | Q(is_public=True),
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+        prefixes = covering_geohashes(lat, lng, radius)
+        if prefixes:
+            prefix_filter = Q()
+            for prefix in prefixes:
+                prefix_filter |= Q(geohash__startswith=prefix)
+            candidates = candidates.filter(prefix_filter)
+
+        entries = (
+            self.shape_queryset(candidates)
+            .with_engagement(request.user)
+            .annotate(distance_km=haversine_expression(lat, lng))
+            .filter(distance_km__lte=radius)
+            .order_by('distance_km', '-created_at')[:limit]
+        )
+        serializer = EntryNearbySerializer(entries, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='map')
+    def map_clusters(self, request):
+        """
+        Кластеры публичных записей в области ?bbox=min_lng,min_lat,max_lng,max_lat
+        на зуме ?zoom= (0–18, больший приводится к 18): число записей, центр, частая эмоция и примеры id.
+        """
+        try:
+            bbox = [float(value) for value in request.query_params['bbox'].split(',')]
+            zoom = int(request.query_params.get('zoom', 0))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "bbox=min_lng,min_lat,max_lng,max_lat and integer zoom are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # float() принимает nan и inf: до int() в расчёте тайлов они доходить не должны
+        if len(bbox) != 4 or not all(math.isfinite(value) for value in bbox) or zoom < 0:
+            return Response(
+                {"detail": "bbox must have 4 finite numbers and zoom must not be negative"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        zoom = min(zoom, clusters.MAX_ZOOM)
+        min_lng, min_lat, max_lng, max_lat = bbox
+        if not (-180.0 <= min_lng <= 180.0 and -180.0 <= max_lng <= 180.0
+                and -90.0 <= min_lat <= 90.0 and -90.0 <= max_lat <= 90.0):
+            return Response(
+                {"detail": "bbox longitudes must be within -180..180 and latitudes within -90..90"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if min_lng > max_lng or min_lat > max_lat:
+            return Response(
+                {"detail": "bbox min values must not exceed max values"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        bbox = (min_lng, min_lat, max_lng, max_lat)
+        # Считается по диапазонам, без перечисления тайлов: мировой bbox на зуме 18 — это 7e10 тайлов
+        if clusters.tile_count(bbox, zoom) > clusters.MAX_TILES:
+            return Response(
+                {"detail": "bbox is too large for this zoom"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            tile_width, tile_height = clusters.tile_size(zoom)
+            return Response({
+                'zoom': zoom,
+                'cell_size': [tile_width / clusters.CELLS_PER_TILE, tile_height / clusters.CELLS_PER_TILE],
+                'clusters': clusters.get_clusters(bbox, zoom),
+            })
+        except Exception as e:
+            logger.error(f"Error building map clusters: {str(e)}")
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class CoverListView(APIView):
+    """
+    Манифест стандартных обложек (см. entries.covers): имя, URL с хэшем
+    содержимого, размеры, вес, доминирующий цвет и размытый плейсхолдер.
+    """
     permission_classes = [AllowAny]
+    # Манифест меняется только при выкладке новых обложек
+    max_age = 60 * 60 * 24
+
     def get(self, request):
-        covers_dir = os.path.join(settings.MEDIA_ROOT, 'covers')
-        covers = []
-        if os.path.exists(covers_dir):
-            for fname in os.listdir(covers_dir):
-                if fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    covers.append(f'/media/covers/{fname}')
-        return Response(covers)
+        try:
+            items, etag = get_manifest()
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = Response(items)
+            response['ETag'] = etag
+            patch_cache_control(response, public=True, max_age=self.max_age)
+            return response
+        except Exception as e:
+            logger.error(f"Error in covers: {str(e)}")
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class TrendingHashtagsView(APIView):
+    """
+    Популярные теги публичных записей за последние ?days= дней.
+    Читает предрассчитанные дневные счётчики HashtagDailyCount.
+    """
+    permission_classes = [AllowAny]
+    default_days = 7
+    max_days = 90
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            days = min(max(int(request.query_params.get('days', self.default_days)), 1), self.max_days)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response(
+                {"detail": "days and limit must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        since = timezone.localdate() - timedelta(days=days - 1)
+        trending = (
+            HashtagDailyCount.objects
+            .filter(day__gte=since)
+            .values('hashtag__name')
+            .annotate(count=Sum('count'))
+            .filter(count__gt=0)
+            .order_by('-count', 'hashtag__name')[:limit]
+        )
+        return Response([
+            {'tag': row['hashtag__name'], 'count': row['count']}
+            for row in trending
+        ])
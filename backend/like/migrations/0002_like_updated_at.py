@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def fill_updated_at(apps, schema_editor):
+    Like = apps.get_model('like', 'Like')
+    Like.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('like', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', 'updated_at'], name='like_user_updated_idx'),
+        ),
+    ]
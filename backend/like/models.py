@@ -6,11 +6,16 @@ class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
     entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name='likes')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('user', 'entry')
         verbose_name = 'Like'
         verbose_name_plural = 'Likes'
+        indexes = [
+            # Для /api/sync/
+            models.Index(fields=['user', 'updated_at'], name='like_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} -> {self.entry.title}"
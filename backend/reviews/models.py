@@ -16,4 +16,7 @@ class Review(models.Model):
         return self.author
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+        ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from rest_framework import generics, permissions
+from backend.pagination import ListVersioning, VersionedKeysetPagination
 from .models import Review
 from .serializers import ReviewSerializer
 import logging
@@ -8,6 +9,8 @@ logger = logging.getLogger(__name__)
 class ReviewListCreateView(generics.ListCreateAPIView):
     queryset = Review.objects.order_by('-created_at')
     serializer_class = ReviewSerializer
+    pagination_class = VersionedKeysetPagination
+    versioning_class = ListVersioning
     permission_classes = [permissions.AllowAny]
 
     def perform_create(self, serializer):
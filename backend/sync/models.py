@@ -0,0 +1,18 @@
+from django.db import models
+from users.models import User
+
+
+class Tombstone(models.Model):
+    """Отметка об удалении объекта пользователя для инкрементальной синхронизации."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    resource = models.CharField(max_length=20)  # entries, emotions, comments, likes
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_id} deleted at {self.deleted_at}"
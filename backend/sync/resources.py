@@ -0,0 +1,79 @@
+"""
+Синхронизируемые ресурсы: модель, сериализатор и правила доступа.
+
+Синхронизируются объекты, принадлежащие пользователю (поле user): его
+записи, эмоции, комментарии и лайки. Изменения ищутся по (user, updated_at),
+удаления — по таблице Tombstone.
+"""
+from django.db.models import Q
+from rest_framework import serializers
+
+from comments.models import Comment
+from emotions.models import Emotion
+from emotions.serializers import EmotionSerializer
+from entries.models import Entry
+from entries.serializers import EntrySerializer
+from like.models import Like
+
+
+class VisibleEntryMixin:
+    """Комментировать и лайкать можно свои и публичные записи."""
+
+    def validate_entry(self, entry):
+        user = self.context['request'].user
+        if entry.user_id != user.id and not entry.is_public:
+            raise serializers.ValidationError('Entry is not available')
+        return entry
+
+
+class SyncEmotionSerializer(EmotionSerializer):
+    class Meta(EmotionSerializer.Meta):
+        fields = EmotionSerializer.Meta.fields + ['updated_at']
+        read_only_fields = ['timestamp', 'updated_at']
+
+
+class SyncCommentSerializer(VisibleEntryMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ['id', 'entry', 'text', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class SyncLikeSerializer(VisibleEntryMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Like
+        fields = ['id', 'entry', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+
+
+class Resource:
+    def __init__(self, name, model, serializer_class, updatable=True):
+        self.name = name
+        self.model = model
+        self.serializer_class = serializer_class
+        # Лайк можно только создать или удалить
+        self.updatable = updatable
+
+    def queryset(self, user):
+        queryset = self.model.objects.filter(user=user)
+        if self.model is Entry:
+            queryset = queryset.with_engagement(user).defer('search_vector')
+        return queryset
+
+
+RESOURCES = {
+    resource.name: resource
+    for resource in [
+        Resource('entries', Entry, EntrySerializer),
+        Resource('emotions', Emotion, SyncEmotionSerializer),
+        Resource('comments', Comment, SyncCommentSerializer),
+        Resource('likes', Like, SyncLikeSerializer, updatable=False),
+    ]
+}
+
+RESOURCE_BY_LABEL = {resource.model._meta.label: name for name, resource in RESOURCES.items()}
+
+
+def keyset_after(field, value, pk):
+    """Условие (field, pk) > (value, pk) для продолжения страницы."""
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
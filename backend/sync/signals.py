@@ -0,0 +1,36 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from entries.signals import entries_bulk_deleted
+from users.models import User
+from .models import Tombstone
+from .resources import RESOURCE_BY_LABEL
+
+
+def deleted_with_user(origin):
+    return isinstance(origin, User) or (isinstance(origin, QuerySet) and origin.model is User)
+
+
+@receiver(post_delete, sender='entries.Entry')
+@receiver(post_delete, sender='emotions.Emotion')
+@receiver(post_delete, sender='comments.Comment')
+@receiver(post_delete, sender='like.Like')
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Вместе с пользователем удаляются и его отметки, синхронизировать некого
+    if deleted_with_user(origin):
+        return
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        resource=RESOURCE_BY_LABEL[sender._meta.label],
+        object_id=instance.pk,
+    )
+
+
+@receiver(entries_bulk_deleted)
+def record_bulk_tombstones(sender, user_id, entry_ids, comments, likes, **kwargs):
+    Tombstone.objects.bulk_create(
+        [Tombstone(user_id=user_id, resource='entries', object_id=pk) for pk in entry_ids]
+        + [Tombstone(user_id=owner, resource='comments', object_id=pk) for pk, owner in comments]
+        + [Tombstone(user_id=owner, resource='likes', object_id=pk) for pk, owner in likes]
+    )
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from comments.models import Comment
+from emotions.models import Emotion
+from entries.models import Entry
+from like.models import Like
+from users.models import User
+from .models import Tombstone
+from .views import SyncView, encode_token, to_micros
+
+
+class SyncPullTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='offline', email='offline@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='other', email='other@example.com', password='pass12345')
+        cls.entry = Entry.objects.create(user=cls.user, title='Old entry')
+        Emotion.objects.create(user=cls.user, emotion_type='joy')
+        Entry.objects.create(user=cls.other, title='Not mine', is_public=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_full_snapshot_then_only_changes_and_tombstones(self):
+        snapshot = self.client.get('/api/sync/').json()
+        self.assertEqual([e['title'] for e in snapshot['changes']['entries']], ['Old entry'])
+        self.assertEqual(len(snapshot['changes']['emotions']), 1)
+        self.assertFalse(snapshot['has_more'])
+
+        # Токен без перекрытия, чтобы изменения из setUpTestData не попали в окно
+        token = encode_token({'s': to_micros(timezone.now() + SyncView.overlap)})
+        Entry.objects.filter(pk=self.entry.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        new_entry = Entry.objects.create(user=self.user, title='Fresh')
+        comment = Comment.objects.create(user=self.user, entry=new_entry, text='Hi')
+        Like.objects.create(user=self.user, entry=new_entry)
+        Emotion.objects.filter(user=self.user).delete()
+
+        delta = self.client.get('/api/sync/', {'since': token}).json()
+        self.assertEqual([e['title'] for e in delta['changes']['entries']], ['Fresh'])
+        self.assertEqual([c['id'] for c in delta['changes']['comments']], [comment.pk])
+        self.assertEqual(len(delta['changes']['likes']), 1)
+        self.assertEqual(delta['changes']['emotions'], [])
+        self.assertEqual(len(delta['deleted']['emotions']), 1)
+
+    def test_pages_through_large_changesets(self):
+        for i in range(4):
+            Entry.objects.create(user=self.user, title=f'Bulk {i}')
+        seen = []
+        token = None
+        with mock.patch.object(SyncView, 'page_size', 2):
+            for _ in range(5):
+                data = self.client.get('/api/sync/', {'since': token} if token else {}).json()
+                seen += [e['title'] for e in data['changes']['entries']]
+                token = data['token']
+                if not data['has_more']:
+                    break
+        self.assertEqual(sorted(seen), sorted(['Old entry'] + [f'Bulk {i}' for i in range(4)]))
+
+    def test_rejects_bad_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'garbage'}).status_code, 400)
+        old = encode_token({'s': to_micros(timezone.now() - timedelta(days=365))})
+        response = self.client.get('/api/sync/', {'since': old})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['reset'])
+
+    def test_rejects_out_of_range_token_values(self):
+        now = to_micros(timezone.now())
+        for payload in (
+            {'s': 10 ** 20},
+            {'s': -1},
+            {'s': now, 'u': 10 ** 20, 'c': {}},
+            {'s': now, 'u': now, 'c': {'entries': [10 ** 20, 1]}},
+            {'s': now, 'u': now, 'c': {'entries': [now, 2 ** 63]}},
+        ):
+            response = self.client.get('/api/sync/', {'since': encode_token(payload)})
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_user_deletion_does_not_leave_tombstones(self):
+        self.other.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+
+class SyncPushTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pusher', email='pusher@example.com', password='pass12345')
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='pass12345')
+        cls.private_entry = Entry.objects.create(user=stranger, title='Private')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.entry = Entry.objects.create(user=self.user, title='Draft')
+        self.version = self.client.get('/api/sync/').json()['changes']['entries'][0]['updated_at']
+
+    def push(self, changes):
+        response = self.client.post('/api/sync/', {'changes': changes}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_applies_creates_updates_and_deletes(self):
+        results = self.push({
+            'entries': [
+                {'id': self.entry.pk, 'updated_at': self.version, 'data': {'title': 'Edited offline'}},
+                {'id': None, 'client_id': 'local-1', 'data': {'title': 'Written offline'}},
+            ],
+            'emotions': [{'id': None, 'data': {'emotion_type': 'sadness'}}],
+        })
+        self.assertEqual([r['status'] for r in results['entries']], ['updated', 'created'])
+        self.assertEqual(results['entries'][1]['client_id'], 'local-1')
+        self.assertEqual(results['emotions'][0]['status'], 'created')
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.title, 'Edited offline')
+
+        new_version = results['entries'][0]['data']['updated_at']
+        results = self.push({'entries': [{'id': self.entry.pk, 'updated_at': new_version, 'deleted': True}]})
+        self.assertEqual(results['entries'][0]['status'], 'deleted')
+        self.assertTrue(Tombstone.objects.filter(resource='entries', object_id=self.entry.pk).exists())
+
+    def test_detects_conflicts_on_stale_updated_at(self):
+        Entry.objects.get(pk=self.entry.pk).save()  # правка с другого устройства
+        results = self.push({'entries': [{'id': self.entry.pk, 'updated_at': self.version, 'data': {'title': 'Stale'}}]})
+        self.assertEqual(results['entries'][0]['status'], 'conflict')
+        self.assertEqual(results['entries'][0]['server']['title'], 'Draft')
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.title, 'Draft')
+
+    def test_item_errors_do_not_block_the_batch(self):
+        results = self.push({
+            'comments': [
+                {'id': None, 'data': {'entry': self.private_entry.pk, 'text': 'Sneaky'}},
+                {'id': None, 'data': {'entry': self.entry.pk, 'text': 'Fine'}},
+            ],
+        })
+        self.assertEqual([r['status'] for r in results['comments']], ['error', 'created'])
+        self.assertIn('entry', results['comments'][0]['errors'])
+
+    def test_save_time_errors_stay_per_item(self):
+        save = Comment.save
+
+        def flaky_save(instance, *args, **kwargs):
+            if instance.text == 'Broken':
+                raise DatabaseError('deadlock detected')
+            return save(instance, *args, **kwargs)
+
+        with mock.patch('entries.serializers.sync_entry_hashtags', side_effect=[DatabaseError('boom'), None]), \
+                mock.patch.object(Comment, 'save', flaky_save):
+            results = self.push({
+                'entries': [
+                    {'id': None, 'client_id': 'bad', 'data': {'title': 'Rejected in save()'}},
+                    {'id': None, 'client_id': 'good', 'data': {'title': 'Kept'}},
+                ],
+                'comments': [
+                    {'id': None, 'data': {'entry': self.entry.pk, 'text': 'Broken'}},
+                    {'id': None, 'data': {'entry': self.entry.pk, 'text': 'Fine'}},
+                ],
+            })
+        self.assertEqual([r['status'] for r in results['entries']], ['error', 'created'])
+        self.assertIn('non_field_errors', results['entries'][0]['errors'])
+        self.assertEqual([r['status'] for r in results['comments']], ['error', 'created'])
+        self.assertFalse(Entry.objects.filter(title='Rejected in save()').exists())
+        self.assertTrue(Entry.objects.filter(title='Kept').exists())
+        self.assertEqual(list(Comment.objects.filter(entry=self.entry).values_list('text', flat=True)), ['Fine'])
@@ -0,0 +1,261 @@
+import base64
+import json
+import logging
+import traceback
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Tombstone
+from .resources import RESOURCES, keyset_after
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Псевдоресурс для удалений в курсорах токена
+DELETED = 'deleted'
+# Наибольший id (bigint) в курсоре токена
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def encode_token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        if not isinstance(payload, dict) or not isinstance(payload.get('s'), (int, type(None))):
+            raise ValueError
+        if 'u' in payload:
+            cursors = payload.get('c')
+            if not isinstance(payload['u'], int) or not isinstance(cursors, dict):
+                raise ValueError
+            for name, cursor in cursors.items():
+                if name not in RESOURCES and name != DELETED:
+                    raise ValueError
+                if not (isinstance(cursor, list) and len(cursor) == 2 and all(isinstance(v, int) for v in cursor)):
+                    raise ValueError
+                if not 0 < cursor[1] <= MAX_ID:
+                    raise ValueError
+        # Отметки времени должны превращаться в datetime (и с вычетом перекрытия),
+        # иначе подделанный токен дал бы OverflowError уже при чтении
+        stamps = [payload['s'], payload.get('u')] + [cursor[0] for cursor in payload.get('c', {}).values()]
+        for value in stamps:
+            if value is None:
+                continue
+            if value < 0:
+                raise ValueError
+            from_micros(value)
+        return payload
+    except (ValueError, TypeError, UnicodeError, OverflowError, OSError):
+        raise InvalidToken('Invalid sync token')
+
+
+class SyncView(APIView):
+    """
+    Инкрементальная синхронизация для офлайн-клиентов.
+
+    GET ?since=<token> — записи, эмоции, комментарии и лайки пользователя,
+    созданные или изменённые после токена, и id удалённых (tombstones).
+    Без since отдаётся полный снимок. Каждый ресурс читается keyset-страницей
+    по (updated_at, id) через индекс (user, updated_at); если данных больше
+    страницы, has_more=true и новый токен продолжает тот же проход.
+
+    Токен — base64 от JSON: s — нижняя граница (мкс), u — верхняя граница
+    незавершённого прохода, c — позиции ресурсов, которые ещё не дочитаны.
+    Чтобы не потерять строки транзакций, закоммиченных чуть позже своего
+    updated_at, новый проход начинается с перекрытием SYNC_OVERLAP_SECONDS;
+    клиент применяет изменения идемпотентно по id.
+
+    POST {"changes": {"entries": [...], ...}} — пакет изменений клиента.
+    Элемент: {"id": null, "client_id": ..., "data": {...}} — создание;
+    {"id": 5, "updated_at": "<известная клиенту версия>", "data": {...}} —
+    изменение; {"id": 5, "updated_at": ..., "deleted": true} — удаление.
+    Если updated_at на сервере отличается, элемент не применяется и
+    возвращается со статусом conflict и серверной версией объекта.
+    Ошибка элемента (проверка, ограничение базы) возвращается как его
+    status error и не отменяет уже применённые элементы пакета. Запись,
+    созданная через sync, не создаёт Emotion, как POST /api/entries/:
+    офлайн-клиент передаёт эмоции отдельным ресурсом emotions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    page_size = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    overlap = timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', 5))
+    retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+    def get(self, request):
+        try:
+            token = request.query_params.get('since')
+            payload = decode_token(token) if token else {'s': None}
+        except InvalidToken as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            now = timezone.now()
+            if 'u' in payload:
+                # Продолжение прохода: те же границы, только недочитанные ресурсы
+                lower = from_micros(payload['s']) if payload['s'] is not None else None
+                upper = from_micros(payload['u'])
+                cursors = payload.get('c', {})
+                pending = list(cursors)
+            else:
+                lower = from_micros(payload['s']) - self.overlap if payload['s'] is not None else None
+                upper = now
+                cursors = {}
+                pending = list(RESOURCES) + ([DELETED] if lower is not None else [])
+
+            if lower is not None and lower < now - self.retention:
+                # Отметки об удалении старше срока хранения уже вычищены
+                return Response(
+                    {"detail": "Sync token is too old, a full resync is required", "reset": True},
+                    status=status.HTTP_410_GONE
+                )
+
+            changes = {name: [] for name in RESOURCES}
+            deleted = {name: [] for name in RESOURCES}
+            next_cursors = {}
+            for name in pending:
+                if name == DELETED:
+                    rows, cursor = self.read_tombstones(request.user, lower, upper, cursors.get(name))
+                    for tombstone in rows:
+                        deleted[tombstone.resource].append(tombstone.object_id)
+                else:
+                    resource = RESOURCES[name]
+                    rows, cursor = self.read_changes(resource, request.user, lower, upper, cursors.get(name))
+                    changes[name] = resource.serializer_class(rows, many=True, context={'request': request}).data
+                if cursor is not None:
+                    next_cursors[name] = cursor
+
+            lower_micros = to_micros(lower) if lower is not None else None
+            if next_cursors:
+                next_token = encode_token({'s': lower_micros, 'u': to_micros(upper), 'c': next_cursors})
+            else:
+                next_token = encode_token({'s': to_micros(upper)})
+
+            return Response({
+                'token': next_token,
+                'has_more': bool(next_cursors),
+                'changes': changes,
+                'deleted': deleted,
+            })
+        except Exception as e:
+            logger.error(f"Error in sync: {str(e)}")
+            logger.error(traceback.format_exc())
+            return Response(
+                {"detail": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def read_page(self, queryset, field, lower, upper, cursor):
+        """Keyset-страница по (field, pk) в полуинтервале (lower, upper]; возвращает (строки, курсор)."""
+        queryset = queryset.filter(**{f'{field}__lte': upper})
+        if lower is not None:
+            queryset = queryset.filter(**{f'{field}__gt': lower})
+        if cursor is not None:
+            queryset = queryset.filter(keyset_after(field, from_micros(cursor[0]), cursor[1]))
+        rows = list(queryset.order_by(field, 'pk')[:self.page_size + 1])
+        if len(rows) <= self.page_size:
+            return rows, None
+        rows = rows[:self.page_size]
+        last = rows[-1]
+        return rows, [to_micros(getattr(last, field)), last.pk]
+
+    def read_changes(self, resource, user, lower, upper, cursor):
+        return self.read_page(resource.queryset(user), 'updated_at', lower, upper, cursor)
+
+    def read_tombstones(self, user, lower, upper, cursor):
+        return self.read_page(Tombstone.objects.filter(user=user), 'deleted_at', lower, upper, cursor)
+
+    def post(self, request):
+        changes = request.data.get('changes') if isinstance(request.data, dict) else None
+        if not isinstance(changes, dict) or set(changes) - set(RESOURCES):
+            return Response(
+                {"detail": f"changes must be an object with keys from: {', '.join(RESOURCES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = {}
+        for name, items in changes.items():
+            if not isinstance(items, list):
+                return Response(
+                    {"detail": f"changes.{name} must be a list"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            results[name] = [self.apply_change(RESOURCES[name], request, item) for item in items]
+        return Response({'results': results})
+
+    def apply_change(self, resource, request, item):
+        if not isinstance(item, dict):
+            return {'status': 'error', 'errors': {'non_field_errors': ['Expected an object']}}
+        result = {'id': item.get('id')}
+        if 'client_id' in item:
+            result['client_id'] = item['client_id']
+
+        try:
+            # Каждый элемент в своей точке сохранения: ошибка не откатывает остальные
+            with transaction.atomic():
+                result.update(self.apply_change_atomic(resource, request, item))
+        except serializers.ValidationError as e:
+            # Проверки внутри save() (а не is_valid) тоже ошибка только этого элемента
+            errors = e.detail if isinstance(e.detail, dict) else {'non_field_errors': e.detail}
+            result.update(status='error', errors=errors)
+        except DatabaseError as e:
+            logger.error(f"Error applying sync change to {resource.name}: {str(e)}")
+            result.update(status='error', errors={'non_field_errors': [str(e)]})
+        return result
+
+    def apply_change_atomic(self, resource, request, item):
+        context = {'request': request}
+        data = item.get('data') or {}
+
+        if item.get('id') is None:
+            serializer = resource.serializer_class(data=data, context=context)
+            if not serializer.is_valid():
+                return {'status': 'error', 'errors': serializer.errors}
+            instance = serializer.save(user=request.user)
+            return {'status': 'created', 'id': instance.pk, 'data': resource.serializer_class(instance, context=context).data}
+
+        instance = resource.model.objects.select_for_update().filter(pk=item['id'], user=request.user).first()
+        if instance is None:
+            return {'status': 'not_found'}
+
+        base = parse_datetime(str(item.get('updated_at') or ''))
+        if base is not None and timezone.is_naive(base):
+            base = timezone.make_aware(base)
+        if base is None:
+            return {'status': 'error', 'errors': {'updated_at': ['updated_at of the known version is required']}}
+        if base != instance.updated_at:
+            return {'status': 'conflict', 'server': resource.serializer_class(instance, context=context).data}
+
+        if item.get('deleted'):
+            instance.delete()
+            return {'status': 'deleted'}
+        if not resource.updatable:
+            return {'status': 'error', 'errors': {'non_field_errors': [f'{resource.name} cannot be updated']}}
+
+        serializer = resource.serializer_class(instance, data=data, partial=True, context=context)
+        if not serializer.is_valid():
+            return {'status': 'error', 'errors': serializer.errors}
+        instance = serializer.save()
+        return {'status': 'updated', 'data': resource.serializer_class(instance, context=context).data}
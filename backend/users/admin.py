@@ -1,12 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import User
-from django.utils.html import format_html
-from emotions.models import Emotion
+from django.utils.html import format_html, format_html_join
+from analytics.models import UserMonthlyActivity
+from analytics.refresh import last_refreshed
 from django.utils import timezone
-from collections import defaultdict
-from django.db.models.functions import TruncMonth
-from django.db.models import Count
 
 # Регистрируем кастомную модель
 @admin.register(User)
@@ -18,34 +16,22 @@ class CustomUserAdmin(UserAdmin):
     profile_photo_tag.short_description = 'Фото'
 
     def monthly_emotions(self, obj):
-        # Получаем все эмоции пользователя
-        emotions = Emotion.objects.filter(user=obj)
-        # Группируем по месяцу и типу эмоции
-        monthly = (
-            emotions
-            .annotate(month=TruncMonth('timestamp'))
-            .values('month', 'emotion_type')
-            .annotate(count=Count('id'))
-            .order_by('-month')
+        # Помесячная сводка из analytics (пересчитывается командой refresh_analytics)
+        cell = 'border:1px solid #ccc;padding:4px;'
+        rows = UserMonthlyActivity.objects.filter(user_id=obj.pk).order_by('-month')
+        header = format_html_join('', '<th style="{}">{}</th>', (
+            (cell, title) for title in ('Месяц', 'Радость', 'Грусть', 'Нейтральный', 'Записи', 'Активных дней')
+        ))
+        body = format_html_join('', '<tr>' + f'<td style="{cell}">{{}}</td>' * 6 + '</tr>', (
+            (row.month.strftime('%B %Y'), row.joy, row.sadness, row.neutral, row.entries, row.active_days)
+            for row in rows
+        ))
+        refreshed_at = last_refreshed()
+        note = f'Данные на {timezone.localtime(refreshed_at):%d.%m.%Y %H:%M}' if refreshed_at else 'Сводка ещё не пересчитывалась'
+        return format_html(
+            '<table style="border-collapse:collapse;width:100%;margin-top:10px;"><tr>{}</tr>{}</table><p>{}</p>',
+            header, body, note,
         )
-        # Собираем данные по месяцам
-        stats_by_month = defaultdict(lambda: {'joy': 0, 'sadness': 0, 'neutral': 0})
-        for row in monthly:
-            month = row['month']
-            emotion_type = row['emotion_type']
-            count = row['count']
-            stats_by_month[month][emotion_type] = count
-        # Формируем HTML-таблицу
-        html = '<table style="border-collapse:collapse;width:100%;margin-top:10px;">'
-        html += '<tr><th style="border:1px solid #ccc;padding:4px;">Месяц</th><th style="border:1px solid #ccc;padding:4px;">Радость</th><th style="border:1px solid #ccc;padding:4px;">Грусть</th><th style="border:1px solid #ccc;padding:4px;">Нейтральный</th></tr>'
-        for month in sorted(stats_by_month.keys(), reverse=True):
-            m = month.strftime('%B %Y')
-            joy = stats_by_month[month]['joy']
-            sadness = stats_by_month[month]['sadness']
-            neutral = stats_by_month[month]['neutral']
-            html += f'<tr><td style="border:1px solid #ccc;padding:4px;">{m}</td><td style="border:1px solid #ccc;padding:4px;">{joy}</td><td style="border:1px solid #ccc;padding:4px;">{sadness}</td><td style="border:1px solid #ccc;padding:4px;">{neutral}</td></tr>'
-        html += '</table>'
-        return format_html(html)
     monthly_emotions.short_description = 'Эмоции по месяцам'
 
     list_display = ('username', 'email', 'is_staff', 'is_active', 'pin_code', 'profile_photo_tag')
@@ -7,6 +7,8 @@ class User(AbstractUser):
     pin_code = models.CharField(max_length=4, null=True, blank=True)
     remind_pin = models.BooleanField(default=True)
     profile_photo = models.ImageField(upload_to='profile_photos', null=True, blank=True)
+    # Уменьшенные копии фото, заполняются фоново (backend.images)
+    profile_photo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
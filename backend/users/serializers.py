@@ -1,21 +1,37 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .models import User  # Changed to import our custom User model
-from emotions.models import Emotion
-from django.db.models.functions import TruncMonth
-from django.db.models import Count
-from collections import defaultdict
+from emotions.stats import monthly_snapshot
 from django.contrib.auth import authenticate
+from backend.images import schedule_variants, strip_metadata, variant_urls
+
+def expanded_fields(request):
+    """Имена полей из ?expand=a,b (можно повторять параметр)."""
+    if request is None:
+        return set()
+    params = getattr(request, 'query_params', request.GET)
+    return {name.strip() for value in params.getlist('expand') for name in value.split(',') if name.strip()}
 
 class UserSerializer(serializers.ModelSerializer):
     profile_photo = serializers.ImageField(required=False, allow_null=True)
     profile_photo_url = serializers.SerializerMethodField()
+    profile_photo_variants = serializers.SerializerMethodField()
     monthly_emotions = serializers.SerializerMethodField()
 
+    # Дорогие поля отдаются только по запросу: ?expand=monthly_emotions
+    EXPANDABLE_FIELDS = ('monthly_emotions',)
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'has_pin', 'profile_photo', 'profile_photo_url', 'monthly_emotions')
-        read_only_fields = ('id', 'has_pin', 'profile_photo_url', 'monthly_emotions')
+        fields = ('id', 'username', 'email', 'first_name', 'last_name', 'has_pin', 'profile_photo', 'profile_photo_url', 'profile_photo_variants', 'monthly_emotions')
+        read_only_fields = ('id', 'has_pin', 'profile_photo_url', 'profile_photo_variants', 'monthly_emotions')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = expanded_fields(self.context.get('request'))
+        for name in self.EXPANDABLE_FIELDS:
+            if name not in expand:
+                self.fields.pop(name)
 
     def get_profile_photo_url(self, obj):
         if obj.profile_photo:
@@ -27,31 +43,16 @@ class UserSerializer(serializers.ModelSerializer):
             return obj.profile_photo.url # Fallback to relative URL if request is not available
         return None
 
+    def get_profile_photo_variants(self, obj):
+        # Квадратные копии 64/128/256 в WebP и JPEG; None, пока не готовы
+        return variant_urls(obj.profile_photo, obj.profile_photo_variants, self.context.get('request'))
+
+    def validate_profile_photo(self, value):
+        # Фото отдаётся публично: EXIF с координатами съёмки в хранилище не попадает
+        return strip_metadata(value) if value else value
+
     def get_monthly_emotions(self, obj):
-        emotions = Emotion.objects.filter(user=obj)
-        monthly = (
-            emotions
-            .annotate(month=TruncMonth('timestamp'))
-            .values('month', 'emotion_type')
-            .annotate(count=Count('id'))
-            .order_by('-month')
-        )
-        stats_by_month = defaultdict(lambda: {'joy': 0, 'sadness': 0, 'neutral': 0})
-        for row in monthly:
-            month = row['month']
-            emotion_type = row['emotion_type']
-            count = row['count']
-            stats_by_month[month][emotion_type] = count
-        result = []
-        for month in sorted(stats_by_month.keys(), reverse=True):
-            m = month.strftime('%B %Y')
-            result.append({
-                'month': m,
-                'joy': stats_by_month[month]['joy'],
-                'sadness': stats_by_month[month]['sadness'],
-                'neutral': stats_by_month[month]['neutral'],
-            })
-        return result
+        return monthly_snapshot(obj.pk)
 
     def update(self, instance, validated_data):
         # Handle profile photo update separately if present
@@ -64,6 +65,8 @@ class UserSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         
         instance.save()
+        if profile_photo is not None:
+            schedule_variants(instance, 'profile_photo', 'profile_photo_variants', 'avatar')
         return instance
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
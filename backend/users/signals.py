@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.conditional import bump_version_on_commit
+from .models import User
+
+
+def profile_version_key(user_id):
+    return f'profile:{user_id}:version'
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_profile_version_on_user_change(sender, instance, **kwargs):
+    bump_version_on_commit(profile_version_key(instance.pk))
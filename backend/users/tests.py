@@ -1,3 +1,87 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from emotions.models import Emotion
+from .models import User
+
+
+class ProfileConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profile', email='profile@example.com', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_me_returns_304_until_emotion_added(self):
+        url = '/api/users/me/?expand=monthly_emotions'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Emotion.objects.create(user=self.user, emotion_type='joy')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_plain_me_ignores_new_emotions(self):
+        etag = self.client.get('/api/users/me/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Emotion.objects.create(user=self.user, emotion_type='joy')
+        self.assertEqual(self.client.get('/api/users/me/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_by_username_costs_one_query_when_unchanged(self):
+        url = '/api/users/by_username/'
+        etag = self.client.get(url, {'username': 'profile'})['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'username': 'profile'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.user.first_name = 'Changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(url, {'username': 'profile'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MonthlyEmotionsExpandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='monthly', email='monthly@example.com', password='pass12345')
+        Emotion.objects.create(user=cls.user, emotion_type='joy')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_plain_profile_reads_skip_monthly_emotions(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertNotIn('monthly_emotions', response.data)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/by_username/', {'username': 'monthly'})
+        self.assertEqual(response.data['username'], 'monthly')
+        self.assertNotIn('monthly_emotions', response.data)
+
+    def test_patch_does_not_aggregate_emotions(self):
+        with self.assertNumQueries(1):
+            response = self.client.patch('/api/users/me/', {'first_name': 'Renamed'}, format='json')
+        self.assertEqual(response.data['first_name'], 'Renamed')
+        self.assertNotIn('monthly_emotions', response.data)
+
+    def test_expand_is_cached_until_new_emotion(self):
+        url = '/api/users/me/?expand=monthly_emotions'
+        first = self.client.get(url).data['monthly_emotions']
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first[0]['joy'], 1)
+
+        # Снимок уже в кэше: остаётся только чтение самого пользователя
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/by_username/', {'username': 'monthly', 'expand': 'monthly_emotions'})
+        self.assertEqual(response.data['monthly_emotions'], first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Emotion.objects.create(user=self.user, emotion_type='sadness')
+        self.assertEqual(self.client.get(url).data['monthly_emotions'][0]['sadness'], 1)
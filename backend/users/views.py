@@ -5,9 +5,20 @@ from rest_framework.views import APIView
 from django.contrib.auth import authenticate
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer, PinCodeSerializer, VerifyPinSerializer, DontRemindSerializer, ChangePasswordSerializer
+from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer, PinCodeSerializer, VerifyPinSerializer, DontRemindSerializer, ChangePasswordSerializer, expanded_fields
 from .models import User
 from rest_framework.decorators import api_view, permission_classes
+from backend.conditional import conditional_get, get_version, make_etag, request_fingerprint
+from emotions.rollup import get_emotions_version
+from .signals import profile_version_key
+
+
+def profile_etag(kind, request, user_id):
+    """ETag профиля; с ?expand=monthly_emotions учитывается и версия эмоций."""
+    parts = [kind, user_id, get_version(profile_version_key(user_id)), request_fingerprint(request)]
+    if 'monthly_emotions' in expanded_fields(request):
+        parts.append(get_emotions_version(user_id))
+    return make_etag(*parts)
 
 # Create your views here.
 
@@ -51,11 +62,14 @@ class UserMeView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        user = request.user
+        etag = profile_etag('me', request, user.id)
+        return conditional_get(
+            request, etag, lambda: Response(UserSerializer(user, context={'request': request}).data)
+        )
 
     def patch(self, request):
-        serializer = UserSerializer(request.user, data=request.data, partial=True)
+        serializer = UserSerializer(request.user, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -113,9 +127,12 @@ def get_user_by_username(request):
     username = request.query_params.get('username')
     if not username:
         return Response({'detail': 'username parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
-    try:
-        user = User.objects.get(username=username)
-        serializer = UserSerializer(user, context={'request': request})
-        return Response(serializer.data)
-    except User.DoesNotExist:
+    # Профиль читается одним запросом и для проверки ETag, и для ответа
+    user = User.objects.filter(username=username).first()
+    if user is None:
         return Response({'detail': f'User with username {username} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = profile_etag('profile', request, user.id)
+    return conditional_get(
+        request, etag, lambda: Response(UserSerializer(user, context={'request': request}).data)
+    )